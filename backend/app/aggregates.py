@@ -0,0 +1,156 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Date, Integer, String, and_, case, cast, func, literal
+from sqlalchemy.orm import Session
+from app import models, fx
+from app.money import ZERO
+from app.utils import TRANSACTION_TYPES
+
+# Single-pass aggregation engine used by the report endpoints.
+# Every bucket is a SUM(CASE WHEN <condition> THEN amount ELSE 0 END) column,
+# so any number of period/type totals come back from ONE round trip.
+
+Period = Tuple[Optional[date], Optional[date]]
+
+
+def type_buckets(types: Iterable[str] = TRANSACTION_TYPES) -> dict:
+    """Returns one bucket per transaction type, labelled by the type itself."""
+    return {tx_type: models.Transaction.transaction_type == tx_type for tx_type in types}
+
+
+def period_buckets(periods: Dict[str, Period], types: Iterable[str] = TRANSACTION_TYPES) -> dict:
+    """Returns ``{"<period>_<type>": condition}`` buckets for inclusive date ranges.
+
+    ``None`` as a start or end date leaves that side of the range open.
+    """
+    buckets = {}
+    for name, (start_date, end_date) in periods.items():
+        for tx_type in types:
+            conditions = [models.Transaction.transaction_type == tx_type]
+            if start_date is not None:
+                conditions.append(models.Transaction.date >= start_date)
+            if end_date is not None:
+                conditions.append(models.Transaction.date <= end_date)
+            buckets[f"{name}_{tx_type}"] = and_(*conditions)
+    return buckets
+
+
+def sum_buckets(
+    db: Session,
+    user_id: int,
+    buckets: dict,
+    group_by=None,
+    filters: Iterable = (),
+    currency: Optional[str] = None,
+) -> dict:
+    """Sum transaction amounts into every bucket with a single query.
+
+    Without ``group_by`` returns ``{label: total}``; with it returns
+    ``{group_key: {label: total}}``. ``filters`` narrow the rows scanned and
+    should cover the union of the buckets so only relevant rows are read.
+    With ``currency`` every row is converted to it inside the query.
+    """
+    amount = models.Transaction.amount if currency is None else fx.converted_amount(currency)
+    columns = [
+        func.coalesce(func.sum(case((condition, amount), else_=0)), 0).label(label)
+        for label, condition in buckets.items()
+    ]
+    query = db.query(*columns) if group_by is None else db.query(group_by, *columns)
+    query = query.filter(models.Transaction.user_id == user_id, *filters)
+
+    if group_by is None:
+        row = query.one()
+        return {label: row._mapping[label] or ZERO for label in buckets}
+
+    results = {}
+    for row in query.group_by(group_by).all():
+        results[row[0]] = {label: row._mapping[label] or ZERO for label in buckets}
+    return results
+
+
+# --- TIME BUCKETS ---
+
+GRANULARITIES = ("day", "week", "month", "year")
+
+
+def truncate_date(db: Session, column, granularity: str):
+    """SQL expression mapping a date column to the first day of its bucket (weeks start Monday)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc(granularity, column), Date)
+    if granularity == "day":
+        return func.date(column)
+    if granularity == "week":
+        days_since_monday = (cast(func.strftime("%w", column), Integer) + 6) % 7
+        return func.date(column, literal("-").concat(cast(days_since_monday, String)).concat(" days"))
+    return func.date(column, f"start of {granularity}")
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def bucket_range(start_date: date, end_date: date, granularity: str) -> List[date]:
+    """Every bucket start between two dates, inclusive (the gap-filling axis)."""
+    current = bucket_start(start_date, granularity)
+    buckets = []
+    while current <= end_date:
+        buckets.append(current)
+        if granularity == "day":
+            current += timedelta(days=1)
+        elif granularity == "week":
+            current += timedelta(days=7)
+        elif granularity == "month":
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            current = date(current.year + 1, 1, 1)
+    return buckets
+
+
+def as_date(value) -> date:
+    """SQLite returns bucket expressions as ISO strings, PostgreSQL as dates."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def time_series(
+    db: Session,
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    granularity: str = "day",
+    split_by: str = "type",
+    currency: Optional[str] = None,
+) -> dict:
+    """Sum amounts per (bucket, type|category) in ONE grouped query, gaps filled with 0.
+
+    Returns ``{"labels": [iso dates], "series": {name: [totals aligned with labels]}}``,
+    converted to ``currency`` in the query when given.
+    """
+    amount = models.Transaction.amount if currency is None else fx.converted_amount(currency)
+    split_column = models.Transaction.transaction_type if split_by == "type" else models.Transaction.category
+    bucket = truncate_date(db, models.Transaction.date, granularity).label("bucket")
+    rows = (
+        db.query(bucket, split_column, func.sum(amount))
+        .filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.date >= start_date,
+            models.Transaction.date <= end_date,
+        )
+        .group_by(bucket, split_column)
+        .all()
+    )
+
+    buckets = bucket_range(start_date, end_date, granularity)
+    position = {day: index for index, day in enumerate(buckets)}
+    series = {name: [ZERO] * len(buckets) for name in (TRANSACTION_TYPES if split_by == "type" else ())}
+    for bucket_value, name, total in rows:
+        if name not in series:
+            series[name] = [ZERO] * len(buckets)
+        series[name][position[as_date(bucket_value)]] = total or ZERO
+
+    return {"labels": [day.isoformat() for day in buckets], "series": series}
@@ -0,0 +1,249 @@
+from datetime import date
+import numpy as np
+from sqlalchemy import BigInteger, func, select, type_coerce
+from sqlalchemy.orm import Session
+from app import cache, fx, models, rollups
+from app.config import get_settings
+from app.money import from_cents, to_json
+
+# Spending analytics over a user's last HISTORY_YEARS of transactions:
+# rolling means of daily expense, z-score anomalies per category and month,
+# a month-end cash-flow projection and seasonality factors.
+#
+# Two columnar fetches, each one query turned straight into NumPy arrays (no
+# ORM objects): per-day income/expense for the last PROJECTION_LOOKBACK months
+# from transactions, and the per-category monthly expense of the whole
+# history from the monthly rollup. Everything else is bincount/cumsum over
+# days and categories x months, so the cost follows the length of the
+# history, not the number of transactions.
+# Amounts go out as decimal strings, like the API's Money fields; factors and
+# z-scores stay numbers. Results are cached per (user, data_version): any
+# write makes them stale.
+
+HISTORY_YEARS = get_settings().analytics_history_years
+ANALYTICS_CACHE_TTL = get_settings().analytics_cache_ttl
+ROLLING_WINDOWS = (7, 30)
+ROLLING_DAYS = 90  # days of rolling means returned
+ANOMALY_LOOKBACK = 12  # trailing months a month is compared with
+ANOMALY_MIN_HISTORY = 3  # months of history a category needs before it is flagged
+ANOMALY_MONTHS = 12  # recent months reported
+ANOMALY_Z = get_settings().analytics_anomaly_z
+PROJECTION_LOOKBACK = 12  # complete months the rest-of-month rate comes from
+
+_results = cache.create_cache(
+    "analytics",
+    maxsize=get_settings().analytics_cache_size,
+    ttl=ANALYTICS_CACHE_TTL,
+)
+
+
+def _units(cents) -> str:
+    # NumPy sums and means are float cents; round to a whole cent first
+    return to_json(from_cents(round(float(cents))))
+
+
+def _factor(value) -> float:
+    return round(float(value), 3)
+
+
+# --- LOADING ---
+
+def load_daily(db: Session, user_id: int, currency: str, start: date, end: date):
+    """Columnar (day offset from ``start``, is_expense, cents) arrays for [start, end].
+
+    One row per (date, type), summed and converted to ``currency`` by the database.
+    """
+    Tx = models.Transaction
+    rows = db.execute(
+        select(Tx.date, Tx.transaction_type, type_coerce(func.sum(fx.converted_amount(currency)), BigInteger))
+        .where(Tx.user_id == user_id, Tx.date.between(start, end))
+        .group_by(Tx.date, Tx.transaction_type)
+    ).all()
+    days, types, cents = zip(*rows) if rows else ((), (), ())
+    return (
+        (np.array(days, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64),
+        np.array(types, dtype=str) == "expense",
+        np.array(cents, dtype=np.float64),
+    )
+
+
+def load_monthly(db: Session, user_id: int, start: date, end: date):
+    """Columnar (month offset from ``start``, category names, category index, cents) expense arrays.
+
+    Read from the monthly rollup, which is already summed per category and
+    kept in the base currency, so years of history cost a few hundred rows.
+    Months after ``end`` (future-dated transactions) are left out.
+    """
+    M = models.MonthlyCategoryTotal
+    rows = db.execute(
+        select(M.month, M.category, type_coerce(M.amount, BigInteger))
+        .where(
+            M.user_id == user_id,
+            M.transaction_type == "expense",
+            M.month.between(start, end),
+            M.transaction_count > 0,
+        )
+    ).all()
+    months, categories, cents = zip(*rows) if rows else ((), (), ())
+    names, category_index = np.unique(np.array(categories, dtype=str), return_inverse=True)
+    return (
+        (np.array(months, dtype="datetime64[M]") - np.datetime64(start, "M")).astype(np.int64),
+        names,
+        category_index.astype(np.int64),
+        np.array(cents, dtype=np.float64),
+    )
+
+
+# --- REDUCTIONS ---
+
+def rolling_means(daily: np.ndarray, window: int) -> np.ndarray:
+    """Trailing ``window``-day mean for every day (shorter windows at the start)."""
+    sums = np.concatenate(([0.0], np.cumsum(daily)))
+    ends = np.arange(1, len(daily) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def trailing_stats(matrix: np.ndarray, valid: np.ndarray, lookback: int):
+    """Mean, std and count of the valid cells among the ``lookback`` columns before each one."""
+    def prefix(values):
+        return np.concatenate((np.zeros((values.shape[0], 1)), np.cumsum(values, axis=1)), axis=1)
+
+    ends = np.arange(matrix.shape[1])
+    starts = np.maximum(ends - lookback, 0)
+    masked = np.where(valid, matrix, 0.0)
+    sums, squares, counts = prefix(masked), prefix(masked ** 2), prefix(valid.astype(np.float64))
+    count = counts[:, ends] - counts[:, starts]
+    safe = np.maximum(count, 1)
+    mean = (sums[:, ends] - sums[:, starts]) / safe
+    variance = (squares[:, ends] - squares[:, starts]) / safe - mean ** 2
+    return mean, np.sqrt(np.maximum(variance, 0.0)), count
+
+
+def find_anomalies(matrix: np.ndarray, names, months, complete: int) -> list:
+    """Category-months whose expense is ANOMALY_Z standard deviations off the trailing mean.
+
+    ``matrix`` is categories x months; a category's history starts at its
+    first month with spending. Column ``complete`` onwards is the running
+    month, which is partial and therefore only flagged for being high.
+    """
+    spent = matrix > 0
+    first = np.where(spent.any(axis=1), spent.argmax(axis=1), matrix.shape[1])
+    valid = np.arange(matrix.shape[1]) >= first[:, None]
+    mean, std, count = trailing_stats(matrix, valid, ANOMALY_LOOKBACK)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (matrix - mean) / std, 0.0)
+
+    flagged = valid & (count >= ANOMALY_MIN_HISTORY) & (np.abs(z) >= ANOMALY_Z)
+    flagged[:, :max(complete - ANOMALY_MONTHS, 0)] = False
+    flagged[:, complete:] &= z[:, complete:] > 0
+
+    rows, columns = np.nonzero(flagged)
+    order = np.lexsort((-np.abs(z[rows, columns]), -columns))
+    return [
+        {
+            "month": f"{months[column]}-01",
+            "category": str(names[row]),
+            "amount": _units(matrix[row, column]),
+            "expected": _units(mean[row, column]),
+            "z_score": _factor(z[row, column]),
+        }
+        for row, column in zip(rows[order], columns[order])
+    ]
+
+
+def _relative(totals: np.ndarray, counts: np.ndarray, overall: float) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where((counts > 0) & (overall > 0), totals / np.maximum(counts, 1) / overall, 1.0)
+
+
+# --- REPORT ---
+
+def compute_analytics(db: Session, user_id: int, currency: str = fx.DEFAULT_CURRENCY, today: date = None) -> dict:
+    today = today or date.today()
+    this_month = np.datetime64(today, "M")
+
+    # Daily flows since the start of the projection lookback: one slot per day
+    daily_start = (this_month - PROJECTION_LOOKBACK).astype("datetime64[D]").item()
+    days, is_expense, cents = load_daily(db, user_id, currency, daily_start, today)
+    calendar = np.datetime64(daily_start, "D") + np.arange((today - daily_start).days + 1)
+    month_of_day = calendar.astype("datetime64[M]")
+    day_of_month = (calendar - month_of_day.astype("datetime64[D]")).astype(np.int64) + 1
+    weekdays = (calendar.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; 0 = Monday
+    n_days = len(calendar)
+    first_day = int(days.min()) if days.size else n_days - 1
+    daily_expense = np.bincount(days[is_expense], weights=cents[is_expense], minlength=n_days)
+    daily_income = np.bincount(days[~is_expense], weights=cents[~is_expense], minlength=n_days)
+
+    # Rolling means of daily expense
+    recent = slice(max(n_days - ROLLING_DAYS, first_day), n_days)
+    rolling = {"labels": [str(day) for day in calendar[recent]], "expense": [_units(v) for v in daily_expense[recent]]}
+    for window in ROLLING_WINDOWS:
+        rolling[f"mean_{window}"] = [_units(v) for v in rolling_means(daily_expense, window)[recent]]
+
+    # Month-end projection: to-date actuals + the average daily flow of the
+    # same stretch of days (after today's day of month) in the complete months
+    running = month_of_day == this_month
+    tail = (day_of_month > today.day) & ~running & (np.arange(n_days) >= first_day)
+    tail_days = max(int(tail.sum()), 1)
+    days_remaining = int(((this_month + 1).astype("datetime64[D]") - np.datetime64(today, "D")).astype(np.int64)) - 1
+    income_to_date, expense_to_date = daily_income[running].sum(), daily_expense[running].sum()
+    projected_income = income_to_date + daily_income[tail].sum() / tail_days * days_remaining
+    projected_expense = expense_to_date + daily_expense[tail].sum() / tail_days * days_remaining
+
+    # Anomalies: categories x months expense matrix from the first month with data
+    history_start = date(today.year - HISTORY_YEARS, today.month, 1)
+    months, names, category_index, amounts = load_monthly(db, user_id, history_start, rollups.month_start(today))
+    n_months = HISTORY_YEARS * 12 + 1
+    first_month = int(months.min()) if months.size else n_months - 1
+    matrix = np.bincount(
+        category_index * n_months + months, weights=amounts, minlength=len(names) * n_months
+    ).reshape(len(names), n_months)[:, first_month:]
+    labels = np.datetime64(history_start, "M") + np.arange(first_month, n_months)
+    complete = n_months - 1 - first_month
+    anomalies = find_anomalies(matrix, names, labels, complete)
+
+    # Seasonality: complete months by month of year, days before today by weekday
+    monthly = matrix.sum(axis=0)[:complete]
+    month_of_year = labels[:complete].astype(np.int64) % 12
+    seasonal_months = _relative(
+        np.bincount(month_of_year, weights=monthly, minlength=12),
+        np.bincount(month_of_year, minlength=12),
+        monthly.mean() if monthly.size else 0.0,
+    )
+    past = slice(first_day, n_days - 1)
+    seasonal_weekdays = _relative(
+        np.bincount(weekdays[past], weights=daily_expense[past], minlength=7),
+        np.bincount(weekdays[past], minlength=7),
+        daily_expense[past].mean() if daily_expense[past].size else 0.0,
+    )
+
+    return {
+        "currency": currency,
+        "as_of": today.isoformat(),
+        "rolling": rolling,
+        "anomalies": anomalies,
+        "projection": {
+            "month": f"{this_month}-01",
+            "days_remaining": days_remaining,
+            "income_to_date": _units(income_to_date),
+            "expense_to_date": _units(expense_to_date),
+            "projected_income": _units(projected_income),
+            "projected_expense": _units(projected_expense),
+            "projected_net": _units(projected_income - projected_expense),
+        },
+        "seasonality": {
+            "month_of_year": {str(month + 1): _factor(value) for month, value in enumerate(seasonal_months)},
+            "weekday": {str(day): _factor(value) for day, value in enumerate(seasonal_weekdays)},  # 0 = Monday
+        },
+    }
+
+
+def spending_analytics(db: Session, user_id: int, currency: str = fx.DEFAULT_CURRENCY) -> dict:
+    """compute_analytics() behind a cache keyed by the user's data_version."""
+    key = f"{user_id}:{rollups.get_data_version(db, user_id)}:{currency}:{date.today().isoformat()}"
+    result = _results.get(key)
+    if result is None:
+        result = compute_analytics(db, user_id, currency)
+        _results.set(key, result)
+    return result
@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from app.config import get_settings
+
+# Small cache layer with an in-process backend and pluggable shared backends.
+# CACHE_URL selects the backend for every cache the app creates:
+#   (unset) / "memory://"  -> per-worker bounded LRU with TTL
+#   "redis://host:6379/0"  -> shared across workers (needs the "redis" package)
+# Values must be JSON-serialisable so every backend can store them.
+
+CACHE_URL = get_settings().cache_url
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, namespace: str, maxsize: int = 10_000, ttl: float = 60.0):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop(self, key: str) -> Optional[Any]:
+        """get() and delete() in one step: at most one caller gets the value."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Shared backend: every worker sees the same entries and invalidations."""
+
+    def __init__(self, url: str, namespace: str, maxsize: int = 10_000, ttl: float = 60.0):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points at Redis but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any):
+        self.client.set(self._key(key), json.dumps(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    def pop(self, key: str) -> Optional[Any]:
+        # GET and DEL in one MULTI, so two workers cannot both read the value
+        pipe = self.client.pipeline()
+        pipe.get(self._key(key))
+        pipe.delete(self._key(key))
+        raw, _ = pipe.execute()
+        return json.loads(raw) if raw is not None else None
+
+    def clear(self):
+        for key in self.client.scan_iter(match=f"{self.namespace}:*"):
+            self.client.delete(key)
+
+
+# URL scheme -> factory(url, namespace, maxsize, ttl); register_backend() adds more
+BACKENDS: Dict[str, Callable] = {
+    "memory": lambda url, namespace, maxsize, ttl: TTLCache(namespace, maxsize, ttl),
+    "redis": RedisCache,
+    "rediss": RedisCache,
+}
+
+
+def register_backend(scheme: str, factory: Callable):
+    BACKENDS[scheme] = factory
+
+
+def create_cache(namespace: str, maxsize: int = 10_000, ttl: float = 60.0, url: Optional[str] = None):
+    url = url or CACHE_URL
+    scheme = url.split("://", 1)[0]
+    if scheme not in BACKENDS:
+        raise RuntimeError(f"Unsupported CACHE_URL scheme '{scheme}'")
+    return BACKENDS[scheme](url, namespace, maxsize, ttl)
@@ -0,0 +1,210 @@
+import re
+from types import SimpleNamespace
+from typing import Iterable, List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app import models, rollups
+from app.cache import TTLCache
+from app.config import get_settings
+from app.utils import normalize_transaction
+
+# Rule-based auto-categorization.
+# Each user's CategoryRules are compiled once into a Matcher and kept in a
+# per-worker cache (compiled patterns are not serialisable, so this is always
+# in-process); rule edits invalidate it and other workers catch up after
+# CATEGORY_RULE_CACHE_TTL seconds.
+#
+# Matching is a priority-ordered scan of substring tests (see Matcher): on
+# short bank descriptions str.__contains__ is an order of magnitude faster
+# than running a combined regex over the text, and regexes only run once their
+# literal prefix has been seen.
+
+DEFAULT_CATEGORY = "uncategorized"
+MATCH_TYPES = ("contains", "regex")
+RULE_CACHE_TTL = get_settings().category_rule_cache_ttl
+APPLY_BATCH_SIZE = 5000
+# Backreferences and named groups would collide once patterns are combined
+UNSUPPORTED_REGEX = re.compile(r"\\[1-9]|\(\?P[<=]")
+
+_matchers = TTLCache("category_rules", maxsize=10_000, ttl=RULE_CACHE_TTL)
+
+
+def _branch(pattern: str, index: int) -> str:
+    # Lazily skip ahead to the pattern, then close an empty marker group naming the rule
+    return rf"(?:[\s\S]*?(?:{pattern}))(?P<r{index}>)"
+
+
+def normalize_rule(data: dict) -> dict:
+    """Validate and normalize a rule payload in place; raises ValueError."""
+    data["category"] = (data.get("category") or "").strip().lower()
+    if not data["category"]:
+        raise ValueError("category is required")
+    data["match_type"] = (data.get("match_type") or "contains").strip().lower()
+    if data["match_type"] not in MATCH_TYPES:
+        raise ValueError(f"Invalid match_type, expected one of: {', '.join(MATCH_TYPES)}")
+    data["pattern"] = (data.get("pattern") or "").strip()
+    if data["match_type"] == "regex":
+        if UNSUPPORTED_REGEX.search(data["pattern"]):
+            raise ValueError("Backreferences and named groups are not supported in rule patterns")
+        try:
+            re.compile(_branch(data["pattern"], 0), re.IGNORECASE)
+        except re.error as exc:
+            raise ValueError(f"Invalid pattern: {exc}")
+    normalize_transaction(data)
+    low, high = data.get("min_amount"), data.get("max_amount")
+    if low is not None and high is not None and low > high:
+        raise ValueError("min_amount cannot be greater than max_amount")
+    return data
+
+
+def _literal_prefix(pattern: str) -> str:
+    """A lower-case substring every match of ``pattern`` must contain ("" if none is obvious)."""
+    if "|" in pattern:
+        return ""
+    prefix = []
+    for char in pattern.lstrip("^"):
+        if char.isascii() and (char.isalnum() or char == " "):
+            prefix.append(char)
+            continue
+        if char in "?*{":
+            prefix = prefix[:-1]  # the previous character is optional
+        break
+    return "".join(prefix).lower()
+
+
+class Matcher:
+    """One user's rules, compiled; ``match()`` returns the first matching rule's category.
+
+    Rules are scanned in priority order and each is gated by a substring test
+    on the lower-cased description: the pattern itself for "contains" rules, a
+    literal prefix for regexes, so a regex only runs when it can match.
+    Regexes without such a prefix share one combined alternation that finds
+    the first of them that matches in a single pass.
+    """
+
+    def __init__(self, rules: Iterable[models.CategoryRule]):
+        self.rules = [(rule.category, rule.transaction_type, rule.min_amount, rule.max_amount) for rule in rules]
+        self.scan = []  # (index, literal gate, compiled regex or None, covered by the combined alternation)
+        combined = []
+        for index, rule in enumerate(rules):
+            if rule.match_type != "regex":
+                self.scan.append((index, rule.pattern.lower(), None, False))
+                continue
+            compiled = re.compile(rule.pattern, re.IGNORECASE)
+            prefix = _literal_prefix(rule.pattern)
+            self.scan.append((index, prefix, compiled, not prefix))
+            if not prefix:
+                combined.append(_branch(rule.pattern, index))
+        self.combined = re.compile("|".join(combined), re.IGNORECASE) if combined else None
+        self.regex_count = sum(1 for entry in self.scan if entry[2] is not None)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _accepts(self, index: int, transaction_type: str, amount) -> bool:
+        _, wanted_type, low, high = self.rules[index]
+        return (
+            (wanted_type is None or wanted_type == transaction_type)
+            and (low is None or amount >= low)
+            and (high is None or amount <= high)
+        )
+
+    def match(self, description: Optional[str], transaction_type: str, amount) -> Optional[str]:
+        text = description or ""
+        lowered = text.lower()
+        first_combined = None  # index of the first combined regex that matches, found lazily
+        for index, literal, compiled, in_combined in self.scan:
+            if literal not in lowered:
+                continue
+            if in_combined:
+                if first_combined is None:
+                    found = self.combined.match(text)
+                    first_combined = int(found.lastgroup[1:]) if found else len(self.rules)
+                if index < first_combined:
+                    continue
+                # Past the first hit (its type/amount bounds failed) the rest are checked one by one
+                if index > first_combined and not compiled.search(text):
+                    continue
+            elif compiled is not None and not compiled.search(text):
+                continue
+            if self._accepts(index, transaction_type, amount):
+                return self.rules[index][0]
+        return None
+
+
+def get_matcher(db: Session, user_id: int) -> Matcher:
+    matcher = _matchers.get(str(user_id))
+    if matcher is None:
+        R = models.CategoryRule
+        rules = db.query(R).filter(R.user_id == user_id).order_by(R.priority, R.id).all()
+        matcher = Matcher(rules)
+        _matchers.set(str(user_id), matcher)
+    return matcher
+
+
+def invalidate(user_id: int):
+    _matchers.delete(str(user_id))
+
+
+def needs_category(category: Optional[str]) -> bool:
+    return not category or category == DEFAULT_CATEGORY
+
+
+def categorize(matcher: Matcher, data: dict) -> dict:
+    """Fill in a missing/default category from ``matcher``, in place."""
+    if needs_category(data.get("category")):
+        found = matcher.match(data.get("description"), data["transaction_type"], data["amount"])
+        data["category"] = found or DEFAULT_CATEGORY
+    return data
+
+
+def apply_rules(db: Session, user_id: int, criteria: List, only_uncategorized: bool = True) -> dict:
+    """Re-run the user's rules over existing rows matching ``criteria`` (no commit).
+
+    Rows are read in id-keyset batches and each batch is written back with one
+    UPDATE per resulting category, moving the rollups by the rows that changed.
+    """
+    Tx = models.Transaction
+    matcher = get_matcher(db, user_id)
+    report = {"scanned": 0, "updated": 0, "categories": {}}
+    if not len(matcher):
+        return report
+    scope = [Tx.user_id == user_id, *criteria]
+    if only_uncategorized:
+        scope.append(Tx.category == DEFAULT_CATEGORY)
+
+    last_id = 0
+    while True:
+        batch = (
+            db.query(Tx.id, Tx.user_id, Tx.transaction_type, Tx.category, Tx.amount, Tx.currency, Tx.date, Tx.description)
+            .filter(*scope, Tx.id > last_id)
+            .order_by(Tx.id)
+            .limit(APPLY_BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            return report
+        last_id = batch[-1].id
+        report["scanned"] += len(batch)
+
+        moves = {}
+        for row in batch:
+            category = matcher.match(row.description, row.transaction_type, row.amount)
+            if category is not None and category != row.category:
+                moves.setdefault(category, []).append(row)
+        if not moves:
+            continue
+
+        rollups.apply(db, [row for rows in moves.values() for row in rows], sign=-1)
+        recategorized = []
+        for category, rows in moves.items():
+            db.execute(
+                update(Tx)
+                .where(Tx.user_id == user_id, Tx.id.in_([row.id for row in rows]))
+                .values(category=category)
+                .execution_options(synchronize_session=False)
+            )
+            recategorized.extend(SimpleNamespace(**{**row._asdict(), "category": category}) for row in rows)
+            report["categories"][category] = report["categories"].get(category, 0) + len(rows)
+        rollups.apply(db, recategorized)
+        report["updated"] += len(recategorized)
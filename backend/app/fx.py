@@ -0,0 +1,309 @@
+import argparse
+import bisect
+import csv
+import re
+import sys
+import threading
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Iterable
+from sqlalchemy import Numeric, case, event, func, select, tuple_, type_coerce, union
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+from app import models, dbm, schema
+from app.config import get_settings
+from app.money import CENT, Cents
+
+# Currency conversion.
+# Rates live in fx_rates, one row per (currency, quote, date) meaning
+# 1 <currency> = <rate> <quote>. They are loaded from a CSV file with
+# date,currency,quote,rate columns; the inverse pair is stored alongside so
+# every lookup is a direct one:
+#
+#   python -m app.fx load rates.csv
+#
+# Reports convert in SQL (converted_amount() picks the nearest rate per row
+# inside the aggregate query); the rollup write path converts in Python
+# through the in-memory RateCache, which answers nearest-date lookups by bisect.
+#
+# A load also rebuilds the rollups of every user holding a currency it
+# touched (amounts already converted at the old rates would otherwise stay),
+# which bumps their data_version, and records itself in fx_rate_loads: each
+# worker's RateCache checks that once per DB transaction and reloads when a
+# newer load shows up.
+
+DEFAULT_CURRENCY = "USD"
+FX_CACHE_TTL = get_settings().fx_cache_ttl  # also reload after this (rates written outside load_rates)
+CURRENCY_CODE = re.compile(r"^[A-Z]{3}$")
+RATE_PLACES = Decimal("0.0000000001")
+BATCH_SIZE = 1000
+
+
+class MissingRate(ValueError):
+    pass
+
+
+def normalize_currency(code: str) -> str:
+    code = (code or "").strip().upper()
+    if not CURRENCY_CODE.match(code):
+        raise ValueError(f"Invalid currency code '{code}'")
+    return code
+
+
+# --- IN-MEMORY RATE CACHE ---
+
+class RateCache:
+    """Per-pair sorted (dates, rates) lists loaded from fx_rates in one query."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._pairs = None
+        self._loaded_at = 0.0
+        self._load_id = 0
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session) -> dict:
+        load_id = _latest_load(db)
+        with self._lock:
+            stale = load_id > self._load_id or time.monotonic() - self._loaded_at > self.ttl
+            if self._pairs is None or stale:
+                Fx = models.FxRate
+                pairs = {}
+                for currency, quote, day, rate in db.query(Fx.currency, Fx.quote, Fx.date, Fx.rate).order_by(
+                    Fx.currency, Fx.quote, Fx.date
+                ):
+                    dates, rates = pairs.setdefault((currency, quote), ([], []))
+                    dates.append(day)
+                    rates.append(Decimal(rate))
+                self._pairs = pairs
+                self._loaded_at = time.monotonic()
+                self._load_id = max(self._load_id, load_id)
+            return self._pairs
+
+    def invalidate(self):
+        with self._lock:
+            self._pairs = None
+
+    def has_pair(self, db: Session, currency: str, quote: str) -> bool:
+        return currency == quote or (currency, quote) in self._load(db)
+
+    def rate(self, db: Session, currency: str, quote: str, day: date) -> Decimal:
+        """Rate on the nearest date at or before ``day``, else the first one after it."""
+        if currency == quote:
+            return Decimal(1)
+        series = self._load(db).get((currency, quote))
+        if series is None:
+            raise MissingRate(f"No FX rate for {currency} -> {quote}")
+        dates, rates = series
+        return rates[max(bisect.bisect_right(dates, day) - 1, 0)]
+
+
+rates = RateCache(FX_CACHE_TTL)
+
+_LOAD_ID = "fx_load_id"
+
+
+def _latest_load(db: Session) -> int:
+    """Newest fx_rate_loads id, read once per DB transaction."""
+    if _LOAD_ID not in db.info:
+        db.info[_LOAD_ID] = db.query(func.max(models.FxRateLoad.id)).scalar() or 0
+    return db.info[_LOAD_ID]
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_load(session):
+    session.info.pop(_LOAD_ID, None)
+
+
+def convert(db: Session, amount: Decimal, currency: str, quote: str, day: date) -> Decimal:
+    if currency == quote:
+        return amount
+    return (amount * rates.rate(db, currency, quote, day)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def check_currency(db: Session, currency: str, base: str) -> str:
+    """Normalize ``currency`` and make sure it converts to ``base``; raises ValueError."""
+    currency = normalize_currency(currency)
+    if not rates.has_pair(db, currency, base):
+        raise MissingRate(f"No FX rate for {currency} -> {base}")
+    return currency
+
+
+def base_currencies(db: Session, user_ids: Iterable[int]) -> dict:
+    rows = db.query(models.User.id, models.User.base_currency).filter(models.User.id.in_(set(user_ids)))
+    return {user_id: base or DEFAULT_CURRENCY for user_id, base in rows}
+
+
+def missing_rates(db: Session, user_id: int, base: str) -> list:
+    """Currencies the user's transactions or recurring rules use that have no rate to ``base``."""
+    Tx, Rule, Fx = models.Transaction, models.RecurringRule, models.FxRate
+    held = union(
+        select(Tx.currency).where(Tx.user_id == user_id),
+        select(Rule.currency).where(Rule.user_id == user_id),
+    ).subquery()
+    quoted = select(Fx.currency).where(Fx.quote == base).distinct()
+    rows = db.execute(select(held.c.currency).where(held.c.currency != base, held.c.currency.not_in(quoted)))
+    return sorted(currency for (currency,) in rows)
+
+
+# --- SQL CONVERSION ---
+
+class no_rate(FunctionElement):
+    """Stands in for a missing rate and raises when evaluated.
+
+    A NULL would make SUM() skip the row and the totals silently shrink.
+    """
+
+    type = Numeric()
+    inherit_cache = True
+
+
+@compiles(no_rate)
+def _no_rate_default(element, compiler, **kw):
+    return "NULL"  # no portable way to raise on other dialects
+
+
+@compiles(no_rate, "postgresql")
+def _no_rate_postgresql(element, compiler, **kw):
+    return f"CAST(({compiler.process(element.clauses, **kw)}) || ' has no FX rate' AS NUMERIC)"
+
+
+@compiles(no_rate, "sqlite")
+def _no_rate_sqlite(element, compiler, **kw):
+    return f"json(({compiler.process(element.clauses, **kw)}) || ' has no FX rate')"
+
+
+def _nearest_rate(base, before: bool):
+    Fx, Tx = models.FxRate, models.Transaction
+    query = select(Fx.rate).where(Fx.currency == Tx.currency, Fx.quote == base)
+    if before:
+        query = query.where(Fx.date <= Tx.date).order_by(Fx.date.desc())
+    else:
+        query = query.where(Fx.date > Tx.date).order_by(Fx.date)
+    return query.limit(1).scalar_subquery()
+
+
+def converted_amount(base):
+    """Transaction.amount in ``base`` (a currency code, or a column such as User.base_currency).
+
+    Rows already in the base currency skip the lookup. Others use the same
+    nearest-date rule as RateCache via (currency, quote, date) primary-key
+    probes, rounded to whole cents like the Python path. A row with no rate
+    to ``base`` fails the query (see no_rate) rather than dropping out.
+    """
+    Tx = models.Transaction
+    rate = func.coalesce(
+        _nearest_rate(base, before=True), _nearest_rate(base, before=False), no_rate(Tx.currency)
+    )
+    return case(
+        (Tx.currency == base, Tx.amount),
+        else_=type_coerce(func.round(type_coerce(Tx.amount, Cents.impl) * rate), Cents),
+    )
+
+
+# --- LOADING ---
+
+def _upsert_rates(db: Session, rows: list):
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        for row in rows:
+            db.merge(models.FxRate(**row))
+        return
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(models.FxRate).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["currency", "quote", "date"],
+        set_={"rate": stmt.excluded.rate},
+    ))
+
+
+def affected_users(db: Session, pairs: Iterable[tuple]) -> list:
+    """Users with transactions in ``currency`` whose base currency is ``quote``, for any pair."""
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    Tx, User = models.Transaction, models.User
+    rows = (
+        db.query(Tx.user_id)
+        .join(User, User.id == Tx.user_id)
+        .filter(tuple_(Tx.currency, User.base_currency).in_(pairs))
+        .distinct()
+    )
+    return sorted(user_id for (user_id,) in rows)
+
+
+def load_rates(db: Session, text_stream) -> dict:
+    """Upsert rates from CSV text (date,currency,quote,rate) plus their inverses.
+
+    Rebuilds the rollups of the users whose conversions changed, in the same
+    commit, and reports them as ``users``.
+    """
+    from app import rollups  # rollups imports fx
+
+    report = {"rates": 0, "errors": [], "users": []}
+    batch = {}
+    pairs = set()
+    for number, record in enumerate(csv.DictReader(text_stream), start=2):
+        try:
+            day = date.fromisoformat(record["date"].strip())
+            currency = normalize_currency(record["currency"])
+            quote = normalize_currency(record["quote"])
+            try:
+                rate = Decimal(record["rate"].strip())
+            except InvalidOperation:
+                raise ValueError(f"Invalid rate '{record['rate']}'")
+            if rate <= 0 or currency == quote:
+                raise ValueError("rate must be positive and between two different currencies")
+        except (KeyError, AttributeError, ValueError) as exc:
+            report["errors"].append({"row": number, "error": str(exc) or "invalid row"})
+            continue
+        batch[(currency, quote, day)] = rate.quantize(RATE_PLACES)
+        batch.setdefault((quote, currency, day), (1 / rate).quantize(RATE_PLACES))
+        pairs.update([(currency, quote), (quote, currency)])
+        if len(batch) >= BATCH_SIZE:
+            report["rates"] += len(batch)
+            _upsert_rates(db, [{"currency": c, "quote": q, "date": d, "rate": r} for (c, q, d), r in batch.items()])
+            batch = {}
+    if batch:
+        report["rates"] += len(batch)
+        _upsert_rates(db, [{"currency": c, "quote": q, "date": d, "rate": r} for (c, q, d), r in batch.items()])
+    if report["rates"]:
+        db.add(models.FxRateLoad(rates=report["rates"]))
+        report["users"] = affected_users(db, pairs)
+        if report["users"]:
+            rollups.rebuild(db, report["users"])  # bumps their data_version
+    db.commit()
+    rates.invalidate()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load FX rates from a CSV file (date,currency,quote,rate)")
+    parser.add_argument("command", choices=["load"])
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    schema.require_head(dbm.engine)
+    db = dbm.SessionLocal()
+    try:
+        with open(args.path, newline="", encoding="utf-8-sig") as handle:
+            report = load_rates(db, handle)
+    finally:
+        db.close()
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+    print(
+        f"Loaded {report['rates']} rate(s), {len(report['errors'])} error(s);"
+        f" rebuilt rollups for {len(report['users'])} user(s)"
+    )
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import date
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from app import cache, dbm, rollups
+from app.config import get_settings
+
+# Conditional GETs for per-user read endpoints.
+# ETags hash (user, data_version, endpoint, params, today). data_version is
+# bumped by every transaction/goal write, so a matching If-None-Match gets a
+# 304 after one primary-key lookup, without running the endpoint's queries.
+# Computed bodies are also kept briefly under the same key.
+
+RESPONSE_CACHE_TTL = get_settings().response_cache_ttl
+response_cache = cache.create_cache(
+    "responses",
+    maxsize=get_settings().response_cache_size,
+    ttl=RESPONSE_CACHE_TTL,
+)
+
+
+def make_etag(user_id: int, version: int, endpoint: str, params: str) -> str:
+    # today() is part of the key because several reports are relative to it
+    raw = f"{user_id}:{version}:{endpoint}:{params}:{date.today().isoformat()}"
+    return 'W/"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _load(db: Session, user_id: int, endpoint: str, params: str, if_none_match: str, compute, args):
+    version = rollups.get_data_version(db, user_id)
+    etag = make_etag(user_id, version, endpoint, params)
+    if etag_matches(if_none_match, etag):
+        return etag, None
+
+    body = response_cache.get(etag)
+    if body is None:
+        body = jsonable_encoder(compute(db, user_id, *args))
+        response_cache.set(etag, body)
+    return etag, body
+
+
+async def fetch(request: Request, run: dbm.SessionRunner, user_id: int, compute, *args):
+    """Returns (etag, body); body is None when the client's copy is still current.
+
+    ``compute(db, user_id, *args)`` runs only on a cache miss, in the same
+    session hop as the version lookup.
+    """
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return await run(
+        _load, user_id, request.url.path, params, request.headers.get("if-none-match", ""), compute, args
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def json_response(etag: str, body, headers: dict = None) -> JSONResponse:
+    return JSONResponse(body, headers={"ETag": etag, "Cache-Control": "private, no-cache", **(headers or {})})
+
+
+async def cached_json(request: Request, run: dbm.SessionRunner, user_id: int, compute, *args) -> Response:
+    etag, body = await fetch(request, run, user_id, compute, *args)
+    return not_modified(etag) if body is None else json_response(etag, body)
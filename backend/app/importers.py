@@ -0,0 +1,276 @@
+import argparse
+import csv
+import io
+import re
+import sys
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from types import SimpleNamespace
+from typing import Iterable, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app import models, schemas, dbm, rollups, fx, categorizer, live, schema
+from app.money import CENT
+from app.utils import normalize_transaction
+
+# Bulk transaction import.
+# Parsers stream a bank statement (CSV, OFX or QIF) record by record; the
+# pipeline validates each record with the same rules as POST /transactions,
+# fills missing categories from the user's category rules, skips rows that
+# already exist and inserts the rest in batches:
+#
+#   python -m app.importers statement.csv --user-email me@example.com
+
+BATCH_SIZE = 1000
+DEFAULT_CATEGORY = categorizer.DEFAULT_CATEGORY
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%Y%m%d", "%d.%m.%Y", "%m/%d/%y")
+
+# (line/record number, raw fields or None, error message or None)
+ParsedRecord = Tuple[int, Optional[dict], Optional[str]]
+
+
+# --- PARSING HELPERS ---
+
+def parse_date(value: str) -> date:
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+
+def parse_amount(value: str) -> Decimal:
+    cleaned = value.strip().replace(",", "").replace("$", "")
+    try:
+        return Decimal(cleaned).quantize(CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'")
+
+
+def signed_record(amount: Decimal, fields: dict) -> dict:
+    """Derive the transaction type from the amount's sign when none is given."""
+    if not fields.get("transaction_type"):
+        fields["transaction_type"] = "expense" if amount < 0 else "income"
+    fields["amount"] = abs(amount)
+    fields.setdefault("category", DEFAULT_CATEGORY)
+    if not fields["category"]:
+        fields["category"] = DEFAULT_CATEGORY
+    return fields
+
+
+# --- PARSERS ---
+
+def parse_csv(stream: Iterable[str]) -> Iterator[ParsedRecord]:
+    """Columns: date, amount, and optionally type/transaction_type, category, currency, description."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        row = {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+        try:
+            amount = parse_amount(row.get("amount", ""))
+            yield reader.line_num, signed_record(amount, {
+                "transaction_type": row.get("transaction_type") or row.get("type"),
+                "category": row.get("category"),
+                "currency": row.get("currency") or None,
+                "date": parse_date(row.get("date", "")),
+                "description": row.get("description") or row.get("memo") or None,
+            }), None
+        except ValueError as exc:
+            yield reader.line_num, None, str(exc)
+
+
+def parse_ofx(stream: Iterable[str]) -> Iterator[ParsedRecord]:
+    """Reads <STMTTRN> blocks from OFX 1.x (SGML) or 2.x (XML) statements."""
+    record, number, currency = None, 0, None
+    for line in stream:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "CURDEF" and not closing:
+                currency = value.strip() or None  # statement currency
+            elif tag == "STMTTRN" and not closing:
+                record, number = {}, number + 1
+            elif tag == "STMTTRN" and record is not None:
+                try:
+                    amount = parse_amount(record.get("TRNAMT", ""))
+                    yield number, signed_record(amount, {
+                        "date": parse_date(record.get("DTPOSTED", "")[:8]),
+                        "currency": currency,
+                        "description": record.get("NAME") or record.get("MEMO"),
+                    }), None
+                except ValueError as exc:
+                    yield number, None, str(exc)
+                record = None
+            elif record is not None and not closing:
+                record[tag] = value.strip()
+
+
+def parse_qif(stream: Iterable[str]) -> Iterator[ParsedRecord]:
+    """Reads QIF bank records (D date, T amount, P payee, M memo, L category, ^ end)."""
+    record, number = {}, 0
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("!"):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code != "^":
+            record[code] = value
+            continue
+        number += 1
+        try:
+            amount = parse_amount(record.get("T") or record.get("U", ""))
+            yield number, signed_record(amount, {
+                "category": record.get("L"),
+                "date": parse_date(record.get("D", "").replace("'", "/")),
+                "description": record.get("P") or record.get("M"),
+            }), None
+        except ValueError as exc:
+            yield number, None, str(exc)
+        record = {}
+
+
+PARSERS = {"csv": parse_csv, "ofx": parse_ofx, "qfx": parse_ofx, "qif": parse_qif}
+
+
+def detect_format(filename: str) -> str:
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension not in PARSERS:
+        raise ValueError(f"Unsupported file type '{extension}' (expected one of {', '.join(PARSERS)})")
+    return extension
+
+
+# --- PIPELINE ---
+
+def _dedupe_key(row) -> tuple:
+    return (
+        row["date"], round(row["amount"], 2), row["currency"], row["transaction_type"], row["category"],
+        row["description"] or "",
+    )
+
+
+def _insert_batch(
+    db: Session, user_id: int, batch: list, skip_duplicates: bool, report: dict, imported: Counter, matched: Counter
+):
+    """Insert ``batch``, skipping rows that were in the database before this import.
+
+    ``imported`` counts the keys this import has inserted so far and
+    ``matched`` the pre-existing rows earlier rows were skipped against; both
+    carry over between batches, so the outcome does not depend on batch size.
+    """
+    if skip_duplicates:
+        # One range query per batch; Counter keeps genuine same-day repeats.
+        # It also sees this import's own inserts, which are not duplicates.
+        Tx = models.Transaction
+        existing = Counter(
+            _dedupe_key({"date": d, "amount": a, "currency": cur, "transaction_type": t, "category": c, "description": desc})
+            for d, a, cur, t, c, desc in db.query(
+                Tx.date, Tx.amount, Tx.currency, Tx.transaction_type, Tx.category, Tx.description
+            )
+            .filter(
+                Tx.user_id == user_id,
+                Tx.date.between(min(row["date"] for row in batch), max(row["date"] for row in batch)),
+            )
+        )
+        fresh = []
+        for row in batch:
+            key = _dedupe_key(row)
+            if existing[key] - imported[key] - matched[key] > 0:
+                matched[key] += 1
+                report["duplicates"] += 1
+            else:
+                fresh.append(row)
+        batch = fresh
+        imported.update(_dedupe_key(row) for row in batch)
+
+    if batch:
+        db.execute(insert(models.Transaction), batch)
+        rollups.apply(db, [SimpleNamespace(**row) for row in batch])
+        report["inserted"] += len(batch)
+
+
+def import_transactions(
+    db: Session,
+    user_id: int,
+    records: Iterable[ParsedRecord],
+    skip_duplicates: bool = True,
+    batch_size: int = BATCH_SIZE,
+) -> dict:
+    """Validate, de-duplicate and insert parsed records in one DB transaction.
+
+    Invalid rows are reported and skipped; they never abort the import.
+    """
+    report = {"inserted": 0, "duplicates": 0, "errors": []}
+    base = fx.base_currencies(db, [user_id]).get(user_id, fx.DEFAULT_CURRENCY)
+    matcher = categorizer.get_matcher(db, user_id)
+    batch, imported, matched = [], Counter(), Counter()
+    for number, fields, error in records:
+        if error is None:
+            try:
+                row = normalize_transaction(schemas.TransactionCreate(**fields).dict())
+                row["currency"] = fx.check_currency(db, row["currency"] or base, base)
+                categorizer.categorize(matcher, row)
+            except (ValidationError, ValueError) as exc:
+                error = "; ".join(e["msg"] for e in exc.errors()) if isinstance(exc, ValidationError) else str(exc)
+        if error is not None:
+            report["errors"].append({"row": number, "error": error})
+            continue
+
+        row["user_id"] = user_id
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _insert_batch(db, user_id, batch, skip_duplicates, report, imported, matched)
+            batch = []
+
+    if batch:
+        _insert_batch(db, user_id, batch, skip_duplicates, report, imported, matched)
+    live.publish(db, user_id, "transactions.imported", inserted=report["inserted"])
+    db.commit()
+    return report
+
+
+def import_file(db: Session, user_id: int, binary_stream, fmt: str, skip_duplicates: bool = True) -> dict:
+    """Decode a binary file object as UTF-8 (BOM tolerated) and import it."""
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        return import_transactions(db, user_id, PARSERS[fmt](text), skip_duplicates)
+    finally:
+        text.detach()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import a bank statement for one user")
+    parser.add_argument("path")
+    parser.add_argument("--user-email", required=True)
+    parser.add_argument("--format", choices=sorted(PARSERS), help="defaults to the file extension")
+    parser.add_argument("--allow-duplicates", action="store_true", help="do not skip rows that already exist")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    schema.require_head(dbm.engine)
+    db = dbm.SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == args.user_email).first()
+        if user is None:
+            print(f"No user with email {args.user_email}", file=sys.stderr)
+            return 1
+        started = datetime.now()
+        with open(args.path, "rb") as handle:
+            report = import_file(db, user.id, handle, fmt, not args.allow_duplicates)
+        elapsed = (datetime.now() - started).total_seconds()
+    finally:
+        db.close()
+
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+    print(
+        f"Inserted {report['inserted']}, skipped {report['duplicates']} duplicate(s), "
+        f"{len(report['errors'])} error(s) in {elapsed:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
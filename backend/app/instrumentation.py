@@ -0,0 +1,283 @@
+import contextvars
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, defaultdict
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from app.config import get_settings
+
+# Per-request SQL and latency instrumentation.
+# SQLAlchemy cursor events feed a per-request RequestStats (held in a
+# contextvar, which the threadpool copies into worker threads). The ASGI
+# middleware turns it into:
+#   * a Server-Timing header (db / app / total durations + query count)
+#   * one structured JSON log line per request on the "app.requests" logger
+#   * Prometheus histograms per route, served at GET /metrics when
+#     METRICS_ENABLED=true (Server-Sent Event streams stay open for as long
+#     as the client listens, so they are counted but not timed)
+# PROFILER_ENABLED=true also starts a low-overhead stack sampler whose
+# collapsed stacks (flamegraph input) are served at GET /debug/profile.
+# Set METRICS_TOKEN to require "Authorization: Bearer <token>" on both.
+
+logger = logging.getLogger("app.requests")
+
+SLOW_REQUEST_MS = get_settings().slow_request_ms
+METRICS_ENABLED = get_settings().metrics_enabled
+PROFILER_ENABLED = get_settings().profiler_enabled
+PROFILER_INTERVAL_MS = get_settings().profiler_interval_ms
+METRICS_TOKEN = get_settings().metrics_token
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_ms", "slowest_ms", "slowest_sql")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# --- SQLALCHEMY HOOKS ---
+
+_instrumented = weakref.WeakSet()  # engines already hooked (create_app() may run more than once)
+
+
+def instrument_engine(engine):
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.queries += 1
+        stats.db_ms += elapsed_ms
+        if elapsed_ms > stats.slowest_ms:
+            stats.slowest_ms = elapsed_ms
+            stats.slowest_sql = statement
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+# --- METRICS REGISTRY ---
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.total += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def render(self, name: str, labels: str) -> list:
+        lines = [
+            f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+            for bound, count in zip(self.buckets, self.counts)
+        ]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.total}')
+        lines.append(f"{name}_sum{{{labels}}} {round(self.sum, 3)}")
+        lines.append(f"{name}_count{{{labels}}} {self.total}")
+        return lines
+
+
+class Metrics:
+    """Per-process metrics (each worker exposes its own; scrape them all)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS_MS))
+        self.db_time = defaultdict(lambda: Histogram(LATENCY_BUCKETS_MS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.responses = Counter()
+
+    def record(self, method: str, route: str, status: int, total_ms: float, stats: RequestStats, timed: bool = True):
+        key = (method, route)
+        with self._lock:
+            if timed:
+                self.latency[key].observe(total_ms)
+                self.db_time[key].observe(stats.db_ms)
+                self.queries[key].observe(stats.queries)
+            self.responses[(method, route, status)] += 1
+
+    def render(self) -> str:
+        from app.utils import hasher_stats
+
+        lines = []
+        with self._lock:
+            for name, help_text, series in (
+                ("http_request_duration_ms", "Request latency", self.latency),
+                ("http_request_db_time_ms", "Time spent in SQL per request", self.db_time),
+                ("http_request_queries", "SQL statements per request", self.queries),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), histogram in sorted(series.items()):
+                    lines += histogram.render(name, f'method="{method}",route="{route}"')
+            lines += ["# HELP http_responses_total Responses by status", "# TYPE http_responses_total counter"]
+            for (method, route, status), count in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+        lines += ["# HELP password_hasher_jobs Password hashing pool state", "# TYPE password_hasher_jobs gauge"]
+        for key, value in hasher_stats().items():
+            lines.append(f'password_hasher_jobs{{state="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# --- ASGI MIDDLEWARE ---
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = {"code": 500, "stream": False}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                status["stream"] = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+                total_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", '
+                    f"app;dur={max(total_ms - stats.db_ms, 0.0):.1f}, total;dur={total_ms:.1f}"
+                )
+                message.setdefault("headers", []).append((b"server-timing", timing.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total_ms = (time.perf_counter() - started) * 1000
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics.record(scope["method"], route, status["code"], total_ms, stats, timed=not status["stream"])
+            record = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status["code"],
+                "duration_ms": round(total_ms, 2),
+                "handler_ms": round(total_ms - stats.db_ms, 2),
+                "db_ms": round(stats.db_ms, 2),
+                "queries": stats.queries,
+                "slowest_query_ms": round(stats.slowest_ms, 2),
+            }
+            if total_ms >= SLOW_REQUEST_MS and not status["stream"]:
+                record["slowest_query"] = (stats.slowest_sql or "")[:500]
+                logger.warning(json.dumps(record))
+            else:
+                logger.info(json.dumps(record))
+
+
+# --- SAMPLING PROFILER ---
+
+class SamplingProfiler:
+    """Samples every thread's Python stack on an interval; cheap enough for hot-path hunts."""
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self, limit: int = 200) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common(limit)) + "\n"
+
+
+profiler = SamplingProfiler(PROFILER_INTERVAL_MS)
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)):
+    if not METRICS_TOKEN:
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+def install(app: FastAPI, *engines):
+    """Wire the engine hooks, middleware and diagnostic endpoints into the app."""
+    for engine in engines:
+        instrument_engine(engine)
+    app.add_middleware(InstrumentationMiddleware)
+
+    if METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+        def prometheus_metrics():
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    if PROFILER_ENABLED:
+        profiler.start()
+
+        @app.get("/debug/profile", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+        def profile(limit: int = 200):
+            return PlainTextResponse(profiler.collapsed(limit))
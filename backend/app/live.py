@@ -0,0 +1,330 @@
+import asyncio
+import copy
+import json
+import logging
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import cache, models
+from app.config import get_settings
+from app.money import ZERO, to_json
+
+# Live dashboard updates, pushed as Server-Sent Events (GET /live/dashboard).
+# Writes describe what they changed with publish() before committing: the
+# rollup deltas rollups.apply() just added, the new row, and the user's totals
+# read inside the same DB transaction. The frames go out once the commit has
+# succeeded; a rollback drops them. Nothing is read or built for users with
+# no open stream on the memory broker.
+#
+# Every worker fans frames out to its own open streams; LIVE_URL selects how
+# frames reach the workers (defaults to CACHE_URL):
+#   "memory://"            -> this worker only
+#   "redis://host:6379/0"  -> Redis pub/sub, shared by every worker and the
+#                             scheduler process (needs the "redis" package)
+
+LIVE_URL = get_settings().live_url or cache.CACHE_URL
+QUEUE_SIZE = get_settings().live_queue_size  # frames buffered per stream before it must resync
+HEARTBEAT = get_settings().live_heartbeat  # seconds between keep-alive comments
+
+# Sent when a stream fell behind and frames were dropped: refetch, then carry on
+RESYNC = "event: resync\ndata: {}\n\n"
+PING = ": ping\n\n"
+
+logger = logging.getLogger("app.live")
+
+_DELTAS = "live_deltas"
+_FRAMES = "live_frames"
+_SAVEPOINTS = "live_savepoints"
+
+
+def frame(event_name: str, data_version: int, data: dict) -> str:
+    """One SSE frame; the id is the user's data_version after the write."""
+    # Amounts (totals, deltas) go out as decimal strings, like the API's Money fields
+    body = json.dumps(jsonable_encoder(data, custom_encoder={Decimal: to_json}), separators=(",", ":"))
+    return f"id: {data_version}\nevent: {event_name}\ndata: {body}\n\n"
+
+
+# --- IN-PROCESS FAN-OUT ---
+
+class Subscription:
+    """One open stream: a bounded queue owned by the event loop that serves it."""
+
+    def __init__(self, user_id: int, maxsize: int = QUEUE_SIZE):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def _put(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client: drop its backlog instead of buffering without bound
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    def put(self, message: str):
+        """Thread-safe; called from whichever thread delivers the message."""
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+
+class Hub:
+    def __init__(self):
+        self._subscriptions: Dict[int, set] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def add(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions[subscription.user_id].add(subscription)
+
+    def discard(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def listening(self, user_id: int) -> bool:
+        return user_id in self._subscriptions
+
+    def deliver(self, user_id: int, message: str):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.put(message)
+            except RuntimeError:  # its event loop has closed
+                self.discard(subscription)
+
+
+hub = Hub()
+
+
+# --- BROKERS ---
+
+class MemoryBroker:
+    """Single worker: frames go straight to this process's streams."""
+
+    def __init__(self, url: str, hub: Hub):
+        self.hub = hub
+
+    def listening(self, user_id: int) -> bool:
+        return self.hub.listening(user_id)
+
+    def publish(self, user_id: int, message: str):
+        self.hub.deliver(user_id, message)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class RedisBroker:
+    """Several workers: frames go through Redis pub/sub, one listener thread per worker."""
+
+    PREFIX = "live:"
+
+    def __init__(self, url: str, hub: Hub):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("LIVE_URL points at Redis but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.hub = hub
+        self._pubsub = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def listening(self, user_id: int) -> bool:
+        return True  # a stream may be open on another worker
+
+    def publish(self, user_id: int, message: str):
+        self.client.publish(f"{self.PREFIX}{user_id}", message)
+
+    def _listen(self, pubsub):
+        for item in pubsub.listen():
+            if item["type"] == "pmessage":
+                user_id = int(item["channel"].decode()[len(self.PREFIX):])
+                self.hub.deliver(user_id, item["data"].decode())
+
+    def start(self):
+        # Started on the first stream this worker serves
+        with self._lock:
+            if self._thread is None:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.psubscribe(f"{self.PREFIX}*")
+                self._thread = threading.Thread(
+                    target=self._listen, args=(self._pubsub,), name="live-redis", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if self._pubsub is not None:
+                self._pubsub.close()
+            self._pubsub = self._thread = None
+
+
+# URL scheme -> factory(url, hub); register_backend() adds more
+BACKENDS: Dict[str, Callable] = {
+    "memory": MemoryBroker,
+    "redis": RedisBroker,
+    "rediss": RedisBroker,
+}
+
+
+def register_backend(scheme: str, factory: Callable):
+    BACKENDS[scheme] = factory
+
+
+def create_broker(url: Optional[str] = None, target: Hub = hub):
+    url = url or LIVE_URL
+    scheme = url.split("://", 1)[0]
+    if scheme not in BACKENDS:
+        raise RuntimeError(f"Unsupported LIVE_URL scheme '{scheme}'")
+    return BACKENDS[scheme](url, target)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = create_broker()
+    return _broker
+
+
+def subscribe(user_id: int) -> Subscription:
+    """Open a stream for ``user_id``; call from the event loop that will read it."""
+    get_broker().start()
+    subscription = Subscription(user_id)
+    hub.add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription: Subscription):
+    hub.discard(subscription)
+
+
+# --- WRITE SIDE ---
+
+def collect(db: Session, month_deltas: dict):
+    """Remember the monthly rollup deltas a write added (rollups.apply() calls this)."""
+    broker = get_broker()
+    pending = db.info.setdefault(_DELTAS, {})
+    for (user_id, month, tx_type, category), deltas in month_deltas.items():
+        if not broker.listening(user_id):
+            continue
+        entry = pending.setdefault(user_id, {}).setdefault(
+            (month, tx_type, category), {"amount": ZERO, "transaction_count": 0}
+        )
+        entry["amount"] += deltas["amount"]
+        entry["transaction_count"] += deltas["transaction_count"]
+
+
+def _delta(moves: dict) -> dict:
+    """What a write moved: its totals plus the (month, type, category) rollup rows."""
+    delta = {"income": ZERO, "expense": ZERO, "transaction_count": 0, "months": []}
+    for (month, tx_type, category), moved in sorted(moves.items()):
+        if not moved["amount"] and not moved["transaction_count"]:
+            continue  # e.g. an update that left a month/category unchanged
+        if tx_type in ("income", "expense"):
+            delta[tx_type] += moved["amount"]
+        delta["transaction_count"] += moved["transaction_count"]
+        delta["months"].append({"month": month, "transaction_type": tx_type, "category": category, **moved})
+    return delta
+
+
+def _queue(db: Session, user_ids: list, event_name: str, data: dict):
+    # One primary-key read for the new totals, inside the write's transaction
+    T = models.UserTotals
+    rows = {
+        row.user_id: row
+        for row in db.query(T.user_id, T.income, T.expense, T.transaction_count, T.data_version).filter(
+            T.user_id.in_(user_ids)
+        )
+    }
+    pending = db.info.get(_DELTAS, {})
+    frames = db.info.setdefault(_FRAMES, [])
+    for user_id in user_ids:
+        row = rows.get(user_id)
+        income, expense = (row.income, row.expense) if row else (ZERO, ZERO)
+        totals = {
+            "income": income,
+            "expense": expense,
+            "balance": income - expense,
+            "transaction_count": row.transaction_count if row else 0,
+        }
+        payload = {**data, "totals": totals, "delta": _delta(pending.pop(user_id, {}))}
+        frames.append((user_id, frame(event_name, row.data_version if row else 0, payload)))
+
+
+def publish(db: Session, user_id: int, event_name: str, **data):
+    """Queue an event for the user's streams; it is sent when ``db`` commits.
+
+    Call after the write's rollup updates and before commit, so the totals
+    and data_version are the ones this write produced.
+    """
+    if get_broker().listening(user_id):
+        _queue(db, [user_id], event_name, data)
+
+
+def publish_pending(db: Session, event_name: str):
+    """publish() for every user with collected deltas (imports, the scheduler)."""
+    user_ids = sorted(db.info.get(_DELTAS, {}))
+    if user_ids:
+        _queue(db, user_ids, event_name, {})
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_savepoint(session, transaction):
+    # What was collected so far, so a savepoint that rolls back takes its own deltas and frames with it
+    if transaction.nested:
+        session.info.setdefault(_SAVEPOINTS, {})[transaction] = (
+            copy.deepcopy(session.info.get(_DELTAS, {})),
+            len(session.info.get(_FRAMES, ())),
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _send_frames(session):
+    if session.in_nested_transaction():
+        return  # a savepoint was released; the frames wait for the real commit
+    session.info.pop(_SAVEPOINTS, None)
+    session.info.pop(_DELTAS, None)
+    frames = session.info.pop(_FRAMES, None)
+    if not frames:
+        return
+    broker = get_broker()
+    for user_id, message in frames:
+        try:
+            broker.publish(user_id, message)
+        except Exception:
+            # The write has committed; a missed frame only costs the client a refetch
+            logger.exception("Could not publish a live update for user %s", user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_frames(session, previous_transaction):
+    if previous_transaction.nested:
+        # Only what the savepoint collected goes
+        marked = session.info.get(_SAVEPOINTS, {}).pop(previous_transaction, None)
+        if marked is not None:
+            deltas, frame_count = marked
+            session.info[_DELTAS] = deltas
+            del session.info.get(_FRAMES, [])[frame_count:]
+    elif previous_transaction.parent is None:
+        session.info.pop(_SAVEPOINTS, None)
+        session.info.pop(_DELTAS, None)
+        session.info.pop(_FRAMES, None)
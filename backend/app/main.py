@@ -1,57 +1,86 @@
 # app/main.py
-from fastapi import FastAPI, Depends, HTTPException
+# uvicorn app.main:app  (or: uvicorn --factory app.main:create_app)
+# The schema is managed by Alembic: run `alembic upgrade head` before starting.
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-import uvicorn
-from app import dbm, models
-from app.routes import auth, transactions, goals, reports
-# import routers
-from app.routes import auth, transactions, goals, reports  # make sure these files exist
-
-app = FastAPI(title="Finance Tracker API", version="1.0")
-
-# CORS config - restrict to dev hosts (do NOT keep "*" in production)
-origins = [
-    "http://localhost:5173",
-    "http://127.0.0.1:5173",
-    "http://localhost:5174",    # add other dev ports if needed
-    "http://127.0.0.1:5174",
-]
-
-origins = ["*"]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins, # Allows your frontend to talk to backend
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# dependency helper (used by some endpoints)
-def get_db():
-    db = dbm.SessionLocal()
+from starlette.concurrency import run_in_threadpool
+from app import config, dbm, utils, instrumentation
+from app.config import Settings
+from app.routes import auth, transactions, goals, reports, recurring, category_rules, budgets, notifications, live
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = app.state.settings
+    if settings.auto_migrate:
+        from app import schema  # Alembic is only loaded when it is needed
+
+        await run_in_threadpool(schema.upgrade)
+    if settings.scheduler_enabled:
+        # recurring transactions (or run `python -m app.scheduler` as a separate worker)
+        from app import scheduler
+
+        scheduler.start(settings.scheduler_interval)
     try:
-        yield db
+        yield
     finally:
-        db.close()
+        if settings.scheduler_enabled:
+            scheduler.stop()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the API for ``settings`` (default: from the environment / .env)."""
+    settings = settings or config.get_settings()
+    config.configure(settings)
+    dbm.configure(settings)
 
-@app.get("/")
-def root():
-    return {"message": "Finance Tracker API running 🚀"}
+    app = FastAPI(title="Finance Tracker API", version="1.0", lifespan=lifespan)
+    app.state.settings = settings
 
-# Example route (you can keep your reports router's endpoints instead)
-@app.on_event("startup")
-def on_startup():
-    # create tables if necessary
-    models.Base.metadata.create_all(bind=dbm.engine)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),  # CORS_ORIGINS=https://app.example.com,...
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],  # pagination cursor / conditional GETs
+    )
 
-# --- include routers (IMPORTANT) ---
-# Note: your routers (auth.router etc.) already define prefix="/auth" or similar
-app.include_router(auth.router)          # registers /auth/*
-app.include_router(transactions.router)  # registers /transactions/*
-app.include_router(goals.router)         # registers /goals/*
-app.include_router(reports.router)       # registers /reports/*
+    # per-request query count / DB time -> Server-Timing, logs and GET /metrics
+    instrumentation.install(
+        app,
+        dbm.engine,
+        *([dbm.async_engine.sync_engine] if dbm.async_engine is not None else []),
+    )
+
+    @app.get("/")
+    def root():
+        return {"message": "Finance Tracker API running 🚀"}
+
+    @app.get("/health")
+    def health():
+        # password hasher queue depth (see app.utils) for autoscaling/alerting
+        return {"status": "ok", "password_hasher": utils.hasher_stats()}
+
+    # --- include routers (each defines its own prefix) ---
+    app.include_router(auth.router)            # registers /auth/*
+    app.include_router(transactions.router)    # registers /transactions/*
+    app.include_router(goals.router)           # registers /goals/*
+    app.include_router(reports.router)         # registers /reports/*
+    app.include_router(recurring.router)       # registers /recurring/*
+    app.include_router(category_rules.router)  # registers /category-rules/*
+    app.include_router(budgets.router)         # registers /budgets/*
+    app.include_router(notifications.router)   # registers /notifications/*
+    app.include_router(live.router)            # registers /live/*
+    return app
+
+
+app = create_app()
 
 # run directly if needed
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
@@ -1,6 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Numeric, Text, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from app.dbm import Base
+from app.money import Cents
+
+# Money columns are integer cents in the database ("<name>_cents", keyed by
+# the plain name in Python and Core alike) and Decimal in Python; see app.money.
 
 class User(Base):
     __tablename__ = "users"
@@ -9,9 +13,14 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)  # hashed password
     name = Column(String, nullable=True)
+    # Reports and rollups are in this currency
+    base_currency = Column(String(3), nullable=False, default="USD", server_default="USD")
 
     transactions = relationship("Transaction", back_populates="user")
     goals = relationship("Goal", back_populates="user")
+    recurring_rules = relationship("RecurringRule", back_populates="user")
+    category_rules = relationship("CategoryRule", back_populates="user")
+    budgets = relationship("Budget", back_populates="user")
 
 
 class Transaction(Base):
@@ -21,20 +30,207 @@ class Transaction(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     transaction_type = Column(String, nullable=False)  # income or expense
     category = Column(String, nullable=False)
-    amount = Column(Float, nullable=False)
+    amount = Column("amount_cents", Cents, key="amount", nullable=False)
+    currency = Column(String(3), nullable=False, default="USD", server_default="USD")
     date = Column(Date, nullable=False)
     description = Column(String, nullable=True)
+    recurring_rule_id = Column(Integer, ForeignKey("recurring_rules.id"), nullable=True)
 
     user = relationship("User", back_populates="transactions")
 
+    # Every query is scoped by user_id first; these composite indexes back the
+    # keyset listing (date, id) and the type/category filters and reports.
+    # On PostgreSQL the table can be hash-partitioned by user_id (see
+    # app.schema), so unique indexes must include user_id as well.
+    __table_args__ = (
+        Index("ix_transactions_user_date_id", "user_id", "date", "id"),
+        Index("ix_transactions_user_type_date", "user_id", "transaction_type", "date"),
+        Index("ix_transactions_user_category_date", "user_id", "category", "date"),
+        # One occurrence per rule and day; makes the scheduler safe to re-run
+        Index("ux_transactions_user_rule_date", "user_id", "recurring_rule_id", "date", unique=True),
+    )
+    # Identity includes the partition key, so ORM loads and flushes by primary
+    # key (refresh, expire) touch a single partition.
+    __mapper_args__ = {"primary_key": [id, user_id]}
+
 
 class Goal(Base):
     __tablename__ = "goals"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    target_amount = Column(Float, nullable=False)
-    current_amount = Column(Float, default=0.0)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    target_amount = Column("target_amount_cents", Cents, key="target_amount", nullable=False)
+    current_amount = Column("current_amount_cents", Cents, key="current_amount", default=0)
     deadline = Column(Date, nullable=False)
+    # manual: current_amount is user-edited. savings: income - expense since
+    # start_date. category: amounts in ``category`` since start_date. Tracked
+    # goals are kept current by app.rollups on every transaction write.
+    tracking = Column(String, nullable=False, default="manual", server_default="manual")
+    category = Column(String, nullable=True)
+    start_date = Column(Date, nullable=True)
 
     user = relationship("User", back_populates="goals")
+
+
+class RecurringRule(Base):
+    """A transaction template repeated every ``interval`` days/weeks/months/years.
+
+    ``next_run`` is the first occurrence not yet materialized; app.scheduler
+    advances it in the same DB transaction that inserts the occurrences.
+    """
+    __tablename__ = "recurring_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    transaction_type = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    amount = Column("amount_cents", Cents, key="amount", nullable=False)
+    currency = Column(String(3), nullable=False, default="USD", server_default="USD")
+    description = Column(String, nullable=True)
+    frequency = Column(String, nullable=False, default="monthly")  # daily, weekly, monthly, yearly
+    interval = Column(Integer, nullable=False, default=1)
+    day_of_month = Column(Integer, nullable=True)  # monthly/yearly; clamped to short months
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=True)
+    next_run = Column(Date, nullable=True)  # NULL once the rule has ended
+    active = Column(Boolean, nullable=False, default=True)
+
+    user = relationship("User", back_populates="recurring_rules")
+
+    __table_args__ = (Index("ix_recurring_rules_active_next_run", "active", "next_run"),)
+
+
+class CategoryRule(Base):
+    """Assigns ``category`` to transactions that arrive without one (see app.categorizer).
+
+    Rules are tried by ascending ``priority`` then id; the first whose pattern
+    and optional type/amount bounds all match wins.
+    """
+    __tablename__ = "category_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category = Column(String, nullable=False)
+    match_type = Column(String, nullable=False, default="contains")  # contains or regex
+    pattern = Column(String, nullable=False, default="")  # matched against the description, case-insensitively
+    transaction_type = Column(String, nullable=True)
+    min_amount = Column("min_amount_cents", Cents, key="min_amount", nullable=True)
+    max_amount = Column("max_amount_cents", Cents, key="max_amount", nullable=True)
+    priority = Column(Integer, nullable=False, default=100)
+
+    user = relationship("User", back_populates="category_rules")
+
+    __table_args__ = (Index("ix_category_rules_user_priority", "user_id", "priority", "id"),)
+
+
+class Budget(Base):
+    """A monthly spending limit for one expense category, in the user's base currency.
+
+    Transaction writes compare it against the maintained monthly rollup and
+    queue an alert when spending crosses ``alert_percent`` or 100% (app.notifications).
+    """
+    __tablename__ = "budgets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category = Column(String, nullable=False)
+    amount = Column("amount_cents", Cents, key="amount", nullable=False)
+    alert_percent = Column(Integer, nullable=True)  # early warning; NULL = only at 100%
+
+    user = relationship("User", back_populates="budgets")
+
+    __table_args__ = (Index("ux_budgets_user_category", "user_id", "category", unique=True),)
+
+
+class NotificationOutbox(Base):
+    """Events queued by the write path, turned into notifications in batches."""
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class Notification(Base):
+    __tablename__ = "notifications"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)
+    message = Column(String, nullable=False)
+    data = Column(Text, nullable=True)  # JSON payload of the event
+    # The same event (e.g. one budget threshold in one month) notifies only once
+    dedupe_key = Column(String, nullable=False)
+    read = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+        Index("ux_notifications_user_dedupe", "user_id", "dedupe_key", unique=True),
+    )
+
+
+class FxRate(Base):
+    """1 ``currency`` = ``rate`` ``quote`` on ``date`` (loaded by app.fx)."""
+    __tablename__ = "fx_rates"
+
+    currency = Column(String(3), primary_key=True)
+    quote = Column(String(3), primary_key=True)
+    date = Column(Date, primary_key=True)
+    rate = Column(Numeric(20, 10), nullable=False)
+
+
+class FxRateLoad(Base):
+    """One row per rate load; a newer one tells every worker to reload its rate cache."""
+    __tablename__ = "fx_rate_loads"
+
+    id = Column(Integer, primary_key=True)
+    rates = Column(Integer, nullable=False)
+    loaded_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+# ---------------- ROLLUPS ----------------
+# Maintained by app.rollups inside the same DB transaction as every
+# transaction write, so reports never have to rescan a user's full history.
+# Amounts are converted to the user's base currency.
+
+class UserTotals(Base):
+    __tablename__ = "user_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    income = Column("income_cents", Cents, key="income", nullable=False, default=0)
+    expense = Column("expense_cents", Cents, key="expense", nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    # Bumped by every transaction/goal write; HTTP ETags are derived from it
+    data_version = Column(Integer, nullable=False, default=0)
+
+
+class MonthlyCategoryTotal(Base):
+    __tablename__ = "monthly_category_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    transaction_type = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    amount = Column("amount_cents", Cents, key="amount", nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+
+class ReportSnapshot(Base):
+    """A user's monthly summary precomputed by app.snapshots.
+
+    Only valid while ``data_version`` still matches the user's UserTotals row.
+    """
+    __tablename__ = "report_snapshots"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    currency = Column(String(3), nullable=False)
+    income = Column("income_cents", Cents, key="income", nullable=False, default=0)
+    expense = Column("expense_cents", Cents, key="expense", nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    categories = Column(Text, nullable=False, default="{}")  # JSON {category: expense}
+    data_version = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,98 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Annotated
+from pydantic import Field, PlainSerializer
+from sqlalchemy import BigInteger, inspect, text
+from sqlalchemy.types import TypeDecorator
+
+# Exact money.
+# Amounts are stored as integer cents (BIGINT) and surface in Python as
+# Decimal with two places, so SUM() in the database is exact and nothing has
+# to be re-added in Python. API schemas accept JSON numbers or strings and
+# emit decimal strings ("12.50"), which clients cannot round through a float.
+#
+# Databases created before this change have Float columns; the baseline
+# migration (migrations/versions/0001) converts them with migrate(), so
+# `alembic upgrade head` is the only way it runs.
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+# Largest amount a BIGINT cents column holds; Money rejects anything beyond it
+MAX_AMOUNT = Decimal(2**63 - 1).scaleb(-2)
+
+# Legacy Float columns -> "<name>_cents"
+LEGACY_COLUMNS = {
+    "transactions": ["amount"],
+    "recurring_rules": ["amount"],
+    "goals": ["target_amount", "current_amount"],
+    "user_totals": ["income", "expense"],
+    "monthly_category_totals": ["amount"],
+}
+
+
+def to_cents(value) -> int:
+    if isinstance(value, float):
+        value = str(value)  # the shortest repr, so 0.1 is 10 cents and not 10.000000000000000555
+    return int(Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def from_cents(value) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
+
+
+def to_json(value: Decimal) -> str:
+    """An amount as it appears in JSON: a decimal string with two places."""
+    return str(value.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+class Cents(TypeDecorator):
+    """Integer minor units in the database, Decimal in Python."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_cents(value)
+
+
+# Pydantic field type: at most two decimal places and within BIGINT cents in
+# (a 422 rather than a database overflow), a decimal string out
+Money = Annotated[
+    Decimal,
+    Field(decimal_places=2, ge=-MAX_AMOUNT, le=MAX_AMOUNT),
+    PlainSerializer(to_json, return_type=str, when_used="json"),
+]
+
+
+# --- MIGRATION ---
+
+def migrate(bind) -> list:
+    """Convert legacy Float money columns to integer cents in place; idempotent.
+
+    One DB transaction per column (or the caller's, given a Connection): add
+    ``<name>_cents``, fill it with a single set-based UPDATE, then drop the
+    float column.
+    """
+    from app.dbm import begin
+
+    inspector = inspect(bind)
+    converted = []
+    for table, names in LEGACY_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        columns = {column["name"]: column for column in inspector.get_columns(table)}
+        for name in names:
+            if name not in columns:
+                continue
+            cents = f"{name}_cents"
+            with begin(bind) as conn:
+                if cents not in columns:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {cents} BIGINT"))
+                conn.execute(text(f"UPDATE {table} SET {cents} = CAST(ROUND({name} * 100) AS BIGINT)"))
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {name}"))
+                if bind.dialect.name == "postgresql" and not columns[name]["nullable"]:
+                    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {cents} SET NOT NULL"))
+            converted.append(f"{table}.{name}")
+    return converted
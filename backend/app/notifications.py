@@ -0,0 +1,153 @@
+import json
+from decimal import Decimal
+from typing import List, Optional
+from sqlalchemy import and_, delete, insert
+from sqlalchemy.orm import Session
+from app import models
+from app.config import get_settings
+
+# In-app notifications through a transactional outbox.
+# Writers only INSERT events into notification_outbox inside their own DB
+# transaction (a transaction write never waits on rendering or delivery);
+# process_outbox() turns them into notifications in batches. It runs on every
+# scheduler pass and for the reader's own events when notifications are listed.
+#
+# Budget alerts are evaluated here too: rollups.apply() hands over the monthly
+# deltas it just added, and since the rollup already holds the month's total,
+# the check is a lookup against that counter rather than a re-sum.
+
+OUTBOX_BATCH_SIZE = get_settings().outbox_batch_size
+
+
+# --- BUDGET THRESHOLDS ---
+
+def budget_thresholds(budget) -> List[int]:
+    return sorted({budget.alert_percent, 100} - {None})
+
+
+def check_budgets(db: Session, month_deltas: dict):
+    """Queue alerts for budgets whose spending just crossed a threshold.
+
+    ``month_deltas`` maps (user_id, month, type, category) to the deltas
+    rollups.apply() has just added, so the total before the write is the
+    stored one minus the delta. Only increases in expense can cross upwards.
+    """
+    increases = {
+        (user_id, month, category): deltas["amount"]
+        for (user_id, month, tx_type, category), deltas in month_deltas.items()
+        if tx_type == "expense" and deltas["amount"] > 0
+    }
+    if not increases:
+        return
+    B, M = models.Budget, models.MonthlyCategoryTotal
+    rows = (
+        db.query(B, M.month, M.amount)
+        .join(M, and_(M.user_id == B.user_id, M.category == B.category, M.transaction_type == "expense"))
+        .filter(B.user_id.in_({key[0] for key in increases}), M.month.in_({key[1] for key in increases}))
+        .all()
+    )
+    events = []
+    for budget, month, spent in rows:
+        delta = increases.get((budget.user_id, month, budget.category))
+        if delta is None:
+            continue
+        before = spent - delta
+        for percent in budget_thresholds(budget):
+            limit = budget.amount * percent / 100
+            if before < limit <= spent:
+                events.append({
+                    "user_id": budget.user_id,
+                    "kind": "budget_threshold",
+                    "payload": {
+                        "budget_id": budget.id,
+                        "category": budget.category,
+                        "month": month.isoformat(),
+                        "percent": percent,
+                        "budget": str(budget.amount),
+                        "spent": str(spent),
+                    },
+                })
+    enqueue(db, events)
+
+
+# --- OUTBOX ---
+
+def enqueue(db: Session, events: List[dict]):
+    """Add events ({"user_id", "kind", "payload"}) to the outbox; part of the caller's transaction."""
+    if events:
+        db.execute(insert(models.NotificationOutbox), [
+            {"user_id": event["user_id"], "kind": event["kind"], "payload": json.dumps(event["payload"])}
+            for event in events
+        ])
+
+
+def _budget_threshold(payload: dict):
+    month, percent = payload["month"][:7], payload["percent"]
+    amounts = f"{Decimal(payload['spent']):.2f} of {Decimal(payload['budget']):.2f}"
+    if percent >= 100:
+        message = f"{payload['category']} spending for {month} is over budget: {amounts}"
+    else:
+        message = f"{payload['category']} spending for {month} has reached {percent}% of its budget: {amounts}"
+    return message, f"budget:{payload['budget_id']}:{payload['month']}:{percent}"
+
+
+# kind -> payload -> (message, dedupe key)
+RENDERERS = {"budget_threshold": _budget_threshold}
+
+
+def _insert_notifications(db: Session, rows: List[dict]):
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        N = models.Notification
+        for row in rows:
+            exists = db.query(N.id).filter(N.user_id == row["user_id"], N.dedupe_key == row["dedupe_key"]).first()
+            if exists is None:
+                db.execute(insert(N).values(row))
+        return
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    db.execute(
+        dialect_insert(models.Notification)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["user_id", "dedupe_key"])
+    )
+
+
+def process_outbox(db: Session, user_id: Optional[int] = None, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Render pending outbox events into notifications; one commit per batch.
+
+    Returns the number of events consumed. Repeats of an event collapse into
+    one notification through the (user_id, dedupe_key) unique index.
+    """
+    O = models.NotificationOutbox
+    processed = 0
+    while True:
+        query = db.query(O)
+        if user_id is not None:
+            query = query.filter(O.user_id == user_id)
+        query = query.order_by(O.id).limit(batch_size)
+        if db.get_bind().dialect.name == "postgresql":
+            # Concurrent drains split the backlog instead of rendering events twice
+            query = query.with_for_update(skip_locked=True)
+        events = query.all()
+        if not events:
+            return processed
+
+        rows = []
+        for event in events:
+            payload = json.loads(event.payload)
+            message, dedupe_key = RENDERERS[event.kind](payload)
+            rows.append({
+                "user_id": event.user_id,
+                "kind": event.kind,
+                "message": message,
+                "data": event.payload,
+                "dedupe_key": dedupe_key,
+                "read": False,
+            })
+        _insert_notifications(db, rows)
+        db.execute(delete(O).where(O.id.in_([event.id for event in events])))
+        db.commit()
+        processed += len(events)
@@ -0,0 +1,378 @@
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, List, Optional
+from sqlalchemy import and_, bindparam, case, func, insert, or_, update
+from sqlalchemy.orm import Session
+from app import models, dbm, aggregates, fx, live, notifications, schema
+from app.money import ZERO, Cents
+
+# Incremental per-user rollups.
+# Transaction writes call apply() before committing, so totals (and the
+# progress of tracked goals) stay exact without rescanning history. rebuild()/verify() backfill and detect drift:
+#
+#   python -m app.rollups rebuild [--user-id 1 --user-id 2]
+#   python -m app.rollups verify
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+# --- WRITE PATH ---
+
+def _upsert_add(db: Session, model, key_columns: List[str], rows: List[dict], value_columns: List[str]):
+    """INSERT rows, adding ``value_columns`` onto any existing row with the same key."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in value_columns},
+        )
+        db.execute(stmt)
+        return
+
+    # Portable fallback: UPDATE, then INSERT when the row does not exist yet
+    for row in rows:
+        result = db.execute(
+            update(model)
+            .where(*[getattr(model, name) == row[name] for name in key_columns])
+            .values({name: getattr(model, name) + row[name] for name in value_columns})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(model).values(row))
+
+
+def apply(db: Session, transactions: Iterable, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) transactions from the rollups.
+
+    ``transactions`` are ORM objects or any rows exposing user_id,
+    transaction_type, category, amount, date and (optionally) currency.
+    Amounts are converted to each user's base currency through the in-memory
+    FX cache. Deltas are merged per key first, so a batch costs one statement
+    per rollup table.
+    """
+    transactions = list(transactions)
+    if not transactions:
+        return
+    bases = fx.base_currencies(db, (tx.user_id for tx in transactions))
+    user_deltas = defaultdict(lambda: {"income": ZERO, "expense": ZERO, "transaction_count": 0, "data_version": 1})
+    month_deltas = defaultdict(lambda: {"amount": ZERO, "transaction_count": 0})
+    goal_deltas = defaultdict(lambda: ZERO)
+
+    for tx in transactions:
+        base = bases.get(tx.user_id, fx.DEFAULT_CURRENCY)
+        amount = sign * fx.convert(db, tx.amount, getattr(tx, "currency", None) or base, base, tx.date)
+
+        totals = user_deltas[tx.user_id]
+        if tx.transaction_type in ("income", "expense"):
+            totals[tx.transaction_type] += amount
+        totals["transaction_count"] += sign
+
+        key = (tx.user_id, month_start(tx.date), tx.transaction_type, tx.category)
+        month_deltas[key]["amount"] += amount
+        month_deltas[key]["transaction_count"] += sign
+        goal_deltas[(tx.user_id, tx.date, tx.transaction_type, tx.category)] += amount
+
+    _upsert_add(
+        db,
+        models.UserTotals,
+        ["user_id"],
+        [{"user_id": user_id, **deltas} for user_id, deltas in user_deltas.items()],
+        ["income", "expense", "transaction_count", "data_version"],
+    )
+    _upsert_add(
+        db,
+        models.MonthlyCategoryTotal,
+        ["user_id", "month", "transaction_type", "category"],
+        [
+            {"user_id": user_id, "month": month, "transaction_type": tx_type, "category": category, **deltas}
+            for (user_id, month, tx_type, category), deltas in month_deltas.items()
+        ],
+        ["amount", "transaction_count"],
+    )
+    _apply_goal_deltas(db, goal_deltas)
+    live.collect(db, month_deltas)
+    if sign > 0:
+        notifications.check_budgets(db, month_deltas)
+
+
+def _apply_goal_deltas(db: Session, deltas: dict):
+    """Add transaction deltas onto the tracked goals they count towards.
+
+    One executemany UPDATE keyed by (user, date, type, category); goals that
+    started after the transaction date or track another category are untouched.
+    """
+    if not deltas:
+        return
+    goals = models.Goal.__table__
+    stmt = (
+        update(goals)
+        .where(
+            goals.c.user_id == bindparam("b_user_id"),
+            goals.c.tracking != "manual",
+            goals.c.start_date <= bindparam("b_date"),
+            or_(goals.c.tracking == "savings", goals.c.category == bindparam("b_category")),
+        )
+        .values(
+            current_amount=func.coalesce(goals.c.current_amount, 0)
+            + case(
+                (goals.c.tracking == "savings", bindparam("b_savings", type_=Cents)),
+                else_=bindparam("b_amount", type_=Cents),
+            )
+        )
+    )
+    db.execute(stmt, [
+        {
+            "b_user_id": user_id,
+            "b_date": day,
+            "b_category": category,
+            "b_amount": amount,
+            "b_savings": amount if tx_type == "income" else -amount,
+        }
+        for (user_id, day, tx_type, category), amount in deltas.items()
+    ])
+
+
+def bump_data_version(db: Session, user_id: int):
+    """Mark a user's data as changed for writes that do not touch transactions."""
+    _upsert_add(
+        db,
+        models.UserTotals,
+        ["user_id"],
+        [{"user_id": user_id, "income": ZERO, "expense": ZERO, "transaction_count": 0, "data_version": 1}],
+        ["data_version"],
+    )
+
+
+# --- READ PATH ---
+
+def get_user_totals(db: Session, user_id: int) -> dict:
+    """All-time income/expense for a user (a single primary-key lookup)."""
+    totals = db.get(models.UserTotals, user_id)
+    if totals is None:
+        return {"income": ZERO, "expense": ZERO, "transaction_count": 0}
+    return {"income": totals.income, "expense": totals.expense, "transaction_count": totals.transaction_count}
+
+
+def get_data_version(db: Session, user_id: int) -> int:
+    version = (
+        db.query(models.UserTotals.data_version)
+        .filter(models.UserTotals.user_id == user_id)
+        .scalar()
+    )
+    return version or 0
+
+
+def get_category_totals(db: Session, user_id: int, tx_type: str, start_month: Optional[date] = None) -> dict:
+    """``{category: total}`` for one transaction type, optionally from ``start_month`` on."""
+    query = db.query(
+        models.MonthlyCategoryTotal.category,
+        func.sum(models.MonthlyCategoryTotal.amount),
+    ).filter(
+        models.MonthlyCategoryTotal.user_id == user_id,
+        models.MonthlyCategoryTotal.transaction_type == tx_type,
+    )
+    if start_month is not None:
+        query = query.filter(models.MonthlyCategoryTotal.month >= start_month)
+    rows = (
+        query.group_by(models.MonthlyCategoryTotal.category)
+        .having(func.sum(models.MonthlyCategoryTotal.transaction_count) > 0)
+        .all()
+    )
+    return {category: total for category, total in rows}
+
+
+def compute_goal_progress(db: Session, user_ids=None, goal_ids=None) -> dict:
+    """``{goal_id: amount}`` for tracked goals, recomputed from the transactions table.
+
+    A full rescan: used when a goal is created or re-targeted and by rebuild/verify.
+    """
+    Goal, Tx, User = models.Goal, models.Transaction, models.User
+    amount = fx.converted_amount(User.base_currency)
+    signed = case((Tx.transaction_type == "income", amount), else_=-amount)
+    rows = (
+        db.query(
+            Goal.id,
+            func.coalesce(func.sum(case((Goal.tracking == "savings", signed), else_=amount)), 0),
+        )
+        .join(User, User.id == Goal.user_id)
+        .outerjoin(
+            Tx,
+            and_(
+                Tx.user_id == Goal.user_id,
+                Tx.date >= Goal.start_date,
+                or_(Goal.tracking == "savings", Tx.category == Goal.category),
+            ),
+        )
+        .filter(Goal.tracking != "manual", *_user_filter(Goal.user_id, user_ids))
+        .filter(*([Goal.id.in_(goal_ids)] if goal_ids else []))
+        .group_by(Goal.id)
+        .all()
+    )
+    return dict(rows)
+
+
+# --- REBUILD / VERIFY ---
+
+def _user_filter(column, user_ids):
+    return [column.in_(user_ids)] if user_ids else []
+
+
+def _expected_user_totals(db: Session, user_ids=None) -> dict:
+    Tx = models.Transaction
+    amount = fx.converted_amount(models.User.base_currency)
+    rows = (
+        db.query(
+            Tx.user_id,
+            func.coalesce(func.sum(amount).filter(Tx.transaction_type == "income"), 0),
+            func.coalesce(func.sum(amount).filter(Tx.transaction_type == "expense"), 0),
+            func.count(Tx.id),
+        )
+        .join(models.User, models.User.id == Tx.user_id)
+        .filter(*_user_filter(Tx.user_id, user_ids))
+        .group_by(Tx.user_id)
+        .all()
+    )
+    return {
+        user_id: {"income": income, "expense": expense, "transaction_count": count}
+        for user_id, income, expense, count in rows
+    }
+
+
+def _expected_month_totals(db: Session, user_ids=None) -> dict:
+    Tx = models.Transaction
+    month = aggregates.truncate_date(db, Tx.date, "month")
+    amount = func.sum(fx.converted_amount(models.User.base_currency))
+    rows = (
+        db.query(Tx.user_id, month, Tx.transaction_type, Tx.category, amount, func.count(Tx.id))
+        .join(models.User, models.User.id == Tx.user_id)
+        .filter(*_user_filter(Tx.user_id, user_ids))
+        .group_by(Tx.user_id, month, Tx.transaction_type, Tx.category)
+        .all()
+    )
+    return {
+        (user_id, aggregates.as_date(month_value), tx_type, category): {
+            "amount": amount,
+            "transaction_count": count,
+        }
+        for user_id, month_value, tx_type, category, amount, count in rows
+    }
+
+
+def rebuild(db: Session, user_ids: Optional[List[int]] = None):
+    """Recompute rollups from the transactions table (all users, or ``user_ids``)."""
+    # data_version must keep increasing across rebuilds or stale ETags would match again
+    versions = dict(
+        db.query(models.UserTotals.user_id, models.UserTotals.data_version).filter(
+            *_user_filter(models.UserTotals.user_id, user_ids)
+        )
+    )
+    db.query(models.UserTotals).filter(*_user_filter(models.UserTotals.user_id, user_ids)).delete(
+        synchronize_session=False
+    )
+    db.query(models.MonthlyCategoryTotal).filter(
+        *_user_filter(models.MonthlyCategoryTotal.user_id, user_ids)
+    ).delete(synchronize_session=False)
+
+    expected_users = _expected_user_totals(db, user_ids)
+    empty = {"income": ZERO, "expense": ZERO, "transaction_count": 0}
+    user_rows = [
+        {"user_id": user_id, **expected_users.get(user_id, empty), "data_version": versions.get(user_id, 0) + 1}
+        for user_id in expected_users.keys() | versions.keys()
+    ]
+    month_rows = [
+        {"user_id": user_id, "month": month, "transaction_type": tx_type, "category": category, **totals}
+        for (user_id, month, tx_type, category), totals in _expected_month_totals(db, user_ids).items()
+    ]
+    if user_rows:
+        db.execute(insert(models.UserTotals), user_rows)
+    if month_rows:
+        db.execute(insert(models.MonthlyCategoryTotal), month_rows)
+    goal_rows = [
+        {"id": goal_id, "current_amount": amount}
+        for goal_id, amount in compute_goal_progress(db, user_ids).items()
+    ]
+    if goal_rows:
+        db.execute(update(models.Goal), goal_rows)
+    db.commit()
+    return {"users": len(user_rows), "monthly_rows": len(month_rows), "goals": len(goal_rows)}
+
+
+def _diff(label, expected: dict, stored: dict) -> List[str]:
+    problems = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key)
+        have = stored.get(key)
+        if want is None and have is not None and not any(have.values()):
+            continue  # zeroed rows left behind by deletes are harmless
+        want = want or {name: 0 for name in have}
+        have = have or {name: 0 for name in want}
+        for name, value in want.items():
+            if value != have[name]:  # amounts are exact, no tolerance needed
+                problems.append(f"{label} {key}: {name} expected {value}, stored {have[name]}")
+    return problems
+
+
+def verify(db: Session, user_ids: Optional[List[int]] = None) -> List[str]:
+    """Return a description of every rollup value that drifted from the source rows."""
+    stored_users = {
+        row.user_id: {"income": row.income, "expense": row.expense, "transaction_count": row.transaction_count}
+        for row in db.query(models.UserTotals).filter(*_user_filter(models.UserTotals.user_id, user_ids))
+    }
+    stored_months = {
+        (row.user_id, row.month, row.transaction_type, row.category): {
+            "amount": row.amount,
+            "transaction_count": row.transaction_count,
+        }
+        for row in db.query(models.MonthlyCategoryTotal).filter(
+            *_user_filter(models.MonthlyCategoryTotal.user_id, user_ids)
+        )
+    }
+    stored_goals = {
+        goal_id: {"current_amount": amount or ZERO}
+        for goal_id, amount in db.query(models.Goal.id, models.Goal.current_amount).filter(
+            models.Goal.tracking != "manual", *_user_filter(models.Goal.user_id, user_ids)
+        )
+    }
+    expected_goals = {
+        goal_id: {"current_amount": amount} for goal_id, amount in compute_goal_progress(db, user_ids).items()
+    }
+    return (
+        _diff("user_totals", _expected_user_totals(db, user_ids), stored_users)
+        + _diff("monthly_category_totals", _expected_month_totals(db, user_ids), stored_months)
+        + _diff("goals", expected_goals, stored_goals)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild or verify transaction rollups")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="limit to these users")
+    args = parser.parse_args(argv)
+
+    schema.require_head(dbm.engine)
+    db = dbm.SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt rollups: {rebuild(db, args.user_ids)}")
+            return 0
+        problems = verify(db, args.user_ids)
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} drifted value(s)")
+        return 1 if problems else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,59 +1,144 @@
-import os
-from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from app import models, schemas, dbm
-from app.utils import verify_password, hash_password 
+from app import models, schemas, dbm, cache, fx, rollups
+from app.config import get_settings
+from app.utils import HasherSaturated, hash_password_async, verify_and_update_password_async
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
-load_dotenv()
-
 # This part defines how FastAPI gets the token for protected routes
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-# SECURITY FIX: Get the key from the environment, fallback only for local dev
-SECRET_KEY = os.getenv("JWT_SECRET", "your_super_secret_key_for_dev_only")
+# The signing key is Settings.jwt_secret (JWT_SECRET; the default is for local dev only)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# Resolved identities keyed by token subject, so protected routes skip the
+# users SELECT. With the in-process backend other workers only see an
+# invalidation once their entry's TTL runs out; use CACHE_URL=redis://... to share.
+user_cache = cache.create_cache(
+    "auth-user",
+    maxsize=get_settings().user_cache_size,
+    ttl=get_settings().user_cache_ttl,
+)
+
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire_time = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire_time})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, get_settings().jwt_secret, algorithm=ALGORITHM)
+
+def hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
 # --- SIGNUP ---
+# signup/login are async so bcrypt waits in its own bounded pool; the short DB
+# steps still run in the threadpool.
 @router.post("/signup", response_model=schemas.UserResponse)
-def signup(user: schemas.UserCreate, db: Session = Depends(dbm.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def signup(user: schemas.UserCreate, db: Session = Depends(dbm.get_db)):
+    db_user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.email == user.email).first()
+    )
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Using the imported function from utils.py
-    hashed_pwd = hash_password(user.password)
-    new_user = models.User(email=user.email, password=hashed_pwd, name=user.name)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+
+    try:
+        base_currency = fx.normalize_currency(user.base_currency or fx.DEFAULT_CURRENCY)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    try:
+        hashed_pwd = await hash_password_async(user.password)
+    except HasherSaturated:
+        raise hasher_busy()
+
+    def save():
+        new_user = models.User(email=user.email, password=hashed_pwd, name=user.name, base_currency=base_currency)
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+        return new_user
+
+    return await run_in_threadpool(save)
 
 # --- LOGIN ---
 @router.post("/login", response_model=schemas.Token)
-def login(user: schemas.UserLogin, db: Session = Depends(dbm.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    
-    # Using the imported function from utils.py
-    if not db_user or not verify_password(user.password, db_user.password):
+async def login(user: schemas.UserLogin, db: Session = Depends(dbm.get_db)):
+    db_user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.email == user.email).first()
+    )
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    token = create_access_token(data={"sub": db_user.email})
+
+    try:
+        valid, new_hash = await verify_and_update_password_async(user.password, db_user.password)
+    except HasherSaturated:
+        raise hasher_busy()
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Cost parameters changed since this hash was made: store the upgraded hash
+    if new_hash:
+        def rehash():
+            db_user.password = new_hash
+            db.commit()
+
+        await run_in_threadpool(rehash)
+
+    # The subject is the immutable user id so lookups are primary-key hits
+    token = create_access_token(data={"sub": str(db_user.id)})
     return {"access_token": token, "token_type": "bearer"}
 
 
+# --- USER CACHE ---
+def invalidate_user(user_id: int, email: str = None):
+    """Drop a user's cached identity; call after any change to the user row."""
+    user_cache.delete(str(user_id))
+    if email:
+        user_cache.delete(email)  # tokens issued before subjects were ids
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_on_user_change(mapper, connection, target):
+    invalidate_user(target.id, target.email)
+
+
+def load_user_identity(db: Session, subject: str):
+    """Resolve a token subject (user id, or email on legacy tokens) to a cacheable dict."""
+    identity = user_cache.get(subject)
+    if identity is not None:
+        return identity
+
+    if subject.isdigit():
+        user = db.get(models.User, int(subject))
+    else:
+        user = db.query(models.User).filter(models.User.email == subject).first()
+    if user is None:
+        return None
+
+    identity = {"id": user.id, "email": user.email, "name": user.name, "base_currency": user.base_currency}
+    user_cache.set(subject, identity)
+    return identity
+
+
+def user_from_subject(db: Session, subject: str):
+    """Detached, read-only User built from the cached identity (id/email/name/base_currency), or None."""
+    identity = load_user_identity(db, subject)
+    if identity is None:
+        return None
+    return models.User(**{"base_currency": fx.DEFAULT_CURRENCY, **identity})
+
+
 # --- GET CURRENT USER ---
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(dbm.get_db)):
     credentials_exception = HTTPException(
@@ -62,18 +147,52 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        payload = jwt.decode(token, get_settings().jwt_secret, algorithms=[ALGORITHM])
+        subject: str = payload.get("sub")
+        if subject is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = user_from_subject(db, subject)
     if user is None:
         raise credentials_exception
     return user
 
 @router.get("/me", response_model=schemas.UserResponse)
 def read_users_me(current_user: models.User = Depends(get_current_user)):
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+@router.patch("/me", response_model=schemas.UserResponse)
+def update_users_me(
+    changes: schemas.UserUpdate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    user = db.get(models.User, current_user.id)
+    data = changes.dict(exclude_unset=True)
+    if data.get("base_currency") is not None:
+        try:
+            data["base_currency"] = fx.normalize_currency(data["base_currency"])
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    if "name" in data and data["name"] is not None:
+        user.name = data["name"]
+
+    rebase = data.get("base_currency") not in (None, user.base_currency)
+    if rebase:
+        # Everything the user holds must convert, or the rebuilt totals would drop it
+        missing = fx.missing_rates(db, user.id, data["base_currency"])
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"No FX rate for {', '.join(missing)} -> {data['base_currency']}; load rates first",
+            )
+        user.base_currency = data["base_currency"]
+    db.commit()
+    if rebase:
+        # Rollups and tracked goals are stored in the base currency: recompute this user's
+        rollups.rebuild(db, [user.id])
+    db.refresh(user)
+    return user
\ No newline at end of file
@@ -0,0 +1,139 @@
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models, schemas, dbm, rollups
+from app.money import ZERO
+from app.routes.auth import get_current_user
+
+router = APIRouter(prefix="/budgets", tags=["budgets"])
+
+
+def _get_budget(db: Session, budget_id: int, user_id: int) -> models.Budget:
+    budget = db.query(models.Budget).filter(models.Budget.id == budget_id, models.Budget.user_id == user_id).first()
+    if not budget:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return budget
+
+
+def _validated(payload: schemas.BudgetCreate) -> dict:
+    data = payload.dict()
+    data["category"] = data["category"].strip().lower()
+    if not data["category"]:
+        raise HTTPException(status_code=400, detail="category is required")
+    if data["amount"] <= 0:
+        raise HTTPException(status_code=400, detail="amount must be positive")
+    return data
+
+
+def _commit(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A budget for this category already exists")
+
+
+def budget_report(db: Session, user_id: int, month: date) -> list:
+    """Budget vs. actual for every budgeted or spent-in category of ``month``.
+
+    One query: the user's budgets FULL OUTER JOIN that month's expense rows of
+    the monthly rollup, which already hold one pre-summed amount per category.
+    """
+    B, M = models.Budget, models.MonthlyCategoryTotal
+    budgets = select(B.id, B.category, B.amount).where(B.user_id == user_id).subquery()
+    spent = (
+        select(M.category, M.amount)
+        .where(M.user_id == user_id, M.month == month, M.transaction_type == "expense", M.transaction_count > 0)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            func.coalesce(budgets.c.category, spent.c.category).label("category"),
+            budgets.c.id,
+            budgets.c.amount,
+            func.coalesce(spent.c.amount, ZERO).label("spent"),
+        )
+        .select_from(budgets.join(spent, budgets.c.category == spent.c.category, full=True))
+        .order_by("category")
+    ).all()
+
+    report = []
+    for category, budget_id, budget, amount in rows:
+        status = {"category": category, "budget_id": budget_id, "budget": budget, "spent": amount}
+        if budget is not None:
+            status["remaining"] = budget - amount
+            status["percent_used"] = round(float(amount / budget) * 100, 1)
+            status["over_budget"] = amount > budget
+        report.append(status)
+    return report
+
+
+# ---------------- CREATE BUDGET ----------------
+@router.post("", response_model=schemas.BudgetResponse)
+def create_budget(
+    budget: schemas.BudgetCreate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    new_budget = models.Budget(**_validated(budget), user_id=current_user.id)
+    db.add(new_budget)
+    _commit(db)
+    db.refresh(new_budget)
+    return new_budget
+
+
+# ---------------- LIST BUDGETS ----------------
+@router.get("", response_model=List[schemas.BudgetResponse])
+def get_budgets(db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
+    return (
+        db.query(models.Budget)
+        .filter(models.Budget.user_id == current_user.id)
+        .order_by(models.Budget.category)
+        .all()
+    )
+
+
+# ---------------- BUDGET VS ACTUAL ----------------
+@router.get("/status", response_model=schemas.BudgetReport)
+def get_budget_status(
+    month: Optional[date] = Query(None, description="Any day of the month; defaults to the current month"),
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    month = rollups.month_start(month or date.today())
+    categories = budget_report(db, current_user.id, month)
+    return {
+        "month": month,
+        "currency": current_user.base_currency,
+        "total_budget": sum((row["budget"] for row in categories if row["budget"] is not None), ZERO),
+        "total_spent": sum((row["spent"] for row in categories), ZERO),
+        "categories": categories,
+    }
+
+
+# ---------------- UPDATE BUDGET ----------------
+@router.put("/{budget_id}", response_model=schemas.BudgetResponse)
+def update_budget(
+    budget_id: int,
+    updated: schemas.BudgetCreate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    budget = _get_budget(db, budget_id, current_user.id)
+    for key, value in _validated(updated).items():
+        setattr(budget, key, value)
+    _commit(db)
+    db.refresh(budget)
+    return budget
+
+
+# ---------------- DELETE BUDGET ----------------
+@router.delete("/{budget_id}")
+def delete_budget(budget_id: int, db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
+    budget = _get_budget(db, budget_id, current_user.id)
+    db.delete(budget)
+    db.commit()
+    return {"detail": "Budget deleted successfully"}
@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+from app import models, schemas, dbm, categorizer, live
+from app.routes.auth import get_current_user
+from app.routes.transactions import filter_clauses
+
+router = APIRouter(prefix="/category-rules", tags=["category rules"])
+
+
+def _get_rule(db: Session, rule_id: int, user_id: int) -> models.CategoryRule:
+    rule = (
+        db.query(models.CategoryRule)
+        .filter(models.CategoryRule.id == rule_id, models.CategoryRule.user_id == user_id)
+        .first()
+    )
+    if not rule:
+        raise HTTPException(status_code=404, detail="Category rule not found")
+    return rule
+
+
+def _validated(payload: schemas.CategoryRuleCreate) -> dict:
+    try:
+        return categorizer.normalize_rule(payload.dict())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+# ---------------- CREATE RULE ----------------
+@router.post("", response_model=schemas.CategoryRuleResponse)
+def create_rule(
+    rule: schemas.CategoryRuleCreate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    new_rule = models.CategoryRule(**_validated(rule), user_id=current_user.id)
+    db.add(new_rule)
+    db.commit()
+    categorizer.invalidate(current_user.id)
+    db.refresh(new_rule)
+    return new_rule
+
+
+# ---------------- LIST RULES ----------------
+@router.get("", response_model=List[schemas.CategoryRuleResponse])
+def get_rules(db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
+    R = models.CategoryRule
+    return db.query(R).filter(R.user_id == current_user.id).order_by(R.priority, R.id).all()
+
+
+# ---------------- APPLY RULES TO EXISTING TRANSACTIONS ----------------
+@router.post("/apply", response_model=schemas.CategorizeReport)
+def apply_rules(
+    request: schemas.CategorizeRequest,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    criteria = filter_clauses(request.filters) if request.filters else []
+    report = categorizer.apply_rules(db, current_user.id, criteria, request.only_uncategorized)
+    if report["updated"]:
+        live.publish(db, current_user.id, "transactions.recategorized", **report)
+    db.commit()
+    return report
+
+
+# ---------------- UPDATE RULE ----------------
+@router.put("/{rule_id}", response_model=schemas.CategoryRuleResponse)
+def update_rule(
+    rule_id: int,
+    updated: schemas.CategoryRuleCreate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    rule = _get_rule(db, rule_id, current_user.id)
+    for key, value in _validated(updated).items():
+        setattr(rule, key, value)
+    # Only new transactions (and /apply) see the change; existing rows keep their category
+    db.commit()
+    categorizer.invalidate(current_user.id)
+    db.refresh(rule)
+    return rule
+
+
+# ---------------- DELETE RULE ----------------
+@router.delete("/{rule_id}")
+def delete_rule(rule_id: int, db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
+    rule = _get_rule(db, rule_id, current_user.id)
+    db.delete(rule)
+    db.commit()
+    categorizer.invalidate(current_user.id)
+    return {"detail": "Category rule deleted successfully"}
@@ -1,61 +1,221 @@
-from fastapi import APIRouter, Depends, HTTPException
+import math
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
-from app import models, schemas, dbm
+from app import models, schemas, dbm, rollups, live
+from app.money import ZERO
 from app.routes.auth import get_current_user
 
 router = APIRouter(prefix="/goals", tags=["goals"])
 
+TRACKING_MODES = ("manual", "savings", "category")
+FORECAST_MONTHS = 3  # trailing complete months used for the savings velocity
+DAYS_PER_MONTH = Decimal("30.44")
+FORECAST_HORIZON_DAYS = 100 * 365  # further out than this, a goal has no projected date
+
+
+# --- HELPERS ---
+
+def normalize_goal(data: dict) -> dict:
+    """Validate tracking/category in place; raises HTTPException(400)."""
+    data["tracking"] = (data.get("tracking") or "manual").strip().lower()
+    if data["tracking"] not in TRACKING_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid tracking, expected one of: {', '.join(TRACKING_MODES)}")
+    if data.get("category") is not None:
+        data["category"] = data["category"].strip().lower()
+    if data["tracking"] == "category" and not data.get("category"):
+        raise HTTPException(status_code=400, detail="category is required for category tracking")
+    if data["tracking"] != "manual" and data.get("start_date") is None:
+        data["start_date"] = date.today()
+    return data
+
+
+def refresh_progress(db: Session, goal: models.Goal):
+    """Recompute a tracked goal's current_amount (once, when it is created or re-targeted)."""
+    if goal.tracking != "manual":
+        db.flush()
+        goal.current_amount = rollups.compute_goal_progress(db, goal_ids=[goal.id]).get(goal.id, ZERO)
+
+
+def months_before(day: date, months: int) -> date:
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    return date(year, month + 1, 1)
+
+
+def trailing_velocity(db: Session, user_id: int, months: int = FORECAST_MONTHS) -> dict:
+    """Average monthly net savings and per-category amounts over the last complete months.
+
+    Read from the monthly rollup, so it is one small query however many goals use it.
+    """
+    M = models.MonthlyCategoryTotal
+    this_month = rollups.month_start(date.today())
+    rows = (
+        db.query(M.transaction_type, M.category, func.sum(M.amount))
+        .filter(M.user_id == user_id, M.month >= months_before(this_month, months), M.month < this_month)
+        .group_by(M.transaction_type, M.category)
+        .all()
+    )
+    savings = ZERO
+    categories = defaultdict(lambda: ZERO)
+    for tx_type, category, amount in rows:
+        savings += amount if tx_type == "income" else -amount
+        categories[category] += amount
+    return {
+        "savings": savings / months,
+        "categories": {category: amount / months for category, amount in categories.items()},
+    }
+
+
+def forecast(goal: models.Goal, velocity: dict, today: date) -> dict:
+    if goal.tracking == "category":
+        rate = velocity["categories"].get(goal.category, ZERO)
+    else:
+        rate = velocity["savings"]
+    remaining = max(goal.target_amount - (goal.current_amount or ZERO), ZERO)
+    completed = remaining == 0
+
+    projected = today if completed else None
+    if not completed and rate > 0:
+        days = math.ceil(remaining / rate * DAYS_PER_MONTH)
+        # A tiny positive velocity would otherwise run past date.max
+        if days <= min(FORECAST_HORIZON_DAYS, (date.max - today).days):
+            projected = today + timedelta(days=days)
+
+    months_left = (goal.deadline - today).days / DAYS_PER_MONTH
+    return {
+        "monthly_velocity": round(rate, 2),
+        "remaining": round(remaining, 2),
+        "completed": completed,
+        "projected_date": projected,
+        "on_track": projected is not None and projected <= goal.deadline,
+        "required_monthly": round(remaining / months_left, 2) if months_left > 0 else None,
+    }
+
+
+def goal_payload(goal: models.Goal, velocity: dict, today: date) -> dict:
+    payload = schemas.GoalResponse.model_validate(goal, from_attributes=True).model_dump()
+    current = goal.current_amount or ZERO
+    payload["progress"] = round(float(min(current / goal.target_amount, 1)) * 100, 1) if goal.target_amount else 0.0
+    payload["forecast"] = forecast(goal, velocity, today)
+    return payload
+
+
+def get_goal_or_404(db: Session, goal_id: int, user_id: int) -> models.Goal:
+    goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.user_id == user_id).first()
+    if not goal:
+        raise HTTPException(status_code=404, detail="Goal not found")
+    return goal
+
 
 # ---------------- CREATE GOAL ----------------
 @router.post("", response_model=schemas.GoalResponse)
 def create_goal(goal: schemas.GoalCreate, db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
-    new_goal = models.Goal(
-        target_amount=goal.target_amount,
-        current_amount=goal.current_amount,
-        deadline=goal.deadline,
-        user_id=current_user.id
-    )
+    new_goal = models.Goal(**normalize_goal(goal.dict()), user_id=current_user.id)
     db.add(new_goal)
+    refresh_progress(db, new_goal)
+    rollups.bump_data_version(db, current_user.id)
+    db.flush()
+    # Built before commit: the response and the live event carry the same payload
+    payload = goal_payload(new_goal, trailing_velocity(db, current_user.id), date.today())
+    live.publish(db, current_user.id, "goal.created", goal=payload)
     db.commit()
-    db.refresh(new_goal)
-    return new_goal
+    return payload
 
 
 # ---------------- LIST GOALS ----------------
 @router.get("", response_model=List[schemas.GoalResponse])
 def get_goals(db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Goal).filter(models.Goal.user_id == current_user.id).all()
+    # Two queries regardless of the number of goals: the goals, then one velocity read
+    goals = db.query(models.Goal).filter(models.Goal.user_id == current_user.id).order_by(models.Goal.id).all()
+    if not goals:
+        return []
+    velocity = trailing_velocity(db, current_user.id)
+    today = date.today()
+    return [goal_payload(goal, velocity, today) for goal in goals]
+
+
+# ---------------- GOAL PROJECTION ----------------
+@router.get("/{goal_id}/projection", response_model=schemas.GoalForecast)
+def get_goal_projection(
+    goal_id: int,
+    months: int = Query(FORECAST_MONTHS, ge=1, le=24, description="Trailing months used for the velocity"),
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    goal = get_goal_or_404(db, goal_id, current_user.id)
+    return forecast(goal, trailing_velocity(db, current_user.id, months), date.today())
 
 
 # ---------------- UPDATE GOAL ----------------
 @router.put("/{goal_id}", response_model=schemas.GoalResponse)
 def update_goal(
-    goal_id: int, 
-    updated: schemas.GoalCreate, 
-    db: Session = Depends(dbm.get_db), 
+    goal_id: int,
+    updated: schemas.GoalCreate,
+    db: Session = Depends(dbm.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.user_id == current_user.id).first()
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found")
+    goal = get_goal_or_404(db, goal_id, current_user.id)
+
+    for key, value in normalize_goal(updated.dict()).items():
+        setattr(goal, key, value)
+    # Tracked goals ignore the submitted current_amount; it comes from the transactions
+    refresh_progress(db, goal)
+    rollups.bump_data_version(db, current_user.id)
+    db.flush()
+    payload = goal_payload(goal, trailing_velocity(db, current_user.id), date.today())
+    live.publish(db, current_user.id, "goal.updated", goal=payload)
 
-    goal.target_amount = updated.target_amount
-    goal.current_amount = updated.current_amount
-    goal.deadline = updated.deadline
-    
     db.commit()
-    db.refresh(goal)
-    return goal
+    return payload
+
+
+# ---------------- PATCH GOAL ----------------
+@router.patch("/{goal_id}", response_model=schemas.GoalResponse)
+def patch_goal(
+    goal_id: int,
+    changes: schemas.GoalUpdate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    goal = get_goal_or_404(db, goal_id, current_user.id)
+    data = changes.dict(exclude_unset=True)
+    nulls = sorted(name for name in ("target_amount", "deadline") if name in data and data[name] is None)
+    if nulls:
+        raise HTTPException(status_code=400, detail=f"{', '.join(nulls)} cannot be null")
+
+    merged = normalize_goal({
+        "tracking": goal.tracking,
+        "category": goal.category,
+        "start_date": goal.start_date,
+        **data,
+    })
+    if merged["tracking"] != "manual":
+        merged.pop("current_amount", None)  # tracked goals get it from the transactions
+    for key, value in merged.items():
+        setattr(goal, key, value)
+    # Rescan only when what the goal counts changed; otherwise the rollups keep it current
+    if data.keys() & {"tracking", "category", "start_date"}:
+        refresh_progress(db, goal)
+    rollups.bump_data_version(db, current_user.id)
+    db.flush()
+    payload = goal_payload(goal, trailing_velocity(db, current_user.id), date.today())
+    live.publish(db, current_user.id, "goal.updated", goal=payload)
+
+    db.commit()
+    return payload
 
 
 # ---------------- DELETE GOAL ----------------
 @router.delete("/{goal_id}")
 def delete_goal(goal_id: int, db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
-    goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.user_id == current_user.id).first()
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found")
+    goal = get_goal_or_404(db, goal_id, current_user.id)
 
     db.delete(goal)
+    rollups.bump_data_version(db, current_user.id)
+    live.publish(db, current_user.id, "goal.deleted", id=goal_id)
     db.commit()
     return {"detail": "Goal deleted successfully"}
@@ -0,0 +1,87 @@
+import asyncio
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from app import models, schemas, dbm, live, rollups, cache
+from app.config import get_settings
+from app.routes.auth import get_current_user, user_from_subject
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+
+# EventSource cannot send headers, and a bearer token in the URL would end up
+# in access and proxy logs. Browsers trade their token for a ticket instead:
+# random, good for one stream, and only for LIVE_TICKET_TTL seconds.
+TICKET_TTL = get_settings().live_ticket_ttl
+stream_tickets = cache.create_cache("live-ticket", ttl=TICKET_TTL)
+
+
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    ticket: Optional[str] = Query(None, description="From POST /live/ticket, for EventSource"),
+    db: Session = Depends(dbm.get_db),
+) -> models.User:
+    if token or not ticket:
+        return get_current_user(token or "", db)
+    user_id = stream_tickets.pop(ticket)
+    user = user_from_subject(db, str(user_id)) if user_id is not None else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+    return user
+
+
+# ✅ Stream ticket (single use, short-lived)
+@router.post("/ticket", response_model=schemas.StreamTicket)
+def create_stream_ticket(current_user: models.User = Depends(get_current_user)):
+    ticket = secrets.token_urlsafe(32)
+    stream_tickets.set(ticket, current_user.id)
+    return {"ticket": ticket, "expires_in": TICKET_TTL}
+
+
+async def iter_frames(subscription: live.Subscription, first: list):
+    try:
+        for message in first:
+            yield message
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), live.HEARTBEAT)
+            except asyncio.TimeoutError:
+                message = live.PING  # keeps proxies from closing an idle stream
+            yield message
+    finally:
+        live.unsubscribe(subscription)
+
+
+# ✅ Live dashboard updates (Server-Sent Events)
+@router.get("/dashboard")
+async def dashboard_stream(
+    last_event_id: Optional[str] = Header(None),
+    run: dbm.SessionRunner = Depends(dbm.get_db_runner),
+    current_user: models.User = Depends(get_stream_user),
+):
+    """One event per committed transaction/goal write: the row, the new totals and what moved.
+
+    Event ids are the user's data_version. A reconnect whose Last-Event-ID is
+    no longer current (or a stream that fell behind) gets a ``resync`` event:
+    refetch the dashboard, then apply events as they arrive.
+    """
+    # Subscribe before reading the version so no write can slip in between
+    subscription = live.subscribe(current_user.id)
+    try:
+        version = await run(rollups.get_data_version, current_user.id)
+    except BaseException:
+        # iter_frames() never starts, so its finally cannot unsubscribe
+        live.unsubscribe(subscription)
+        raise
+    first = [live.frame("ready", version, {"data_version": version})]
+    if last_event_id is not None and last_event_id != str(version):
+        first.append(live.RESYNC)
+    return StreamingResponse(
+        iter_frames(subscription, first),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+from app import models, schemas, dbm, notifications
+from app.routes.auth import get_current_user
+
+router = APIRouter(prefix="/notifications", tags=["notifications"])
+
+
+# ---------------- LIST NOTIFICATIONS ----------------
+@router.get("", response_model=List[schemas.NotificationResponse])
+def get_notifications(
+    unread_only: bool = False,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    # Deliver this user's pending events now instead of waiting for the next scheduler pass
+    notifications.process_outbox(db, user_id=current_user.id)
+    N = models.Notification
+    query = db.query(N).filter(N.user_id == current_user.id)
+    if unread_only:
+        query = query.filter(N.read.is_(False))
+    return query.order_by(N.id.desc()).limit(limit).all()
+
+
+# ---------------- MARK ALL READ ----------------
+@router.post("/read-all")
+def mark_all_read(db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
+    N = models.Notification
+    count = (
+        db.query(N)
+        .filter(N.user_id == current_user.id, N.read.is_(False))
+        .update({"read": True}, synchronize_session=False)
+    )
+    db.commit()
+    return {"updated": count}
+
+
+# ---------------- MARK READ ----------------
+@router.post("/{notification_id}/read", response_model=schemas.NotificationResponse)
+def mark_read(
+    notification_id: int,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    N = models.Notification
+    notification = db.query(N).filter(N.id == notification_id, N.user_id == current_user.id).first()
+    if not notification:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    notification.read = True
+    db.commit()
+    db.refresh(notification)
+    return notification
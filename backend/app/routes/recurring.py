@@ -0,0 +1,98 @@
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+from app import models, schemas, dbm, scheduler, fx, live, rollups
+from app.routes.auth import get_current_user
+
+router = APIRouter(prefix="/recurring", tags=["recurring"])
+
+
+def _get_rule(db: Session, rule_id: int, user_id: int) -> models.RecurringRule:
+    rule = (
+        db.query(models.RecurringRule)
+        .filter(models.RecurringRule.id == rule_id, models.RecurringRule.user_id == user_id)
+        .first()
+    )
+    if not rule:
+        raise HTTPException(status_code=404, detail="Recurring rule not found")
+    return rule
+
+
+def _validated(db: Session, payload: schemas.RecurringRuleCreate, base_currency: str) -> dict:
+    try:
+        data = scheduler.normalize_rule(payload.dict())
+        data["currency"] = fx.check_currency(db, data.get("currency") or base_currency, base_currency)
+        return data
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+# ---------------- CREATE RULE ----------------
+@router.post("", response_model=schemas.RecurringRuleResponse)
+def create_rule(
+    rule: schemas.RecurringRuleCreate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    new_rule = models.RecurringRule(**_validated(db, rule, current_user.base_currency), user_id=current_user.id)
+    scheduler.schedule(db, new_rule)
+    db.add(new_rule)
+    db.flush()
+    # Occurrences that are already due show up right away instead of on the next pass
+    inserted = scheduler.materialize(db, [new_rule], date.today())
+    if inserted:
+        live.publish(db, current_user.id, "transactions.recurring", inserted=inserted)
+    db.commit()
+    db.refresh(new_rule)
+    return new_rule
+
+
+# ---------------- LIST RULES ----------------
+@router.get("", response_model=List[schemas.RecurringRuleResponse])
+def get_rules(db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
+    return (
+        db.query(models.RecurringRule)
+        .filter(models.RecurringRule.user_id == current_user.id)
+        .order_by(models.RecurringRule.id)
+        .all()
+    )
+
+
+# ---------------- UPDATE RULE ----------------
+@router.put("/{rule_id}", response_model=schemas.RecurringRuleResponse)
+def update_rule(
+    rule_id: int,
+    updated: schemas.RecurringRuleCreate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    rule = _get_rule(db, rule_id, current_user.id)
+    for key, value in _validated(db, updated, current_user.base_currency).items():
+        setattr(rule, key, value)
+    # Already materialized occurrences are kept; the new schedule applies from here on
+    scheduler.schedule(db, rule)
+    db.flush()
+    inserted = scheduler.materialize(db, [rule], date.today()) if rule.active else 0
+    if inserted:
+        live.publish(db, current_user.id, "transactions.recurring", inserted=inserted)
+    db.commit()
+    db.refresh(rule)
+    return rule
+
+
+# ---------------- DELETE RULE ----------------
+@router.delete("/{rule_id}")
+def delete_rule(rule_id: int, db: Session = Depends(dbm.get_db), current_user: models.User = Depends(get_current_user)):
+    rule = _get_rule(db, rule_id, current_user.id)
+    # Transactions it already created stay; they just lose the link
+    db.query(models.Transaction).filter(
+        models.Transaction.user_id == current_user.id, models.Transaction.recurring_rule_id == rule.id
+    ).update(
+        {"recurring_rule_id": None}, synchronize_session=False
+    )
+    db.delete(rule)
+    # Cached transaction pages still carry the old recurring_rule_id
+    rollups.bump_data_version(db, current_user.id)
+    db.commit()
+    return {"detail": "Recurring rule deleted successfully"}
@@ -1,11 +1,199 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
+from datetime import date
+from decimal import Decimal
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, dbm
+from typing import List, Optional
+from app import models, schemas, dbm, rollups, importers, httpcache, fx, categorizer, search, live, money
 from app.routes.auth import get_current_user
+from app.utils import normalize_transaction
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ("id", "date", "transaction_type", "category", "amount", "currency", "description")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+MAX_SEARCH_OFFSET = search.RANK_WINDOW
+
+MAX_BATCH_IDS = 10_000
+RESPONSE_COLUMNS = (
+    "id", "user_id", "transaction_type", "category", "amount", "currency", "date", "description", "recurring_rule_id",
+)
+ROLLUP_FIELDS = {"transaction_type", "category", "amount", "currency", "date"}  # fields the rollups depend on
+
+
+# --- FILTER / CURSOR HELPERS ---
+
+def transaction_filters(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    transaction_type: Optional[str] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None,
+    search: Optional[str] = Query(None, description="Case-insensitive description substring"),
+) -> schemas.TransactionFilter:
+    """Query-string filters shared by the listing endpoints."""
+    return schemas.TransactionFilter(
+        start_date=start_date,
+        end_date=end_date,
+        transaction_type=transaction_type,
+        category=category,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        search=search,
+    )
+
+
+def filter_clauses(filters: schemas.TransactionFilter) -> list:
+    """WHERE clauses for a TransactionFilter (the caller adds the user_id scope).
+
+    Type/category are compared against their stored (lower-cased) form so the
+    (user_id, transaction_type, date) and (user_id, category, date) indexes apply.
+    """
+    Tx = models.Transaction
+    clauses = []
+    if filters.start_date is not None:
+        clauses.append(Tx.date >= filters.start_date)
+    if filters.end_date is not None:
+        clauses.append(Tx.date <= filters.end_date)
+    if filters.transaction_type:
+        clauses.append(Tx.transaction_type == filters.transaction_type.strip().lower())
+    if filters.category:
+        clauses.append(Tx.category == filters.category.strip().lower())
+    if filters.min_amount is not None:
+        clauses.append(Tx.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        clauses.append(Tx.amount <= filters.max_amount)
+    if filters.search:
+        clauses.append(Tx.description.ilike(f"%{filters.search.strip()}%"))
+    return clauses
+
+
+def filter_transactions(query, filters: schemas.TransactionFilter):
+    """Apply a TransactionFilter to a query already scoped to one user."""
+    return query.filter(*filter_clauses(filters))
+
+
+def encode_cursor(transaction: models.Transaction) -> str:
+    raw = f"{transaction.date.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Returns the (date, id) keyset position encoded in an opaque cursor."""
+    try:
+        raw_date, raw_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(raw_date), int(raw_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# --- SET-BASED WRITES ---
+# Single-row and batch edits share these: one UPDATE/DELETE ... RETURNING per
+# request, with the rollups moved by the old and new values of the rows hit.
+
+def validated_transaction(db: Session, data: dict, base_currency: str) -> dict:
+    """normalize_transaction plus the currency check; raises HTTPException(400).
+
+    A missing currency means the user's base currency; any other one needs FX rates to it.
+    """
+    try:
+        data = normalize_transaction(data)
+        if "currency" in data:
+            data["currency"] = fx.check_currency(db, data["currency"] or base_currency, base_currency)
+        return data
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def validated_changes(db: Session, changes: schemas.TransactionUpdate, base_currency: str) -> dict:
+    """The fields a PATCH actually sent, normalized; raises HTTPException(400)."""
+    data = changes.dict(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    nulls = sorted(name for name, value in data.items() if value is None and name not in ("description", "currency"))
+    if nulls:
+        raise HTTPException(status_code=400, detail=f"{', '.join(nulls)} cannot be null")
+    return validated_transaction(db, data, base_currency)
+
+
+def selection_clauses(selection: schemas.TransactionSelection) -> list:
+    clauses = filter_clauses(selection.filters) if selection.filters else []
+    if selection.ids is not None:
+        if len(selection.ids) > MAX_BATCH_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+        clauses.append(models.Transaction.id.in_(selection.ids))
+    if not clauses:
+        # An empty selection would hit every row the user has
+        raise HTTPException(status_code=400, detail="Select transactions by ids or filters")
+    return clauses
+
+
+def update_transactions(db: Session, user_id: int, criteria: list, changes: dict) -> list:
+    """UPDATE the user's rows matching ``criteria``; returns the updated rows."""
+    Tx = models.Transaction
+    scope = [Tx.user_id == user_id, *criteria]
+    moves_rollups = bool(changes.keys() & ROLLUP_FIELDS)
+    if moves_rollups:
+        # Old values leave the rollups; rows are locked until commit (PostgreSQL)
+        old_rows = (
+            db.query(Tx.user_id, Tx.transaction_type, Tx.category, Tx.amount, Tx.currency, Tx.date)
+            .filter(*scope)
+            .with_for_update()
+            .all()
+        )
+        rollups.apply(db, old_rows, sign=-1)
+
+    stmt = (
+        update(Tx)
+        .where(*scope)
+        .values(changes)
+        .returning(*(getattr(Tx, name) for name in RESPONSE_COLUMNS))
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        rows = db.execute(stmt).all()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A recurring rule already has a transaction on that date")
+
+    if moves_rollups:
+        rollups.apply(db, rows)
+    elif rows:
+        rollups.bump_data_version(db, user_id)
+    return rows
+
+
+def delete_transactions(db: Session, user_id: int, criteria: list) -> list:
+    """DELETE the user's rows matching ``criteria``; returns the deleted rows."""
+    Tx = models.Transaction
+    stmt = (
+        delete(Tx)
+        .where(Tx.user_id == user_id, *criteria)
+        .returning(Tx.id, Tx.user_id, Tx.transaction_type, Tx.category, Tx.amount, Tx.currency, Tx.date)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(stmt).all()
+    rollups.apply(db, rows, sign=-1)
+    return rows
+
+
+def batch_result(rows) -> dict:
+    return {"count": len(rows), "ids": [row.id for row in rows]}
+
 
 # ✅ Create transaction
 @router.post("", response_model=schemas.TransactionResponse)
@@ -14,36 +202,223 @@ def create_transaction(
     db: Session = Depends(dbm.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    data = transaction.dict()
-
-    # Normalize type to lowercase
-    data["transaction_type"] = data["transaction_type"].strip().lower()
-    data["category"] = data["category"].strip().lower()
+    # Normalize type/category to lowercase, validate the type and the currency
+    data = validated_transaction(db, transaction.dict(), current_user.base_currency)
+    # No category (or "uncategorized"): the user's category rules pick one
+    categorizer.categorize(categorizer.get_matcher(db, current_user.id), data)
     data["user_id"] = current_user.id
 
-    # Optional: Validation
-    if data["transaction_type"] not in ["income", "expense"]:
-        raise HTTPException(status_code=400, detail="Invalid transaction type")
-
     new_transaction = models.Transaction(**data)
     db.add(new_transaction)
+    rollups.apply(db, [new_transaction])
+    db.flush()
+    live.publish(
+        db,
+        current_user.id,
+        "transaction.created",
+        transaction=schemas.TransactionResponse.model_validate(new_transaction, from_attributes=True),
+    )
     db.commit()
     db.refresh(new_transaction)
     return new_transaction
 
 
-# ✅ Get all transactions
-@router.get("", response_model=List[schemas.TransactionResponse])
-def get_transactions(
+# ✅ Bulk import a bank statement (CSV / OFX / QIF)
+@router.post("/import", response_model=schemas.ImportReport)
+def bulk_import_transactions(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ofx|qfx|qif)$", description="Defaults to the file extension"),
+    skip_duplicates: bool = True,
     db: Session = Depends(dbm.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    return (
-        db.query(models.Transaction)
-        .filter(models.Transaction.user_id == current_user.id)
-        .order_by(models.Transaction.date.desc())
+    try:
+        fmt = format or importers.detect_format(file.filename or "")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return importers.import_file(db, current_user.id, file.file, fmt, skip_duplicates)
+
+
+def list_transactions_page(db: Session, user_id: int, filters: schemas.TransactionFilter, limit: int, position=None):
+    """One keyset page, newest first; returns (rows, next_cursor or None)."""
+    query = filter_transactions(
+        db.query(models.Transaction).filter(models.Transaction.user_id == user_id),
+        filters,
+    )
+    if position is not None:
+        query = query.filter(tuple_(models.Transaction.date, models.Transaction.id) < tuple_(*position))
+
+    # Fetch one extra row to know whether another page exists
+    page = (
+        query.order_by(models.Transaction.date.desc(), models.Transaction.id.desc())
+        .limit(limit + 1)
         .all()
     )
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1])
+    return page, None
+
+
+def transactions_page_payload(db: Session, user_id: int, filters: schemas.TransactionFilter, limit: int, position=None):
+    page, next_cursor = list_transactions_page(db, user_id, filters, limit, position)
+    return {
+        "items": [schemas.TransactionResponse.model_validate(row, from_attributes=True) for row in page],
+        "next_cursor": next_cursor,
+    }
+
+
+# ✅ List transactions (newest first, keyset-paginated, ETag-aware)
+@router.get("", response_model=List[schemas.TransactionResponse])
+async def get_transactions(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    filters: schemas.TransactionFilter = Depends(transaction_filters),
+    run: dbm.SessionRunner = Depends(dbm.get_db_runner),
+    current_user: models.User = Depends(get_current_user),
+):
+    position = decode_cursor(cursor) if cursor else None
+    etag, body = await httpcache.fetch(
+        request, run, current_user.id, transactions_page_payload, filters, limit, position
+    )
+    if body is None:
+        return httpcache.not_modified(etag)
+    headers = {"X-Next-Cursor": body["next_cursor"]} if body["next_cursor"] else {}
+    return httpcache.json_response(etag, body["items"], headers)
+
+
+# ✅ Full-text search over descriptions (ranked, prefix matching, combinable with the filters)
+@router.get("/search", response_model=List[schemas.TransactionSearchHit])
+def search_transactions(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find; each matches as a prefix"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    filters: schemas.TransactionFilter = Depends(transaction_filters),
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    terms = search.query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="The query has no searchable words")
+    rows = search.search_transactions(db, current_user.id, terms, filter_clauses(filters), limit, offset)
+    return [
+        {**schemas.TransactionResponse.model_validate(transaction, from_attributes=True).model_dump(), "rank": rank}
+        for transaction, rank in rows
+    ]
+
+
+# --- EXPORT ---
+
+def iter_export(user_id: int, filters: schemas.TransactionFilter, fmt: str = "csv", compress: bool = False):
+    """Yield an export of a user's transactions chunk by chunk.
+
+    Rows come from a server-side cursor (yield_per) as plain tuples and are
+    encoded EXPORT_BATCH_SIZE at a time, so memory stays flat for any row
+    count. The generator owns its session: dependencies with yield are torn
+    down before a StreamingResponse body is sent.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 = gzip container
+
+    def emit(chunk: str):
+        data = chunk.encode()
+        return compressor.compress(data) if compressor else data
+
+    db = dbm.SessionLocal()
+    try:
+        query = filter_transactions(
+            db.query(*(getattr(models.Transaction, name) for name in EXPORT_COLUMNS)).filter(
+                models.Transaction.user_id == user_id
+            ),
+            filters,
+        )
+        rows = query.order_by(models.Transaction.date, models.Transaction.id).yield_per(EXPORT_BATCH_SIZE)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+
+        pending = 0
+        for row in rows:
+            if fmt == "csv":
+                writer.writerow(row)
+            else:
+                record = dict(zip(EXPORT_COLUMNS, row))
+                record["date"] = record["date"].isoformat()
+                record["amount"] = money.to_json(record["amount"])
+                buffer.write(json.dumps(record))
+                buffer.write("\n")
+            pending += 1
+            if pending >= EXPORT_BATCH_SIZE:
+                yield emit(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        tail = emit(buffer.getvalue())
+        if compressor:
+            tail += compressor.flush()
+        if tail:
+            yield tail
+    finally:
+        db.close()
+
+
+# ✅ Export transactions (streamed CSV / NDJSON, optionally gzipped)
+@router.get("/export")
+def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    filters: schemas.TransactionFilter = Depends(transaction_filters),
+    current_user: models.User = Depends(get_current_user),
+):
+    filename = f"transactions.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        iter_export(current_user.id, filters, format, gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ✅ Batch update (one UPDATE ... RETURNING for every selected row)
+@router.post("/batch/update", response_model=schemas.BatchResult)
+def batch_update_transactions(
+    batch: schemas.TransactionBatchUpdate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    rows = update_transactions(db, current_user.id, selection_clauses(batch), validated_changes(db, batch.changes, current_user.base_currency))
+    live.publish(db, current_user.id, "transactions.updated", ids=[row.id for row in rows])
+    db.commit()
+    return batch_result(rows)
+
+
+# ✅ Batch recategorize
+@router.post("/batch/recategorize", response_model=schemas.BatchResult)
+def batch_recategorize_transactions(
+    batch: schemas.TransactionRecategorize,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    changes = validated_changes(db, schemas.TransactionUpdate(category=batch.category), current_user.base_currency)
+    rows = update_transactions(db, current_user.id, selection_clauses(batch), changes)
+    live.publish(db, current_user.id, "transactions.updated", ids=[row.id for row in rows])
+    db.commit()
+    return batch_result(rows)
+
+
+# ✅ Batch delete (by ids and/or filters)
+@router.post("/batch/delete", response_model=schemas.BatchResult)
+def batch_delete_transactions(
+    selection: schemas.TransactionSelection,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    rows = delete_transactions(db, current_user.id, selection_clauses(selection))
+    live.publish(db, current_user.id, "transactions.deleted", ids=[row.id for row in rows])
+    db.commit()
+    return batch_result(rows)
 
 
 # ✅ Get single transaction
@@ -75,24 +450,25 @@ def delete_transaction(
     db: Session = Depends(dbm.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    transaction = (
-        db.query(models.Transaction)
-        .filter(
-            models.Transaction.id == transaction_id,
-            models.Transaction.user_id == current_user.id,
-        )
-        .first()
-    )
-
-    if not transaction:
+    if not delete_transactions(db, current_user.id, [models.Transaction.id == transaction_id]):
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    db.delete(transaction)
+    live.publish(db, current_user.id, "transaction.deleted", id=transaction_id)
     db.commit()
     return {"detail": "Transaction deleted successfully"}
 
 
-# ✅ Update transaction
+def _update_one(db: Session, user_id: int, transaction_id: int, changes: dict) -> dict:
+    rows = update_transactions(db, user_id, [models.Transaction.id == transaction_id], changes)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    updated = dict(rows[0]._mapping)
+    live.publish(db, user_id, "transaction.updated", transaction=updated)
+    db.commit()
+    return updated
+
+
+# ✅ Update transaction (full replacement)
 @router.put("/{transaction_id}", response_model=schemas.TransactionResponse)
 def update_transaction(
     transaction_id: int,
@@ -100,31 +476,17 @@ def update_transaction(
     db: Session = Depends(dbm.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    transaction = (
-        db.query(models.Transaction)
-        .filter(
-            models.Transaction.id == transaction_id,
-            models.Transaction.user_id == current_user.id,
-        )
-        .first()
-    )
-
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-
-    update_dict = updated_data.dict()
-    if "transaction_type" in update_dict:
-        update_dict["transaction_type"] = update_dict["transaction_type"].strip().lower()
-    if "category" in update_dict:
-        update_dict["category"] = update_dict["category"].strip().lower()
+    update_dict = validated_transaction(db, updated_data.dict(), current_user.base_currency)
+    categorizer.categorize(categorizer.get_matcher(db, current_user.id), update_dict)
+    return _update_one(db, current_user.id, transaction_id, update_dict)
 
-    # Optional validation
-    if update_dict.get("transaction_type") not in [None, "income", "expense"]:
-        raise HTTPException(status_code=400, detail="Invalid transaction type")
 
-    for key, value in update_dict.items():
-        setattr(transaction, key, value)
-
-    db.commit()
-    db.refresh(transaction)
-    return transaction
+# ✅ Partially update transaction (only the fields sent)
+@router.patch("/{transaction_id}", response_model=schemas.TransactionResponse)
+def patch_transaction(
+    transaction_id: int,
+    changes: schemas.TransactionUpdate,
+    db: Session = Depends(dbm.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    return _update_one(db, current_user.id, transaction_id, validated_changes(db, changes, current_user.base_currency))
@@ -0,0 +1,281 @@
+import argparse
+import calendar
+import logging
+import sys
+import threading
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+from app import models, dbm, rollups, notifications, live, schema
+from app.config import get_settings
+from app.utils import normalize_transaction
+
+# Recurring transaction scheduler.
+# Each pass loads a batch of rules whose next_run is due, materializes every
+# occurrence up to today as Transaction rows (one multi-row INSERT per batch),
+# applies them to the rollups and advances next_run, all in one commit.
+# Restarts resume from next_run, and the unique (user_id, recurring_rule_id, date)
+# index makes a re-run or a concurrent worker insert nothing twice. A batch
+# that fails is retried one rule per savepoint, so a broken rule (say, no FX
+# rate to its owner's base currency) is logged and skipped for the rest of the
+# pass instead of holding up everyone else's. Each pass also drains the
+# notification outbox (app.notifications).
+# Runs inside the API process (SCHEDULER_ENABLED=true) or as a worker:
+#
+#   python -m app.scheduler          # loop every SCHEDULER_INTERVAL seconds
+#   python -m app.scheduler --once   # single pass, e.g. from cron
+
+logger = logging.getLogger("app.scheduler")
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+SCHEDULER_INTERVAL = get_settings().scheduler_interval  # seconds between passes
+BATCH_SIZE = get_settings().scheduler_batch_size  # rules per INSERT/commit
+MAX_OCCURRENCES_PER_RULE = 1000  # catch-up cap per batch; the rest follows in the next batch
+
+
+# --- OCCURRENCE MATH ---
+
+def _add_months(day: date, months: int, day_of_month: int) -> date:
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    month += 1
+    return date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+
+
+def _step_months(rule) -> int:
+    return rule.interval * (12 if rule.frequency == "yearly" else 1)
+
+
+def next_occurrence(rule, day: date) -> date:
+    """The occurrence after ``day``, which must itself be an occurrence of ``rule``."""
+    if rule.frequency == "daily":
+        return day + timedelta(days=rule.interval)
+    if rule.frequency == "weekly":
+        return day + timedelta(weeks=rule.interval)
+    # Always re-anchor on day_of_month so the 31st survives a trip through February
+    return _add_months(day, _step_months(rule), rule.day_of_month or rule.start_date.day)
+
+
+def first_occurrence(rule, on_or_after: Optional[date] = None) -> Optional[date]:
+    """First occurrence on/after ``on_or_after`` (default start_date); None past end_date."""
+    start = rule.start_date
+    day = start
+    if rule.frequency in ("monthly", "yearly") and rule.day_of_month:
+        day = _add_months(start, 0, rule.day_of_month)
+        if day < start:
+            day = _add_months(start, _step_months(rule), rule.day_of_month)
+    while on_or_after is not None and day < on_or_after:
+        day = next_occurrence(rule, day)
+    if rule.end_date is not None and day > rule.end_date:
+        return None
+    return day
+
+
+def normalize_rule(data: dict) -> dict:
+    """Validate a rule payload in place; raises ValueError like normalize_transaction."""
+    normalize_transaction(data)
+    if data.get("frequency") is not None:
+        data["frequency"] = data["frequency"].strip().lower()
+        if data["frequency"] not in FREQUENCIES:
+            raise ValueError(f"Invalid frequency, expected one of: {', '.join(FREQUENCIES)}")
+    if data.get("end_date") is not None and data["end_date"] < data["start_date"]:
+        raise ValueError("end_date must not be before start_date")
+    return data
+
+
+def schedule(db: Session, rule: models.RecurringRule):
+    """(Re)compute next_run after a rule is created or edited.
+
+    Occurrences already materialized stay as they are; the new schedule picks
+    up from the day after the latest one.
+    """
+    resume_from = None
+    if rule.id is not None:
+        last = (
+            db.query(func.max(models.Transaction.date))
+            .filter(models.Transaction.user_id == rule.user_id, models.Transaction.recurring_rule_id == rule.id)
+            .scalar()
+        )
+        resume_from = last + timedelta(days=1) if last else None
+    rule.next_run = first_occurrence(rule, resume_from)
+    rule.active = rule.next_run is not None
+
+
+# --- MATERIALIZATION ---
+
+def _insert_occurrences(db: Session, rows: List[dict]) -> List[dict]:
+    """INSERT rows, skipping (rule, date) pairs that already exist; returns the inserted ones."""
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        db.execute(insert(models.Transaction), rows)
+        return rows
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    Tx = models.Transaction
+    stmt = (
+        dialect_insert(Tx)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["user_id", "recurring_rule_id", "date"])
+        .returning(Tx.user_id, Tx.transaction_type, Tx.category, Tx.amount, Tx.currency, Tx.date)
+    )
+    return [row._asdict() for row in db.execute(stmt)]
+
+
+def materialize(db: Session, rules: List[models.RecurringRule], today: date) -> int:
+    """Insert every due occurrence of ``rules`` and advance their next_run (no commit)."""
+    rows, advanced = [], []
+    for rule in rules:
+        last = min(today, rule.end_date) if rule.end_date else today
+        day = rule.next_run
+        count = 0
+        while day is not None and day <= last and count < MAX_OCCURRENCES_PER_RULE:
+            rows.append({
+                "user_id": rule.user_id,
+                "transaction_type": rule.transaction_type,
+                "category": rule.category,
+                "amount": rule.amount,
+                "date": day,
+                "currency": rule.currency,
+                "description": rule.description,
+                "recurring_rule_id": rule.id,
+            })
+            day = next_occurrence(rule, day)
+            count += 1
+        finished = day is None or (rule.end_date is not None and day > rule.end_date)
+        advanced.append({"id": rule.id, "next_run": None if finished else day, "active": not finished})
+
+    inserted = []
+    # Chunked so one INSERT stays under SQLite's bound-parameter limit
+    for offset in range(0, len(rows), BATCH_SIZE):
+        inserted += _insert_occurrences(db, rows[offset:offset + BATCH_SIZE])
+    if inserted:
+        rollups.apply(db, [SimpleNamespace(**row) for row in inserted])
+    if advanced:
+        db.execute(update(models.RecurringRule), advanced)
+    return len(inserted)
+
+
+def materialize_each(db: Session, rules: List[models.RecurringRule], today: date) -> Tuple[int, List[int]]:
+    """materialize() one rule per savepoint; returns (inserted, ids of the rules that failed)."""
+    inserted, failed = 0, []
+    for rule in rules:
+        rule_id = rule.id
+        try:
+            with db.begin_nested():
+                inserted += materialize(db, [rule], today)
+        except Exception:
+            logger.exception("Skipping recurring rule %s", rule_id)
+            failed.append(rule_id)
+    return inserted, failed
+
+
+def due_rules(db: Session, today: date, limit: int, skip: Iterable[int] = ()) -> List[models.RecurringRule]:
+    query = db.query(models.RecurringRule).filter(
+        models.RecurringRule.active.is_(True), models.RecurringRule.next_run <= today
+    )
+    if skip:
+        query = query.filter(models.RecurringRule.id.not_in(skip))
+    query = query.order_by(models.RecurringRule.id).limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        # Concurrent workers split the due rules instead of waiting on each other
+        query = query.with_for_update(skip_locked=True)
+    return query.all()
+
+
+def run_once(db: Session, today: Optional[date] = None, batch_size: int = BATCH_SIZE) -> dict:
+    """Materialize everything due for all users, then drain the outbox; one commit per batch."""
+    today = today or date.today()
+    stats = {"rules": 0, "inserted": 0, "skipped": 0, "notifications": 0}
+    failed = set()  # left due, so keep them out of this pass's later batches
+    while True:
+        rules = due_rules(db, today, batch_size, failed)
+        if not rules:
+            stats["notifications"] = notifications.process_outbox(db)
+            return stats
+        try:
+            with db.begin_nested():
+                inserted = materialize(db, rules, today)
+            skipped = []
+        except Exception:
+            inserted = None
+        if inserted is None:
+            inserted, skipped = materialize_each(db, rules, today)
+            failed.update(skipped)
+        stats["skipped"] += len(skipped)
+        stats["inserted"] += inserted
+        stats["rules"] += len(rules)
+        live.publish_pending(db, "transactions.recurring")
+        db.commit()
+
+
+# --- BACKGROUND LOOP ---
+
+_stop = threading.Event()
+_thread = None
+
+
+def run_forever(interval: float = SCHEDULER_INTERVAL, stop: threading.Event = _stop):
+    while True:
+        db = dbm.SessionLocal()
+        try:
+            stats = run_once(db)
+            if stats["inserted"]:
+                logger.info("Materialized %(inserted)s recurring transaction(s) from %(rules)s rule(s)", stats)
+            if stats["skipped"]:
+                logger.warning("Skipped %(skipped)s recurring rule(s) that failed; see the errors above", stats)
+            if stats["notifications"]:
+                logger.info("Delivered %(notifications)s notification event(s)", stats)
+        except Exception:
+            db.rollback()
+            logger.exception("Recurring transaction pass failed")
+        finally:
+            db.close()
+        if stop.wait(interval):
+            return
+
+
+def start(interval: float = SCHEDULER_INTERVAL):
+    """Run the scheduler on a daemon thread of the API process."""
+    global _thread
+    if _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=run_forever, args=(interval,), name="recurring-scheduler", daemon=True)
+        _thread.start()
+
+
+def stop():
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=10)
+        _thread = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialize due recurring transactions")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    parser.add_argument("--interval", type=float, default=SCHEDULER_INTERVAL, help="seconds between passes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    schema.require_head(dbm.engine)
+    if args.once:
+        db = dbm.SessionLocal()
+        try:
+            print(f"Materialized: {run_once(db)}")
+            return 0
+        finally:
+            db.close()
+    try:
+        run_forever(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+from sqlalchemy import text
+
+# Schema management. Alembic owns the schema (backend/migrations); run it
+# once per deploy, before starting the workers:
+#
+#   alembic upgrade head
+#
+# or set DB_AUTO_MIGRATE=true to have a single-worker dev server do it on
+# startup. The command-line tools (python -m app.rollups etc.) never change
+# the schema; they refuse to run until it is at head (require_head()). The
+# one exception is `python -m app.search setup`, which builds the baseline's
+# search index ahead of time on a large table.
+#
+# Revisions spell out their own DDL instead of reading app.models, so
+# replaying them always builds the same schema. The baseline creates a
+# fresh database and also upgrades one made by the old create-on-startup code;
+# 0002 hash-partitions transactions by user_id on PostgreSQL
+# (TRANSACTION_PARTITIONS, default 16; 0 leaves the table as it is).
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+# --- PARTITIONING (PostgreSQL) ---
+
+def scope_rule_index(bind):
+    """Replace the (recurring_rule_id, date) unique index with one that leads with user_id."""
+    bind.execute(text("DROP INDEX IF EXISTS ux_transactions_rule_date"))
+    bind.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_transactions_user_rule_date"
+        " ON transactions (user_id, recurring_rule_id, date)"
+    ))
+
+
+def unscope_rule_index(bind):
+    """Reverse of scope_rule_index()."""
+    bind.execute(text("DROP INDEX IF EXISTS ux_transactions_user_rule_date"))
+    bind.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_transactions_rule_date ON transactions (recurring_rule_id, date)"
+    ))
+
+
+def is_partitioned(bind, table: str = "transactions") -> bool:
+    return bind.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).first() is not None
+
+
+def _replace_transactions(bind, staging: str, create: list):
+    """Swap transactions for ``staging`` built by ``create``, keeping rows, id sequence and indexes.
+
+    The indexes are recreated from their current definitions (search's GIN
+    index included), not from app.models.
+    """
+    sequence = bind.execute(text("SELECT pg_get_serial_sequence('transactions', 'id')")).scalar()
+    indexes = bind.execute(text(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = 'transactions' AND indexname <> 'transactions_pkey'"
+        " AND schemaname = current_schema()"
+    )).scalars().all()
+    statements = [
+        *create,
+        f"ALTER TABLE {staging} ADD CONSTRAINT transactions_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)",
+        f"ALTER TABLE {staging} ADD CONSTRAINT transactions_recurring_rule_id_fkey"
+        " FOREIGN KEY (recurring_rule_id) REFERENCES recurring_rules (id)",
+        f"INSERT INTO {staging} SELECT * FROM transactions",
+        *([f"ALTER SEQUENCE {sequence} OWNED BY NONE"] if sequence else []),
+        "DROP TABLE transactions",
+        f"ALTER TABLE {staging} RENAME TO transactions",
+        f"ALTER TABLE transactions RENAME CONSTRAINT {staging}_pkey TO transactions_pkey",
+        *([f"ALTER SEQUENCE {sequence} OWNED BY transactions.id"] if sequence else []),
+    ]
+    for statement in statements:
+        bind.execute(text(statement))
+    # On a partitioned table, indexes on the parent are created on every partition
+    for indexdef in indexes:
+        bind.execute(text(indexdef))
+    bind.execute(text("ANALYZE transactions"))
+
+
+def partition_transactions(bind, partitions: int) -> bool:
+    """Rebuild transactions as ``partitions`` hash partitions by user_id; idempotent.
+
+    Every user's rows land in one partition, so queries filtering on
+    user_id = :id only touch that partition and its (smaller) indexes.
+    Copies the table inside the caller's transaction; plan a maintenance
+    window for large tables. Returns False when there is nothing to do.
+    """
+    if bind.dialect.name != "postgresql" or partitions < 1 or is_partitioned(bind):
+        return False
+    _replace_transactions(bind, "transactions_partitioned", [
+        # LIKE copies columns, defaults (the id sequence) and NOT NULL/CHECK constraints
+        "CREATE TABLE transactions_partitioned (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        " PARTITION BY HASH (user_id)",
+        # Unique constraints on a partitioned table must contain the partition key
+        "ALTER TABLE transactions_partitioned ADD PRIMARY KEY (id, user_id)",
+        *(
+            f"CREATE TABLE transactions_p{remainder} PARTITION OF transactions_partitioned"
+            f" FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            for remainder in range(partitions)
+        ),
+    ])
+    return True
+
+
+def unpartition_transactions(bind) -> bool:
+    """Reverse of partition_transactions(): one plain table keyed by id again."""
+    if bind.dialect.name != "postgresql" or not is_partitioned(bind):
+        return False
+    _replace_transactions(bind, "transactions_plain", [
+        "CREATE TABLE transactions_plain (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        "ALTER TABLE transactions_plain ADD PRIMARY KEY (id)",
+    ])
+    return True
+
+
+def require_head(engine):
+    """Raise RuntimeError unless the database has every migration applied."""
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_heads())
+    with engine.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+    if current != heads:
+        raise RuntimeError(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, expected"
+            f" {', '.join(sorted(heads))}; run `alembic upgrade head` first"
+        )
+
+
+def upgrade(revision: str = "head"):
+    """``alembic upgrade <revision>`` against the configured database."""
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(ALEMBIC_INI), revision)
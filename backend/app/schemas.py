@@ -1,12 +1,15 @@
-from pydantic import BaseModel, EmailStr
-from datetime import date
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+import datetime as dt
+from datetime import date, datetime
+from typing import Dict, Optional, List
+from app.money import Money, ZERO
 
 # ---------------- AUTH ----------------
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
     name: str
+    base_currency: Optional[str] = None
 
 
 class UserLogin(BaseModel):
@@ -18,40 +21,210 @@ class UserResponse(BaseModel):
     id: int
     email: EmailStr
     name: str
+    base_currency: str = "USD"
 
     class Config:
         orm_mode = True
 
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    base_currency: Optional[str] = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
+
 # ---------------- TRANSACTIONS ----------------
 class TransactionBase(BaseModel):
     transaction_type: str
     category: str
-    amount: float
+    amount: Money
+    currency: Optional[str] = None  # defaults to the user's base currency
     date: date
     description: Optional[str] = None
 
 
 class TransactionCreate(TransactionBase):
-    pass
+    category: Optional[str] = None  # omitted or "uncategorized": picked by the user's category rules
 
 
 class TransactionUpdate(BaseModel):
     transaction_type: Optional[str] = None
     category: Optional[str] = None
-    amount: Optional[float] = None
-    date: Optional[date] = None
+    amount: Optional[Money] = None
+    currency: Optional[str] = None
+    # Not Optional[date]: the class body has already bound "date" to this None default
+    date: Optional[dt.date] = None
     description: Optional[str] = None
 
 
+class TransactionFilter(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    transaction_type: Optional[str] = None
+    category: Optional[str] = None
+    min_amount: Optional[Money] = None
+    max_amount: Optional[Money] = None
+    search: Optional[str] = None
+
+
+class TransactionSelection(BaseModel):
+    """Rows a batch operation applies to: explicit ids, a filter, or both (ANDed)."""
+    ids: Optional[List[int]] = None
+    filters: Optional[TransactionFilter] = None
+
+
+class TransactionBatchUpdate(TransactionSelection):
+    changes: TransactionUpdate
+
+
+class TransactionRecategorize(TransactionSelection):
+    category: str
+
+
+class BatchResult(BaseModel):
+    count: int
+    ids: List[int]
+
+
 class TransactionResponse(TransactionBase):
     id: int
     user_id: int
+    recurring_rule_id: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+
+class TransactionSearchHit(TransactionResponse):
+    rank: float  # higher = better match
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    inserted: int
+    duplicates: int
+    errors: List[ImportRowError]
+
+
+# ---------------- CATEGORY RULES ----------------
+class CategoryRuleBase(BaseModel):
+    category: str
+    match_type: str = "contains"  # contains or regex
+    pattern: str = Field("", max_length=200)
+    transaction_type: Optional[str] = None
+    min_amount: Optional[Money] = None
+    max_amount: Optional[Money] = None
+    priority: int = 100  # lower runs first
+
+
+class CategoryRuleCreate(CategoryRuleBase):
+    pass
+
+
+class CategoryRuleResponse(CategoryRuleBase):
+    id: int
+    user_id: int
+
+    class Config:
+        orm_mode = True
+
+
+class CategorizeRequest(BaseModel):
+    filters: Optional[TransactionFilter] = None
+    only_uncategorized: bool = True  # False re-applies the rules to every selected row
+
+
+class CategorizeReport(BaseModel):
+    scanned: int
+    updated: int
+    categories: Dict[str, int]  # new category -> rows moved into it
+
+
+# ---------------- BUDGETS ----------------
+class BudgetBase(BaseModel):
+    category: str
+    amount: Money  # monthly limit in the user's base currency
+    alert_percent: Optional[int] = Field(80, ge=1, le=100)  # early warning; null = only when exceeded
+
+
+class BudgetCreate(BudgetBase):
+    pass
+
+
+class BudgetResponse(BudgetBase):
+    id: int
+    user_id: int
+
+    class Config:
+        orm_mode = True
+
+
+class BudgetStatus(BaseModel):
+    category: str
+    budget_id: Optional[int] = None  # null: spending in a category without a budget
+    budget: Optional[Money] = None
+    spent: Money
+    remaining: Optional[Money] = None
+    percent_used: Optional[float] = None
+    over_budget: bool = False
+
+
+class BudgetReport(BaseModel):
+    month: date
+    currency: str
+    total_budget: Money
+    total_spent: Money
+    categories: List[BudgetStatus]
+
+
+# ---------------- NOTIFICATIONS ----------------
+class NotificationResponse(BaseModel):
+    id: int
+    kind: str
+    message: str
+    read: bool
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+# ---------------- RECURRING RULES ----------------
+class RecurringRuleBase(BaseModel):
+    transaction_type: str
+    category: str
+    amount: Money
+    currency: Optional[str] = None
+    description: Optional[str] = None
+    frequency: str = "monthly"
+    interval: int = Field(1, ge=1)
+    day_of_month: Optional[int] = Field(None, ge=1, le=31)
+    start_date: date
+    end_date: Optional[date] = None
+
+
+class RecurringRuleCreate(RecurringRuleBase):
+    pass
+
+
+class RecurringRuleResponse(RecurringRuleBase):
+    id: int
+    user_id: int
+    next_run: Optional[date] = None
+    active: bool
 
     class Config:
         orm_mode = True
@@ -59,9 +232,12 @@ class TransactionResponse(TransactionBase):
 
 # ---------------- GOALS ----------------
 class GoalBase(BaseModel):
-    target_amount: float
-    current_amount: float = 0.0
+    target_amount: Money
+    current_amount: Money = ZERO
     deadline: date
+    tracking: str = "manual"  # manual, savings or category
+    category: Optional[str] = None
+    start_date: Optional[date] = None
 
 
 class GoalCreate(GoalBase):
@@ -69,14 +245,28 @@ class GoalCreate(GoalBase):
 
 
 class GoalUpdate(BaseModel):
-    target_amount: Optional[float] = None
-    current_amount: Optional[float] = None
+    target_amount: Optional[Money] = None
+    current_amount: Optional[Money] = None
     deadline: Optional[date] = None
+    tracking: Optional[str] = None
+    category: Optional[str] = None
+    start_date: Optional[date] = None
+
+
+class GoalForecast(BaseModel):
+    monthly_velocity: Money
+    remaining: Money
+    completed: bool
+    projected_date: Optional[date] = None
+    on_track: bool
+    required_monthly: Optional[Money] = None
 
 
 class GoalResponse(GoalBase):
     id: int
     user_id: int
+    progress: float = 0.0  # percent of target_amount
+    forecast: Optional[GoalForecast] = None
 
     class Config:
         orm_mode = True
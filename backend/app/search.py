@@ -0,0 +1,187 @@
+import argparse
+import re
+import sys
+from typing import List, Optional
+from sqlalchemy import column, func, inspect, literal_column, select, table, text
+from sqlalchemy.orm import Session
+from app import models, dbm
+from app.config import get_settings
+
+# Full-text search over transaction descriptions.
+# PostgreSQL: a GIN index on to_tsvector(SEARCH_CONFIG, description); the
+# database maintains it on every write and ts_rank() orders the hits.
+# SQLite (local/test runs): an external-content FTS5 table kept in sync by
+# triggers, so ORM, Core and bulk writes are all covered; bm25() orders the
+# hits. Other databases fall back to unranked substring matching.
+#
+# Every query term is matched as a prefix ("star buc" finds "Starbucks #12");
+# ranking is limited to the most recent SEARCH_RANK_WINDOW matches.
+# The baseline migration runs setup(); on a large existing table it can be
+# built ahead of `alembic upgrade head` (idempotent, so the migration then
+# finds it in place):
+#
+#   python -m app.search setup
+
+SEARCH_CONFIG = get_settings().search_config  # PostgreSQL text search configuration
+MAX_TERMS = 8
+RANK_WINDOW = get_settings().search_rank_window  # most recent matches that get ranked
+FTS_TABLE = "transactions_fts"
+TERM = re.compile(r"\w+", re.UNICODE)
+
+_fts_ready = set()  # engine URLs whose SQLite FTS table is known to exist
+
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON transactions BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+        END""",
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON transactions BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        END""",
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF description ON transactions BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+        END""",
+}
+
+
+def _pg_config():
+    return literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+
+
+def _pg_vector():
+    # Must stay identical to the indexed expression in setup() for the planner to use it
+    return func.to_tsvector(_pg_config(), func.coalesce(models.Transaction.description, literal_column("''")))
+
+
+def setup(bind) -> str:
+    """Create the search index (and, on SQLite, its sync triggers); idempotent.
+
+    ``bind`` is an Engine or a Connection inside a migration. Returns the mode
+    in use: "tsvector", "fts5" or "like".
+    """
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        with dbm.begin(bind) as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_transactions_description_fts ON transactions "
+                f"USING GIN (to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(description, '')))"
+            ))
+        return "tsvector"
+    if dialect != "sqlite":
+        return "like"
+
+    with dbm.begin(bind) as conn:
+        try:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "description, content='transactions', content_rowid='id', prefix='2 3')"
+            ))
+        except Exception:
+            return "like"  # SQLite built without FTS5
+        existing = {
+            name for (name,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))
+        }
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        for name in missing:
+            conn.execute(text(SQLITE_TRIGGERS[name]))
+        if missing:
+            # New table, or transactions was recreated (its triggers went with it): reindex
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    _fts_ready.add(str(bind.engine.url))
+    return "fts5"
+
+
+def _mode(db: Session) -> str:
+    engine = db.get_bind()
+    if engine.dialect.name == "postgresql":
+        return "tsvector"
+    if engine.dialect.name == "sqlite":
+        if str(engine.url) not in _fts_ready and inspect(engine).has_table(FTS_TABLE):
+            _fts_ready.add(str(engine.url))
+        if str(engine.url) in _fts_ready:
+            return "fts5"
+    return "like"
+
+
+def query_terms(q: str) -> List[str]:
+    """Lower-cased word terms of a user query (punctuation and operators dropped)."""
+    return TERM.findall(q.lower())[:MAX_TERMS]
+
+
+def search_transactions(
+    db: Session,
+    user_id: int,
+    terms: List[str],
+    criteria: Optional[list] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> list:
+    """The user's transactions matching every term (as a prefix), best first.
+
+    Returns (Transaction, rank) pairs, higher rank = better match; ties go
+    to the newest row. ``criteria`` are extra WHERE clauses (date/category
+    filters). Only the RANK_WINDOW most recently added matches are ranked, so
+    a term found in half of a large history still costs one bounded index
+    scan instead of scoring every row.
+    """
+    Tx = models.Transaction
+    scope = [Tx.user_id == user_id, *(criteria or [])]
+    mode = _mode(db)
+    if mode == "like":
+        return (
+            db.query(Tx, literal_column("0.0").label("rank"))
+            .filter(*scope, *(Tx.description.ilike(f"%{term}%") for term in terms))
+            .order_by(Tx.date.desc(), Tx.id.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    if mode == "tsvector":
+        tsquery = func.to_tsquery(_pg_config(), " & ".join(f"{term}:*" for term in terms))
+        candidates = (
+            select(Tx.id, func.ts_rank(_pg_vector(), tsquery).label("rank"))
+            .where(_pg_vector().op("@@")(tsquery), *scope)
+            .order_by(Tx.id.desc())
+        )
+    else:
+        fts = table(FTS_TABLE, column("rowid"))
+        match = " ".join(f'"{term}"*' for term in terms)
+        # bm25() is lower-is-better; negate it so every mode ranks higher-is-better.
+        # Ordering by the FTS rowid lets SQLite walk the index backwards and stop early.
+        candidates = (
+            select(Tx.id, (-func.bm25(literal_column(FTS_TABLE))).label("rank"))
+            .select_from(fts)
+            .join(Tx, Tx.id == fts.c.rowid)
+            .where(literal_column(FTS_TABLE).op("MATCH")(match), *scope)
+            .order_by(fts.c.rowid.desc())
+        )
+    candidates = candidates.limit(RANK_WINDOW).subquery()
+    return (
+        db.query(Tx, candidates.c.rank)
+        .join(candidates, candidates.c.id == Tx.id)
+        .filter(Tx.user_id == user_id)  # lets PostgreSQL prune to the user's partition
+        .order_by(candidates.c.rank.desc(), Tx.date.desc(), Tx.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create the transaction description search index")
+    parser.add_argument("command", choices=["setup"])
+    parser.parse_args(argv)
+
+    # Meant to run ahead of `alembic upgrade head` on a large table, so only the table itself is required
+    if not inspect(dbm.engine).has_table("transactions"):
+        raise RuntimeError("No transactions table; run `alembic upgrade head` first")
+    print(f"Search index ready ({setup(dbm.engine)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from typing import List, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app import models, dbm, aggregates, fx, rollups, schema
+from app.config import get_settings
+from app.money import ZERO
+
+# Precomputed monthly report snapshots (income, expense, per-category expense)
+# for every user, built by a batch job, e.g. nightly from cron:
+#
+#   python -m app.snapshots run [--months 2] [--workers 8] [--partition-size 500]
+#
+# Users are split into id-range partitions that a process pool works through;
+# each partition costs a handful of set-based queries and one commit. A
+# snapshot records the user's data_version, so any later write makes it
+# stale and readers fall back to live queries. Re-running only rebuilds
+# missing or stale snapshots, so an interrupted run resumes where it stopped.
+
+logger = logging.getLogger("app.snapshots")
+
+SNAPSHOT_MONTHS = get_settings().snapshot_months  # current month and the one before
+PARTITION_SIZE = get_settings().snapshot_partition_size  # users per partition/commit
+WORKERS = get_settings().snapshot_workers or os.cpu_count() or 1
+
+
+def target_months(today: date, count: int = SNAPSHOT_MONTHS) -> List[date]:
+    """The first days of the last ``count`` months up to ``today``, oldest first."""
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months[::-1]
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+# --- BUILDING ---
+
+def plan(db: Session, partition_size: int = PARTITION_SIZE) -> List[Tuple[int, int]]:
+    """Inclusive (first_id, last_id) user id ranges of at most ``partition_size`` users."""
+    ids = [user_id for (user_id,) in db.query(models.User.id).order_by(models.User.id)]
+    return [(chunk[0], chunk[-1]) for chunk in (ids[i:i + partition_size] for i in range(0, len(ids), partition_size))]
+
+
+def build_partition(db: Session, first_id: int, last_id: int, months: List[date]) -> dict:
+    """(Re)build the missing or stale snapshots of users ``first_id``..``last_id``.
+
+    Versions are read before the sums, so a write racing with the job leaves
+    a snapshot that is already stale rather than one that looks current.
+    """
+    U, S, Tx = models.User, models.ReportSnapshot, models.Transaction
+    current = {
+        user_id: (base or fx.DEFAULT_CURRENCY, version)
+        for user_id, base, version in db.query(U.id, U.base_currency, func.coalesce(models.UserTotals.data_version, 0))
+        .outerjoin(models.UserTotals, models.UserTotals.user_id == U.id)
+        .filter(U.id.between(first_id, last_id))
+    }
+    existing = {
+        (user_id, month): (currency, version)
+        for user_id, month, currency, version in db.query(S.user_id, S.month, S.currency, S.data_version)
+        .filter(S.user_id.between(first_id, last_id), S.month.in_(months))
+    }
+    stale = sorted(
+        user_id for user_id, state in current.items()
+        if any(existing.get((user_id, month)) != state for month in months)
+    )
+    if not stale:
+        return {"users": len(current), "snapshots": 0}
+
+    snapshots = {
+        (user_id, month): {"income": ZERO, "expense": ZERO, "transaction_count": 0, "categories": {}}
+        for user_id in stale for month in months
+    }
+    month_column = aggregates.truncate_date(db, Tx.date, "month")
+    rows = (
+        db.query(
+            Tx.user_id,
+            month_column,
+            Tx.transaction_type,
+            Tx.category,
+            func.sum(fx.converted_amount(U.base_currency)),
+            func.count(Tx.id),
+        )
+        .join(U, U.id == Tx.user_id)
+        .filter(Tx.user_id.in_(stale), Tx.date >= months[0], Tx.date < _next_month(months[-1]))
+        .group_by(Tx.user_id, month_column, Tx.transaction_type, Tx.category)
+    )
+    for user_id, month_value, tx_type, category, amount, count in rows:
+        snapshot = snapshots[(user_id, aggregates.as_date(month_value))]
+        snapshot[tx_type] += amount or ZERO
+        snapshot["transaction_count"] += count
+        if tx_type == "expense" and amount:
+            snapshot["categories"][category] = str(amount)
+
+    db.query(S).filter(S.user_id.in_(stale), S.month.in_(months)).delete(synchronize_session=False)
+    db.execute(insert(S), [
+        {
+            "user_id": user_id,
+            "month": month,
+            "currency": current[user_id][0],
+            "data_version": current[user_id][1],
+            **snapshot,
+            "categories": json.dumps(snapshot["categories"], sort_keys=True),
+        }
+        for (user_id, month), snapshot in snapshots.items()
+    ])
+    db.commit()
+    return {"users": len(current), "snapshots": len(snapshots)}
+
+
+def _init_worker():
+    # A forked worker must open its own connections, not reuse the parent's pool
+    dbm.engine.dispose(close=False)
+
+
+def _run_partition(bounds: Tuple[int, int], months: List[date]) -> dict:
+    db = dbm.SessionLocal()
+    try:
+        return build_partition(db, *bounds, months)
+    finally:
+        db.close()
+
+
+def run(months: List[date], workers: int = WORKERS, partition_size: int = PARTITION_SIZE) -> dict:
+    """Snapshot every user for ``months``; partitions run on ``workers`` processes.
+
+    Logs progress and throughput after every partition and returns the totals.
+    """
+    db = dbm.SessionLocal()
+    try:
+        partitions = plan(db, partition_size)
+    finally:
+        db.close()
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed  # the API never needs it
+
+    started = time.perf_counter()
+    totals = {"partitions": len(partitions), "users": 0, "snapshots": 0}
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker) if workers > 1 and len(partitions) > 1 else None
+    try:
+        if executor is None:
+            results = (_run_partition(bounds, months) for bounds in partitions)
+        else:
+            futures = [executor.submit(_run_partition, bounds, months) for bounds in partitions]
+            results = (future.result() for future in as_completed(futures))
+        for done, stats in enumerate(results, 1):
+            totals["users"] += stats["users"]
+            totals["snapshots"] += stats["snapshots"]
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "%d/%d partitions, %d users (%d snapshots rebuilt), %.0f users/s",
+                done, len(partitions), totals["users"], totals["snapshots"], totals["users"] / max(elapsed, 1e-9),
+            )
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    totals["seconds"] = round(time.perf_counter() - started, 3)
+    totals["users_per_second"] = round(totals["users"] / max(totals["seconds"], 1e-9), 1)
+    return totals
+
+
+# --- READ PATH ---
+
+def load(db: Session, user_id: int, months: List[date], currency: str) -> dict:
+    """``{month: ReportSnapshot}`` for the ``months`` whose snapshot is still current."""
+    S = models.ReportSnapshot
+    rows = db.query(S).filter(
+        S.user_id == user_id,
+        S.month.in_(months),
+        S.currency == currency,
+        S.data_version == rollups.get_data_version(db, user_id),
+    )
+    return {row.month: row for row in rows}
+
+
+def category_totals(snapshot: models.ReportSnapshot) -> dict:
+    return {category: Decimal(amount) for category, amount in json.loads(snapshot.categories).items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute monthly report snapshots for every user")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--months", type=int, default=SNAPSHOT_MONTHS, help="months to snapshot, ending with the current one")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes")
+    parser.add_argument("--partition-size", type=int, default=PARTITION_SIZE, help="users per partition")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    schema.require_head(dbm.engine)
+    print(f"Snapshots: {run(target_months(date.today(), args.months), args.workers, args.partition_size)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
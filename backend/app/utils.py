@@ -1,10 +1,71 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
+from app.config import get_settings
 
 # password hashing config
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with other cost parameters are flagged by needs_update() and
+# transparently re-hashed on the next successful login.
+BCRYPT_ROUNDS = get_settings().bcrypt_rounds
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+# bcrypt runs in its own small pool (it releases the GIL) so a burst of logins
+# cannot starve the threadpool every sync endpoint shares. Past
+# HASH_MAX_PENDING queued+running jobs new work is rejected instead of queued.
+HASH_WORKERS = get_settings().hash_workers or min(4, os.cpu_count() or 1)
+HASH_MAX_PENDING = get_settings().hash_max_pending or HASH_WORKERS * 8
+
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_stats = {"pending": 0, "completed": 0, "rejected": 0}
+
+
+class HasherSaturated(Exception):
+    """Raised when the password hashing pool already has HASH_MAX_PENDING jobs."""
+
+
+def hasher_stats() -> dict:
+    return {"workers": HASH_WORKERS, "max_pending": HASH_MAX_PENDING, **_hash_stats}
+
+
+async def _run_hasher(fn, *args):
+    # Counters are only touched from the event loop, so no lock is needed
+    if _hash_stats["pending"] >= HASH_MAX_PENDING:
+        _hash_stats["rejected"] += 1
+        raise HasherSaturated()
+    _hash_stats["pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_stats["pending"] -= 1
+        _hash_stats["completed"] += 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(pwd_context.hash, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    """Returns (is_valid, new_hash); new_hash is set when the stored hash needs upgrading."""
+    return await _run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+# transaction field normalization (shared by the API handlers and the importers)
+TRANSACTION_TYPES = ("income", "expense")
+
+def normalize_transaction(data: dict) -> dict:
+    """Lower-case type/category in place; raises ValueError for an unknown type."""
+    if data.get("transaction_type") is not None:
+        data["transaction_type"] = data["transaction_type"].strip().lower()
+        if data["transaction_type"] not in TRANSACTION_TYPES:
+            raise ValueError("Invalid transaction type")
+    if data.get("category") is not None:
+        data["category"] = data["category"].strip().lower()
+    return data
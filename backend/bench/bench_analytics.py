@@ -0,0 +1,45 @@
+# bench/bench_analytics.py
+# Times the spending analytics report over 10 years of daily history: the
+# full computation (one grouped query + NumPy) and the data_version cache hit.
+#
+#   python -m bench.bench_analytics --rows 36500 --iterations 20
+import argparse
+import json
+
+from bench.common import reset_schema, seed, time_calls
+from app import analytics, dbm, models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the spending analytics report")
+    parser.add_argument("--rows", type=int, default=36_500, help="transactions for the measured user")
+    parser.add_argument("--days", type=int, default=3650, help="history the rows are spread over")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        reset_schema()
+        seed(users=1, transactions_per_user=args.rows, days=args.days)
+
+    db = dbm.SessionLocal()
+    try:
+        user = db.query(models.User).order_by(models.User.id).first()
+        report = analytics.compute_analytics(db, user.id)
+        results = [
+            {"case": "computed", **time_calls(lambda: analytics.compute_analytics(db, user.id), args.iterations)},
+            {"case": "cached", **time_calls(lambda: analytics.spending_analytics(db, user.id), args.iterations)},
+        ]
+    finally:
+        db.close()
+
+    print(json.dumps({
+        "rows": args.rows,
+        "days": args.days,
+        "anomalies": len(report["anomalies"]),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
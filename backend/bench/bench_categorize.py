@@ -0,0 +1,76 @@
+# bench/bench_categorize.py
+# Times Matcher.match() over synthetic bank descriptions, single-threaded and
+# without a database; the target is >= 100k descriptions per second.
+#
+#   python -m bench.bench_categorize --rules 200 --regex-share 0.2
+import argparse
+import json
+import random
+import time
+from decimal import Decimal
+
+from app import models
+from app.categorizer import Matcher
+
+MERCHANTS = [
+    "uber", "lyft", "starbucks", "amazon", "netflix", "spotify", "shell", "chevron", "walmart", "target",
+    "costco", "kroger", "safeway", "whole foods", "trader joe", "mcdonalds", "chipotle", "doordash", "grubhub",
+    "airbnb", "delta", "united", "hilton", "marriott", "verizon", "comcast", "geico", "cvs", "walgreens", "ikea",
+]
+
+
+def make_rules(count: int, regex_share: float, rng: random.Random) -> list:
+    rules = []
+    for index in range(count):
+        merchant = MERCHANTS[index % len(MERCHANTS)] + ("" if index < len(MERCHANTS) else f" {index}")
+        regex = rng.random() < regex_share
+        rules.append(models.CategoryRule(
+            id=index + 1,
+            category=f"category {index % 25}",
+            match_type="regex" if regex else "contains",
+            pattern=rf"{merchant}\s*#?\d*" if regex else merchant,
+            transaction_type="expense" if index % 7 == 0 else None,
+            priority=100,
+        ))
+    return rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure category rule matching throughput")
+    parser.add_argument("--rules", type=int, default=100)
+    parser.add_argument("--regex-share", type=float, default=0.2, help="fraction of rules that are regexes")
+    parser.add_argument("--descriptions", type=int, default=200_000)
+    parser.add_argument("--hit-rate", type=float, default=0.7, help="fraction of descriptions naming a merchant")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    matcher = Matcher(make_rules(args.rules, args.regex_share, rng))
+    compile_seconds = time.perf_counter() - started
+
+    rows = [
+        (
+            f"POS PURCHASE {rng.choice(MERCHANTS).upper() if rng.random() < args.hit_rate else 'LOCAL SHOP'} "
+            f"#{rng.randrange(10_000)} SPRINGFIELD",
+            "expense" if rng.random() < 0.8 else "income",
+            Decimal(rng.randrange(100, 100_000)).scaleb(-2),
+        )
+        for _ in range(args.descriptions)
+    ]
+
+    started = time.perf_counter()
+    matched = sum(1 for description, tx_type, amount in rows if matcher.match(description, tx_type, amount))
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "rules": args.rules,
+        "regex_rules": matcher.regex_count,
+        "descriptions": args.descriptions,
+        "matched": matched,
+        "compile_ms": round(compile_seconds * 1000, 2),
+        "seconds": round(elapsed, 3),
+        "descriptions_per_second": round(args.descriptions / elapsed),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench/bench_dashboard.py
+# Compares the legacy per-bucket report queries with the single-pass
+# aggregation engine (query count and p50/p95 latency).
+#
+#   python -m bench.bench_dashboard --rows 1000000 --iterations 50
+import argparse
+import json
+from datetime import date, timedelta
+from sqlalchemy import func
+
+from bench.common import QueryCounter, reset_schema, seed, time_calls
+from app import dbm, models, rollups
+from app.routes import reports
+
+
+# --- LEGACY IMPLEMENTATIONS (as they were before the aggregation engine) ---
+
+def legacy_sum(db, user_id, start_date, end_date, tx_type):
+    return db.query(func.sum(models.Transaction.amount)).filter(
+        models.Transaction.user_id == user_id,
+        models.Transaction.date >= start_date,
+        models.Transaction.date <= end_date,
+        models.Transaction.transaction_type == tx_type,
+    ).scalar() or 0.0
+
+
+def legacy_dashboard(db, user):
+    today = date.today()
+    curr_start, curr_end = reports.get_month_dates(today.year, today.month)
+    prev_month = today.month - 1 if today.month > 1 else 12
+    prev_year = today.year if today.month > 1 else today.year - 1
+    prev_start, prev_end = reports.get_month_dates(prev_year, prev_month)
+    for start_date, end_date in ((curr_start, curr_end), (prev_start, prev_end)):
+        legacy_sum(db, user.id, start_date, end_date, "income")
+        legacy_sum(db, user.id, start_date, end_date, "expense")
+    for tx_type in ("income", "expense"):
+        db.query(func.sum(models.Transaction.amount)).filter(
+            models.Transaction.user_id == user.id,
+            models.Transaction.transaction_type == tx_type,
+        ).scalar()
+
+
+def legacy_trends(db, user):
+    today = date.today()
+    for tx_type in ("expense", "income"):
+        db.query(models.Transaction.date, func.sum(models.Transaction.amount)).filter(
+            models.Transaction.user_id == user.id,
+            func.lower(models.Transaction.transaction_type) == tx_type,
+            models.Transaction.date.between(today - timedelta(days=30), today),
+        ).group_by(models.Transaction.date).all()
+
+
+def measure(label, fn, iterations):
+    with QueryCounter() as counter:
+        fn()
+    stats = time_calls(fn, iterations)
+    return {"case": label, "queries": counter.count, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report aggregation queries")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transactions for the measured user")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        reset_schema()
+        seed(users=1, transactions_per_user=args.rows)
+
+    db = dbm.SessionLocal()
+    try:
+        user = db.query(models.User).order_by(models.User.id).first()
+        results = [
+            measure("dashboard-stats (legacy)", lambda: legacy_dashboard(db, user), args.iterations),
+            measure("dashboard-stats", lambda: reports.dashboard_stats(db, user.id), args.iterations),
+            measure("trends (legacy)", lambda: legacy_trends(db, user), args.iterations),
+            measure("trends", lambda: reports.daily_trends(db, user.id), args.iterations),
+            measure("categories", lambda: rollups.get_category_totals(db, user.id, "expense"), args.iterations),
+        ]
+    finally:
+        db.close()
+
+    print(json.dumps({"rows": args.rows, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# bench/bench_export.py
+# Streams a full export through iter_export() and samples process RSS while
+# doing so; RSS should stay flat regardless of the number of rows.
+#
+#   python -m bench.bench_export --rows 5000000 --format ndjson --gzip
+import argparse
+import json
+import resource
+import time
+
+from bench.common import reset_schema, seed
+from app import schemas
+from app.routes.transactions import iter_export
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory use of the streaming export")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    user_id = 1
+    if not args.skip_seed:
+        reset_schema()
+        user_id = seed(users=1, transactions_per_user=args.rows)[0]
+
+    samples = []
+    total_bytes = 0
+    start = time.perf_counter()
+    for index, chunk in enumerate(iter_export(user_id, schemas.TransactionFilter(), args.format, args.gzip)):
+        total_bytes += len(chunk)
+        if index % 100 == 0:
+            samples.append(current_rss_mb())
+    elapsed = time.perf_counter() - start
+
+    # Ignore the warm-up phase (imports, first cursor batch) when judging flatness
+    steady = samples[len(samples) // 10:] or samples
+    print(json.dumps({
+        "rows": args.rows,
+        "format": args.format,
+        "gzip": args.gzip,
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(args.rows / elapsed),
+        "rss_start_mb": round(samples[0], 1),
+        "rss_steady_min_mb": round(min(steady), 1),
+        "rss_steady_max_mb": round(max(steady), 1),
+        "rss_peak_mb": round(max(samples), 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
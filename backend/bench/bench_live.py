@@ -0,0 +1,113 @@
+# bench/bench_live.py
+# What the live dashboard channel costs: create-transaction latency with no
+# stream open (the common case) and with one open, the time until the
+# subscriber has the event, and fanning one event out to many streams. For
+# scale, one polling cycle (dashboard-stats + transactions with matching
+# ETags) is timed too.
+#
+#   python -m bench.bench_live --users 50 --rows 2000 --streams 1000
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from datetime import date
+
+from bench.common import QueryCounter, percentile, reset_schema, seed, time_calls
+from app import dbm, fx, httpcache, live, models, schemas
+from app.routes import reports, transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live dashboard updates")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=2000, help="transactions per user")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--streams", type=int, default=1000, help="open streams for the fan-out case")
+    args = parser.parse_args()
+
+    reset_schema()
+    seed(users=args.users, transactions_per_user=args.rows, days=365)
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    def on_loop(coro):
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def open_streams(user_id: int, count: int):
+        return [live.subscribe(user_id) for _ in range(count)]
+
+    async def receive_all(subscriptions):
+        for subscription in subscriptions:
+            await subscription.get()
+        return time.perf_counter()
+
+    user = models.User(id=1, base_currency=fx.DEFAULT_CURRENCY)
+    payload = schemas.TransactionCreate(
+        transaction_type="expense", category="food", amount="12.34", date=date.today(), description="bench"
+    )
+    db = dbm.SessionLocal()
+    results = {}
+    try:
+        def create():
+            transactions.create_transaction(payload, db, user)
+
+        results["create, no stream"] = time_calls(create, args.iterations)
+        with QueryCounter() as counter:
+            create()
+        results["create, no stream"]["queries"] = counter.count
+
+        streams = on_loop(open_streams(user.id, 1))
+        written, delivered = [], []
+        for _ in range(args.iterations):
+            pending = asyncio.run_coroutine_threadsafe(receive_all(streams), loop)
+            started = time.perf_counter()
+            create()
+            written.append((time.perf_counter() - started) * 1000)
+            delivered.append((pending.result() - started) * 1000)
+        with QueryCounter() as counter:
+            pending = asyncio.run_coroutine_threadsafe(receive_all(streams), loop)
+            create()
+            pending.result()
+        results["create, 1 stream"] = {
+            "p50_ms": round(statistics.median(written), 3),
+            "p95_ms": round(percentile(written, 95), 3),
+            "max_ms": round(max(written), 3),
+            "queries": counter.count,
+        }
+        results["create until the stream has the event"] = {"p50_ms": round(statistics.median(delivered), 3)}
+
+        many = on_loop(open_streams(user.id, args.streams - 1)) + streams
+        fanout = []
+        for _ in range(20):
+            pending = asyncio.run_coroutine_threadsafe(receive_all(many), loop)
+            started = time.perf_counter()
+            live.hub.deliver(user.id, live.frame("bench", 0, {}))
+            fanout.append((pending.result() - started) * 1000)
+        results[f"fan-out to {args.streams} streams"] = {"p50_ms": round(statistics.median(fanout), 3)}
+        for subscription in many:
+            live.unsubscribe(subscription)
+
+        # One polling cycle whose data has not changed: two conditional GETs
+        polled = [
+            ("/reports/dashboard-stats", reports.dashboard_stats, ()),
+            ("/transactions", transactions.transactions_page_payload, (schemas.TransactionFilter(), 100)),
+        ]
+        etags = [httpcache._load(db, user.id, path, "", "", compute, extra)[0] for path, compute, extra in polled]
+
+        def poll():
+            for (path, compute, extra), etag in zip(polled, etags):
+                httpcache._load(db, user.id, path, "", etag, compute, extra)
+
+        results["polling cycle, unchanged (2 x 304)"] = time_calls(poll, args.iterations)
+    finally:
+        db.close()
+        loop.call_soon_threadsafe(loop.stop)
+
+    print(json.dumps({"users": args.users, "rows_per_user": args.rows, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
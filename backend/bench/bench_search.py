@@ -0,0 +1,49 @@
+# bench/bench_search.py
+# Compares description search through the listing's ILIKE filter with the
+# full-text index (p50/p95 latency for a rare and a very common term).
+#
+#   python -m bench.bench_search --rows 1000000 --iterations 20
+import argparse
+import json
+
+from bench.common import reset_schema, seed, time_calls
+from app import dbm, models, schemas, search
+from app.routes.transactions import list_transactions_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transaction description search")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transactions for the measured user")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        reset_schema()
+        seed(users=1, transactions_per_user=args.rows)
+    mode = search.setup(dbm.engine)  # after seeding: one index build instead of per-row triggers
+
+    db = dbm.SessionLocal()
+    try:
+        user = db.query(models.User).order_by(models.User.id).first()
+        results = []
+        # seed() writes "bench payment <n>": "12345" hits a handful of rows, "payment" all of them
+        for label, term in (("rare", "12345"), ("common", "payment")):
+            like = schemas.TransactionFilter(search=term)
+            results.append({
+                "case": f"{label} (ILIKE listing)",
+                **time_calls(lambda: list_transactions_page(db, user.id, like, 50), args.iterations),
+            })
+            results.append({
+                "case": f"{label} ({mode})",
+                "hits": len(search.search_transactions(db, user.id, [term], limit=50)),
+                **time_calls(lambda: search.search_transactions(db, user.id, [term], limit=50), args.iterations),
+            })
+    finally:
+        db.close()
+
+    print(json.dumps({"rows": args.rows, "mode": mode, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
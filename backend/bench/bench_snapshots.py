@@ -0,0 +1,64 @@
+# bench/bench_snapshots.py
+# Throughput of the report snapshot job with 1..N worker processes, against
+# computing the same monthly summaries on demand, one user at a time.
+#
+#   python -m bench.bench_snapshots --users 2000 --rows 200 --workers 1,2,4
+import argparse
+import json
+import os
+import time
+from datetime import date
+
+from bench.common import reset_schema, seed
+from app import dbm, models, snapshots
+from app.routes.reports import monthly_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the report snapshot batch job")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=200, help="transactions per user")
+    parser.add_argument("--days", type=int, default=90, help="history the rows are spread over")
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4) if n <= (os.cpu_count() or 1)) or "1")
+    parser.add_argument("--partition-size", type=int, default=snapshots.PARTITION_SIZE)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        reset_schema()
+        seed(users=args.users, transactions_per_user=args.rows, days=args.days)
+    months = snapshots.target_months(date.today())
+
+    db = dbm.SessionLocal()
+    try:
+        user_ids = [user_id for (user_id,) in db.query(models.User.id)]
+        db.query(models.ReportSnapshot).delete()
+        db.commit()
+        started = time.perf_counter()
+        for user_id in user_ids:
+            for month in months:
+                monthly_summary(db, user_id, month)
+        on_demand = time.perf_counter() - started
+    finally:
+        db.close()
+
+    results = [{"case": "on demand", "seconds": round(on_demand, 3), "users_per_second": round(len(user_ids) / on_demand, 1)}]
+    for workers in (int(value) for value in args.workers.split(",")):
+        with dbm.engine.begin() as conn:
+            conn.execute(models.ReportSnapshot.__table__.delete())
+        totals = snapshots.run(months, workers, args.partition_size)
+        results.append({
+            "case": f"batch, {workers} worker(s)",
+            "seconds": totals["seconds"],
+            "users_per_second": totals["users_per_second"],
+            "speedup": round(results[0]["seconds"] / totals["seconds"], 1),
+        })
+    started = time.perf_counter()
+    snapshots.run(months, 1, args.partition_size)
+    results.append({"case": "re-run, nothing stale", "seconds": round(time.perf_counter() - started, 3)})
+
+    print(json.dumps({"users": args.users, "rows_per_user": args.rows, "cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
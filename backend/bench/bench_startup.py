@@ -0,0 +1,75 @@
+# bench/bench_startup.py
+# Cold-start cost of the API: imports + create_app() in fresh interpreters,
+# the slowest top-level imports, and a guard that modules meant to load
+# lazily (NumPy, Alembic, the process pool) stay out of startup.
+#
+#   python -m bench.bench_startup --runs 10 --max-ms 1500
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from bench.common import percentile
+
+LAZY_MODULES = ("numpy", "alembic", "concurrent.futures.process", "uvicorn")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({
+    "ms": (time.perf_counter() - started) * 1000,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True, text=True, check=True, env=os.environ.copy(),
+    )
+
+
+def slowest_imports(limit: int) -> list:
+    """Top-level modules by cumulative import time (python -X importtime)."""
+    stderr = _run("import app.main", "-X", "importtime").stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) <= 3:
+            rows.append({"module": name.strip(), "ms": round(int(cumulative) / 1000, 1)})
+    return sorted(rows, key=lambda row: row["ms"], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API import/startup time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None, help="exit with status 1 if p50 exceeds this")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    samples, loaded = [], set()
+    for _ in range(args.runs):
+        result = json.loads(_run(PROBE).stdout.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        loaded.update(result["loaded"])
+
+    report = {
+        "runs": args.runs,
+        "p50_ms": round(statistics.median(samples), 1),
+        "p95_ms": round(percentile(samples, 95), 1),
+        "eagerly_loaded": sorted(loaded),
+        "slowest_imports": slowest_imports(args.top),
+    }
+    print(json.dumps(report, indent=2))
+    if loaded or (args.max_ms is not None and report["p50_ms"] > args.max_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
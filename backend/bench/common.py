@@ -0,0 +1,116 @@
+# bench/common.py
+# Shared helpers for the benchmark scripts: point the app at a throwaway
+# database, seed it quickly with Core inserts and count SQL statements.
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Must happen before "app.dbm" is imported anywhere
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.gettempdir(), "finance_bench.db")
+
+from sqlalchemy import event, insert, text  # noqa: E402
+from app import dbm, models, rollups, schema, search  # noqa: E402
+
+CATEGORIES = ["food", "rent", "salary", "transport", "shopping", "health", "utilities", "fun"]
+
+
+def reset_schema():
+    """Drop every table, then build the schema the way a deploy does (alembic upgrade head)."""
+    models.Base.metadata.drop_all(bind=dbm.engine)
+    with dbm.engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {search.FTS_TABLE}"))
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    schema.upgrade()
+
+
+def seed(
+    users: int,
+    transactions_per_user: int,
+    days: int = 3650,
+    batch_size: int = 10_000,
+    seed_value: int = 42,
+    password_hash: str = "x",
+):
+    """Insert ``users`` users with ``transactions_per_user`` rows each spread over ``days``.
+
+    Users are bench<n>@example.com; pass a real ``password_hash`` to log in as them.
+    """
+    rng = random.Random(seed_value)
+    today = date.today()
+    user_ids = []
+    with dbm.engine.begin() as conn:
+        for n in range(users):
+            result = conn.execute(
+                insert(models.User).values(email=f"bench{n}@example.com", password=password_hash, name=f"Bench {n}")
+            )
+            user_ids.append(result.inserted_primary_key[0])
+
+    for user_id in user_ids:
+        rows = []
+        for _ in range(transactions_per_user):
+            tx_type = "income" if rng.random() < 0.3 else "expense"
+            rows.append({
+                "user_id": user_id,
+                "transaction_type": tx_type,
+                "category": "salary" if tx_type == "income" else rng.choice(CATEGORIES),
+                "amount": round(rng.uniform(1, 2000), 2),
+                "date": today - timedelta(days=rng.randrange(days)),
+                "description": f"bench payment {rng.randrange(100_000)}",
+            })
+            if len(rows) >= batch_size:
+                with dbm.engine.begin() as conn:
+                    conn.execute(insert(models.Transaction), rows)
+                rows = []
+        if rows:
+            with dbm.engine.begin() as conn:
+                conn.execute(insert(models.Transaction), rows)
+
+    # Core inserts bypass the write path, so backfill the rollups once
+    db = dbm.SessionLocal()
+    try:
+        rollups.rebuild(db)
+    finally:
+        db.close()
+    return user_ids
+
+
+class QueryCounter:
+    """Counts statements executed on ``dbm.engine`` while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(dbm.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(dbm.engine, "before_cursor_execute", self._on_execute)
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def time_calls(fn, iterations: int):
+    """Run ``fn`` repeatedly and return latency stats in milliseconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "max_ms": round(max(samples), 3),
+    }
@@ -0,0 +1,202 @@
+"""Baseline: the schema as of the switch to Alembic
+
+Creates every table on an empty database, and brings a database made by the
+old create-on-startup code (possibly with float money columns or without
+newer tables, columns or indexes) to the same state.
+
+The DDL is written out here rather than taken from app.models, so this
+revision creates the same schema whatever the models look like later;
+schema changes go in new revisions.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+from app import money, search
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def tables() -> dict:
+    """Table name -> columns, in foreign-key order (fresh objects on every call)."""
+    return {
+        "users": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("email", sa.String, nullable=False),
+            sa.Column("password", sa.String, nullable=False),
+            sa.Column("name", sa.String, nullable=True),
+            sa.Column("base_currency", sa.String(3), nullable=False, server_default="USD"),
+        ],
+        "fx_rates": [
+            sa.Column("currency", sa.String(3), primary_key=True),
+            sa.Column("quote", sa.String(3), primary_key=True),
+            sa.Column("date", sa.Date, primary_key=True),
+            sa.Column("rate", sa.Numeric(20, 10), nullable=False),
+        ],
+        "recurring_rules": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("transaction_type", sa.String, nullable=False),
+            sa.Column("category", sa.String, nullable=False),
+            sa.Column("amount_cents", sa.BigInteger, nullable=False),
+            sa.Column("currency", sa.String(3), nullable=False, server_default="USD"),
+            sa.Column("description", sa.String, nullable=True),
+            sa.Column("frequency", sa.String, nullable=False),
+            sa.Column("interval", sa.Integer, nullable=False),
+            sa.Column("day_of_month", sa.Integer, nullable=True),
+            sa.Column("start_date", sa.Date, nullable=False),
+            sa.Column("end_date", sa.Date, nullable=True),
+            sa.Column("next_run", sa.Date, nullable=True),
+            sa.Column("active", sa.Boolean, nullable=False),
+        ],
+        "transactions": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("transaction_type", sa.String, nullable=False),
+            sa.Column("category", sa.String, nullable=False),
+            sa.Column("amount_cents", sa.BigInteger, nullable=False),
+            sa.Column("currency", sa.String(3), nullable=False, server_default="USD"),
+            sa.Column("date", sa.Date, nullable=False),
+            sa.Column("description", sa.String, nullable=True),
+            sa.Column("recurring_rule_id", sa.Integer, sa.ForeignKey("recurring_rules.id"), nullable=True),
+        ],
+        "goals": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("target_amount_cents", sa.BigInteger, nullable=False),
+            sa.Column("current_amount_cents", sa.BigInteger, nullable=True),
+            sa.Column("deadline", sa.Date, nullable=False),
+            sa.Column("tracking", sa.String, nullable=False, server_default="manual"),
+            sa.Column("category", sa.String, nullable=True),
+            sa.Column("start_date", sa.Date, nullable=True),
+        ],
+        "category_rules": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("category", sa.String, nullable=False),
+            sa.Column("match_type", sa.String, nullable=False),
+            sa.Column("pattern", sa.String, nullable=False),
+            sa.Column("transaction_type", sa.String, nullable=True),
+            sa.Column("min_amount_cents", sa.BigInteger, nullable=True),
+            sa.Column("max_amount_cents", sa.BigInteger, nullable=True),
+            sa.Column("priority", sa.Integer, nullable=False),
+        ],
+        "budgets": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("category", sa.String, nullable=False),
+            sa.Column("amount_cents", sa.BigInteger, nullable=False),
+            sa.Column("alert_percent", sa.Integer, nullable=True),
+        ],
+        "notification_outbox": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("kind", sa.String, nullable=False),
+            sa.Column("payload", sa.Text, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+        ],
+        "notifications": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("kind", sa.String, nullable=False),
+            sa.Column("message", sa.String, nullable=False),
+            sa.Column("data", sa.Text, nullable=True),
+            sa.Column("dedupe_key", sa.String, nullable=False),
+            sa.Column("read", sa.Boolean, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+        ],
+        "user_totals": [
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("income_cents", sa.BigInteger, nullable=False),
+            sa.Column("expense_cents", sa.BigInteger, nullable=False),
+            sa.Column("transaction_count", sa.Integer, nullable=False),
+            sa.Column("data_version", sa.Integer, nullable=False),
+        ],
+        "monthly_category_totals": [
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("month", sa.Date, primary_key=True),
+            sa.Column("transaction_type", sa.String, primary_key=True),
+            sa.Column("category", sa.String, primary_key=True),
+            sa.Column("amount_cents", sa.BigInteger, nullable=False),
+            sa.Column("transaction_count", sa.Integer, nullable=False),
+        ],
+        "report_snapshots": [
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("month", sa.Date, primary_key=True),
+            sa.Column("currency", sa.String(3), nullable=False),
+            sa.Column("income_cents", sa.BigInteger, nullable=False),
+            sa.Column("expense_cents", sa.BigInteger, nullable=False),
+            sa.Column("transaction_count", sa.Integer, nullable=False),
+            sa.Column("categories", sa.Text, nullable=False),
+            sa.Column("data_version", sa.Integer, nullable=False),
+            sa.Column("computed_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+        ],
+    }
+
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_users_id", "users", ["id"], False),
+    ("ix_users_email", "users", ["email"], True),
+    ("ix_recurring_rules_id", "recurring_rules", ["id"], False),
+    ("ix_recurring_rules_user_id", "recurring_rules", ["user_id"], False),
+    ("ix_recurring_rules_active_next_run", "recurring_rules", ["active", "next_run"], False),
+    ("ix_transactions_id", "transactions", ["id"], False),
+    ("ix_transactions_user_date_id", "transactions", ["user_id", "date", "id"], False),
+    ("ix_transactions_user_type_date", "transactions", ["user_id", "transaction_type", "date"], False),
+    ("ix_transactions_user_category_date", "transactions", ["user_id", "category", "date"], False),
+    ("ux_transactions_rule_date", "transactions", ["recurring_rule_id", "date"], True),
+    ("ix_goals_id", "goals", ["id"], False),
+    ("ix_goals_user_id", "goals", ["user_id"], False),
+    ("ix_category_rules_id", "category_rules", ["id"], False),
+    ("ix_category_rules_user_priority", "category_rules", ["user_id", "priority", "id"], False),
+    ("ix_budgets_id", "budgets", ["id"], False),
+    ("ux_budgets_user_category", "budgets", ["user_id", "category"], True),
+    ("ix_notifications_id", "notifications", ["id"], False),
+    ("ix_notifications_user_id_id", "notifications", ["user_id", "id"], False),
+    ("ux_notifications_user_dedupe", "notifications", ["user_id", "dedupe_key"], True),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    # float money columns from older databases become integer cents
+    money.migrate(bind)
+
+    inspector = sa.inspect(bind)
+    for name, items in tables().items():
+        if not inspector.has_table(name):
+            op.create_table(name, *items)
+            continue
+        # A database from the create-on-startup days: add what it lacks. New
+        # columns must be nullable or carry a server_default to be added in
+        # place, and go in without their foreign key (SQLite cannot ALTER one in).
+        existing = {column["name"] for column in inspector.get_columns(name)}
+        for column in items:
+            if column.name not in existing:
+                op.add_column(
+                    name,
+                    sa.Column(column.name, column.type, nullable=column.nullable, server_default=column.server_default),
+                )
+
+    existing_indexes = {
+        index["name"] for table in tables() for index in sa.inspect(bind).get_indexes(table)
+    }
+    for name, table, columns, unique in INDEXES:
+        if name not in existing_indexes:
+            op.create_index(name, table, columns, unique=unique)
+
+    # description search index (GIN on PostgreSQL, FTS5 table and triggers on SQLite)
+    search.setup(bind)
+
+
+def downgrade():
+    # Drops everything, data included. The GIN index and the FTS5 triggers go with transactions.
+    op.execute(f"DROP TABLE IF EXISTS {search.FTS_TABLE}")
+    for name in reversed(list(tables())):
+        op.drop_table(name)
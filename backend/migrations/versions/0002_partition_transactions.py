@@ -0,0 +1,33 @@
+"""Hash-partition transactions by user_id (PostgreSQL)
+
+The unique rule/date index gains user_id (required for partitioning, and
+equivalent since a rule belongs to one user). On PostgreSQL the table is then
+rebuilt with TRANSACTION_PARTITIONS hash partitions; other databases, and
+TRANSACTION_PARTITIONS=0, keep a plain table. Downgrading copies the rows back
+into a plain table and restores the (recurring_rule_id, date) index.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+from app import schema
+from app.config import get_settings
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    schema.scope_rule_index(bind)
+    schema.partition_transactions(bind, get_settings().transaction_partitions)
+
+
+def downgrade():
+    bind = op.get_bind()
+    # Copies the table back into an unpartitioned one (same maintenance window as the upgrade)
+    schema.unpartition_transactions(bind)
+    schema.unscope_rule_index(bind)
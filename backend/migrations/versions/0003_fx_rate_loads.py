@@ -0,0 +1,26 @@
+"""Record FX rate loads so every worker notices new rates
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "fx_rate_loads",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("rates", sa.Integer, nullable=False),
+        sa.Column("loaded_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("fx_rate_loads")
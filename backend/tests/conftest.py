@@ -0,0 +1,47 @@
+import itertools
+import os
+import tempfile
+
+import pytest
+
+# A throwaway SQLite database, set before anything imports app.config
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import dbm, schema  # noqa: E402
+
+_emails = (f"user{n}@example.com" for n in itertools.count(1))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    schema.upgrade()
+    return dbm.engine
+
+
+@pytest.fixture
+def db():
+    session = dbm.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def user(client):
+    """A fresh signed-up user (the database is shared by the whole session): id and auth headers."""
+    email = next(_emails)
+    client.post("/auth/signup", json={"email": email, "password": "pw", "name": "Test"}).raise_for_status()
+    token = client.post("/auth/login", json={"email": email, "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return {"id": client.get("/auth/me", headers=headers).json()["id"], "headers": headers}
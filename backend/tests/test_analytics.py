@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+
+from app import analytics, rollups
+
+
+def test_future_months_are_left_out(client, user, db):
+    today = date.today()
+    later = (today + timedelta(days=40)).isoformat()
+    for category, day in (("food", today.isoformat()), ("food", later), ("rent", later)):
+        payload = {"transaction_type": "expense", "category": category, "amount": 10, "date": day}
+        assert client.post("/transactions", json=payload, headers=user["headers"]).status_code == 200
+
+    response = client.get("/reports/analytics", headers=user["headers"])
+    assert response.status_code == 200
+
+    history_start = date(today.year - analytics.HISTORY_YEARS, today.month, 1)
+    months, names, category_index, cents = analytics.load_monthly(
+        db, user["id"], history_start, rollups.month_start(today)
+    )
+    # Only this month's food expense; the future food and rent months are not read
+    assert list(names) == ["food"] and months.tolist() == [analytics.HISTORY_YEARS * 12]
+    assert cents.tolist() == [1000.0]
+
+
+def test_amounts_are_decimal_strings(client, user):
+    today = date.today().isoformat()
+    payload = {"transaction_type": "expense", "category": "food", "amount": "10.10", "date": today}
+    assert client.post("/transactions", json=payload, headers=user["headers"]).status_code == 200
+
+    body = client.get("/reports/analytics", headers=user["headers"]).json()
+    assert body["projection"]["expense_to_date"] == "10.10"
+    assert body["rolling"]["expense"][-1] == "10.10"
+    assert body["rolling"]["mean_7"][-1] == "1.44"  # 10.10 over 7 days, to the cent
+    assert all(isinstance(value, float) for value in body["seasonality"]["weekday"].values())
@@ -0,0 +1,80 @@
+import zlib
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Query
+
+from app import dbm, models, schemas
+from app.routes import transactions
+
+ROWS = 2500
+BATCH = 100
+
+
+@pytest.fixture(scope="module")
+def user_id(database):
+    db = dbm.SessionLocal()
+    try:
+        user = models.User(email="export@example.com", password="x", name="Export")
+        db.add(user)
+        db.flush()
+        start = date(2020, 1, 1)
+        db.execute(insert(models.Transaction), [
+            {
+                "user_id": user.id,
+                "transaction_type": "expense" if i % 4 else "income",
+                "category": "food",
+                "amount": Decimal(i % 500) + Decimal("0.25"),
+                "currency": "USD",
+                "date": start + timedelta(days=i % 1000),
+                "description": f"row {i}",
+            }
+            for i in range(ROWS)
+        ])
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Counts the rows iter_export() pulls from its query, and the yield_per it asked for."""
+    counts = {"rows": 0, "yield_per": None}
+    real_yield_per = Query.yield_per
+
+    def counting_yield_per(query, count):
+        counts["yield_per"] = count
+
+        def rows():
+            for row in real_yield_per(query, count):
+                counts["rows"] += 1
+                yield row
+
+        return rows()
+
+    monkeypatch.setattr(transactions, "EXPORT_BATCH_SIZE", BATCH)
+    monkeypatch.setattr(Query, "yield_per", counting_yield_per)
+    return counts
+
+
+@pytest.mark.parametrize("fmt, compress", [("csv", False), ("ndjson", False), ("ndjson", True)])
+def test_export_streams_one_batch_at_a_time(user_id, fetched, fmt, compress):
+    decompressor = zlib.decompressobj(wbits=31) if compress else None
+    chunks = 0
+    body = b""
+    for chunk in transactions.iter_export(user_id, schemas.TransactionFilter(), fmt, compress):
+        chunks += 1
+        # Each chunk goes out before the next batch is read from the cursor
+        assert fetched["rows"] <= chunks * BATCH
+        body += decompressor.decompress(chunk) if decompressor else chunk
+
+    assert fetched["yield_per"] == BATCH
+    assert fetched["rows"] == ROWS
+    assert chunks >= ROWS // BATCH
+    lines = body.decode().splitlines()
+    assert len(lines) == ROWS + (fmt == "csv")
+    if fmt == "ndjson":
+        assert '"amount": "0.25"' in lines[0]
@@ -0,0 +1,39 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.routes import goals
+
+
+def goal(target, current="0"):
+    return SimpleNamespace(
+        tracking="manual", category=None, target_amount=Decimal(target), current_amount=Decimal(current),
+        deadline=date(2030, 1, 1),
+    )
+
+
+def test_forecast_with_a_tiny_velocity_has_no_projected_date():
+    velocity = {"savings": Decimal("0.01") / 3, "categories": {}}
+    result = goals.forecast(goal("100000"), velocity, date(2026, 1, 1))
+    assert result["projected_date"] is None and result["on_track"] is False
+
+
+def test_forecast_projects_within_the_horizon():
+    velocity = {"savings": Decimal("100"), "categories": {}}
+    result = goals.forecast(goal("1000", "400"), velocity, date(2026, 1, 1))
+    assert result["projected_date"] == date(2026, 7, 3)  # 6 months of 30.44 days, rounded up
+    assert result["on_track"] is True
+
+
+def test_goal_routes_survive_a_tiny_velocity(client, user):
+    # One cent of savings in the trailing months, against a large target
+    today = date.today()
+    month = date(today.year - (today.month == 1), (today.month - 2) % 12 + 1, 1)
+    payload = {"transaction_type": "income", "category": "pay", "amount": "0.01", "date": month.isoformat()}
+    assert client.post("/transactions", json=payload, headers=user["headers"]).status_code == 200
+
+    goal = {"target_amount": 100000, "deadline": "2030-01-01"}
+    created = client.post("/goals", json=goal, headers=user["headers"])
+    assert created.status_code == 200, created.text
+    assert created.json()["forecast"]["projected_date"] is None
+    assert client.get("/goals", headers=user["headers"]).status_code == 200
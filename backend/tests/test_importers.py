@@ -0,0 +1,35 @@
+import io
+
+import pytest
+
+from app import importers, models
+
+STATEMENT = "date,description,amount\n" + "2024-03-01,coffee,-3.50\n" * 5 + "2024-03-02,lunch,-12.00\n"
+
+
+def test_repeats_split_across_batches_are_all_imported(db):
+    user = models.User(email="import@example.com", password="x", name="Import")
+    db.add(user)
+    db.commit()
+
+    # Five identical same-day rows over three batches: none of them existed before
+    report = importers.import_transactions(db, user.id, importers.parse_csv(io.StringIO(STATEMENT)), batch_size=2)
+    assert (report["inserted"], report["duplicates"], report["errors"]) == (6, 0, [])
+
+    # Importing the same statement again finds every row
+    report = importers.import_transactions(db, user.id, importers.parse_csv(io.StringIO(STATEMENT)), batch_size=2)
+    assert (report["inserted"], report["duplicates"]) == (0, 6)
+    assert db.query(models.Transaction).filter(models.Transaction.user_id == user.id).count() == 6
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_preexisting_row_plus_repeats_is_the_same_at_any_batch_size(db, user, batch_size):
+    importers.import_transactions(db, user["id"], importers.parse_csv(io.StringIO(
+        "date,description,amount\n2024-03-01,coffee,-3.50\n"
+    )))
+
+    # One coffee was already there: one of the three in the file matches it, two are new
+    statement = "date,description,amount\n" + "2024-03-01,coffee,-3.50\n" * 3 + "2024-03-02,lunch,-12.00\n"
+    report = importers.import_transactions(db, user["id"], importers.parse_csv(io.StringIO(statement)), batch_size=batch_size)
+    assert (report["inserted"], report["duplicates"]) == (3, 1)
+    assert db.query(models.Transaction).filter(models.Transaction.user_id == user["id"]).count() == 4
@@ -0,0 +1,23 @@
+import pytest
+from fastapi import HTTPException
+
+from app.routes import live as live_routes
+
+
+def test_stream_ticket_is_single_use(client, user, db):
+    response = client.post("/live/ticket", headers=user["headers"])
+    assert response.status_code == 200
+    ticket = response.json()["ticket"]
+
+    assert live_routes.get_stream_user(token=None, ticket=ticket, db=db).id == user["id"]
+    with pytest.raises(HTTPException) as error:
+        live_routes.get_stream_user(token=None, ticket=ticket, db=db)
+    assert error.value.status_code == 401
+
+
+def test_stream_rejects_unknown_tickets_and_query_tokens(client, user):
+    token = user["headers"]["Authorization"].split()[1]
+    assert client.get("/live/dashboard", params={"ticket": "nope"}).status_code == 401
+    # The long-lived token is no longer accepted in the URL
+    assert client.get("/live/dashboard", params={"access_token": token}).status_code == 401
+    assert client.post("/live/ticket").status_code == 401
@@ -0,0 +1,55 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from app import models
+from app.money import MAX_AMOUNT, from_cents, to_cents, to_json
+
+EXPENSE = {"transaction_type": "expense", "category": "food", "date": "2024-03-05"}
+
+
+@pytest.mark.parametrize("value, cents", [
+    (0.1, 10),  # the float's shortest repr, not 0.1000000000000000055...
+    ("1.005", 101),  # half up, not to even
+    ("-1.005", -101),
+    (Decimal("12.5"), 1250),
+    (3, 300),
+])
+def test_to_cents(value, cents):
+    assert to_cents(value) == cents
+
+
+def test_cents_round_trip():
+    assert from_cents(-5) == Decimal("-0.05")
+    assert to_json(from_cents(1250)) == "12.50"
+    assert to_cents(from_cents(2**63 - 1)) == 2**63 - 1
+
+
+def test_api_round_trip(client, user, db):
+    response = client.post("/transactions", json={**EXPENSE, "amount": "12.5"}, headers=user["headers"])
+    assert response.json()["amount"] == "12.50"
+    stored = db.get(models.Transaction, (response.json()["id"], user["id"]))
+    assert stored.amount == Decimal("12.50")
+
+    # A float in JSON is read as the number it prints as
+    response = client.post("/transactions", json={**EXPENSE, "amount": 0.1}, headers=user["headers"])
+    assert response.json()["amount"] == "0.10"
+
+    listed = client.get("/transactions", headers=user["headers"]).json()
+    assert sorted(row["amount"] for row in listed) == ["0.10", "12.50"]
+
+    export = client.get("/transactions/export", params={"format": "ndjson"}, headers=user["headers"])
+    assert sorted(json.loads(line)["amount"] for line in export.text.splitlines()) == ["0.10", "12.50"]
+
+
+@pytest.mark.parametrize("amount", ["12.345", "0.001", str(MAX_AMOUNT + 1), str(-MAX_AMOUNT - 1), "NaN", "abc"])
+def test_invalid_amounts_are_rejected(client, user, amount):
+    response = client.post("/transactions", json={**EXPENSE, "amount": amount}, headers=user["headers"])
+    assert response.status_code == 422
+
+
+def test_largest_amount_is_accepted(client, user):
+    response = client.post("/transactions", json={**EXPENSE, "amount": str(MAX_AMOUNT)}, headers=user["headers"])
+    assert response.status_code == 200
+    assert response.json()["amount"] == str(MAX_AMOUNT)
@@ -0,0 +1,81 @@
+import base64
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app import models, rollups
+from app.routes.transactions import MAX_PAGE_SIZE
+
+
+@pytest.fixture
+def transaction_ids(user, db):
+    """Seven rows over three dates, several sharing a date; ids in newest-first order."""
+    days = [date(2024, 3, 1)] * 3 + [date(2024, 3, 2)] * 2 + [date(2024, 2, 28)] * 2
+    rows = [
+        models.Transaction(
+            user_id=user["id"], transaction_type="expense", category="food", amount=Decimal("1.00"), currency="USD", date=day
+        )
+        for day in days
+    ]
+    db.add_all(rows)
+    rollups.apply(db, rows)
+    db.commit()
+    return [row.id for row in sorted(rows, key=lambda row: (row.date, row.id), reverse=True)]
+
+
+def pages(client, user, limit, **params):
+    cursor, seen = None, []
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/transactions", params=query, headers=user["headers"])
+        assert response.status_code == 200
+        seen.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 8])
+def test_pages_cover_every_row_once_in_order(client, user, transaction_ids, limit):
+    seen = pages(client, user, limit)
+    assert [row_id for page in seen for row_id in page] == transaction_ids
+    assert all(len(page) == limit for page in seen[:-1])
+    # A full last page does not announce an empty one after it
+    assert seen[-1]
+
+
+def test_filters_apply_across_pages(client, user, transaction_ids):
+    seen = pages(client, user, 2, start_date="2024-03-01")
+    assert [row_id for page in seen for row_id in page] == transaction_ids[:5]
+
+
+def test_rows_added_behind_the_cursor_do_not_shift_pages(client, user, db, transaction_ids):
+    first = client.get("/transactions", params={"limit": 3}, headers=user["headers"])
+    cursor = first.headers["X-Next-Cursor"]
+    # Newer than anything on the first page, so it must not appear on the second
+    client.post(
+        "/transactions",
+        json={"transaction_type": "expense", "category": "food", "amount": "1.00", "date": "2024-03-03"},
+        headers=user["headers"],
+    )
+    second = client.get("/transactions", params={"limit": 3, "cursor": cursor}, headers=user["headers"])
+    assert [row["id"] for row in second.json()] == transaction_ids[3:6]
+
+
+def test_empty_listing_has_no_cursor(client, user):
+    response = client.get("/transactions", headers=user["headers"])
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", base64.urlsafe_b64encode(b"2024-03-01").decode(),
+                                    base64.urlsafe_b64encode(b"yesterday|7").decode()])
+def test_invalid_cursor_is_a_400(client, user, cursor):
+    response = client.get("/transactions", params={"cursor": cursor}, headers=user["headers"])
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, -1, MAX_PAGE_SIZE + 1])
+def test_limit_out_of_range_is_a_422(client, user, limit):
+    assert client.get("/transactions", params={"limit": limit}, headers=user["headers"]).status_code == 422
@@ -0,0 +1,124 @@
+import io
+
+import pytest
+
+from app import fx, rollups
+from app.money import from_cents
+
+EXPENSE = {"transaction_type": "expense", "category": "food", "amount": "12.50", "date": "2024-03-05"}
+STATEMENT = "date,description,amount\n2024-03-01,coffee,-3.50\n2024-04-02,salary,2500.00\n"
+
+
+def create(client, user, **fields):
+    response = client.post("/transactions", json={**EXPENSE, **fields}, headers=user["headers"])
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def rows(client, user):
+    """Three transactions over two months and both types."""
+    return [
+        create(client, user),
+        create(client, user, category="rent", amount="800.00", date="2024-04-01"),
+        create(client, user, transaction_type="income", category="salary", amount="2500.00"),
+    ]
+
+
+def assert_consistent(db, user):
+    db.expire_all()
+    assert rollups.verify(db, [user["id"]]) == []
+
+
+def test_create_matches_a_rescan(client, user, db, rows):
+    assert_consistent(db, user)
+    assert client.get("/reports/dashboard-stats", headers=user["headers"]).status_code == 200
+    assert rollups.get_user_totals(db, user["id"])["expense"] == from_cents(81250)
+
+
+@pytest.mark.parametrize("method, changes", [
+    ("patch", {"amount": "13.75"}),
+    ("patch", {"date": "2024-05-31"}),
+    ("patch", {"category": "groceries"}),
+    ("patch", {"transaction_type": "income"}),
+    ("put", {**EXPENSE, "amount": "1.01", "category": "other", "date": "2023-12-31"}),
+])
+def test_update_matches_a_rescan(client, user, db, rows, method, changes):
+    response = getattr(client, method)(f"/transactions/{rows[0]['id']}", json=changes, headers=user["headers"])
+    assert response.status_code == 200, response.text
+    assert_consistent(db, user)
+
+
+def test_delete_matches_a_rescan(client, user, db, rows):
+    assert client.delete(f"/transactions/{rows[1]['id']}", headers=user["headers"]).status_code == 200
+    assert_consistent(db, user)
+    assert rollups.get_user_totals(db, user["id"])["transaction_count"] == 2
+
+
+def test_batch_writes_match_a_rescan(client, user, db, rows):
+    ids = [row["id"] for row in rows]
+    response = client.post(
+        "/transactions/batch/update",
+        json={"ids": ids[:2], "changes": {"amount": "99.99", "date": "2024-06-15"}},
+        headers=user["headers"],
+    )
+    assert response.json()["count"] == 2
+    assert_consistent(db, user)
+
+    response = client.post(
+        "/transactions/batch/recategorize",
+        json={"filters": {"transaction_type": "expense"}, "category": "misc"},
+        headers=user["headers"],
+    )
+    assert response.json()["count"] == 2
+    assert_consistent(db, user)
+
+    response = client.post(
+        "/transactions/batch/delete", json={"filters": {"category": "misc"}}, headers=user["headers"]
+    )
+    assert response.json()["count"] == 2
+    assert_consistent(db, user)
+
+
+def test_import_matches_a_rescan(client, user, db, rows):
+    files = {"file": ("statement.csv", STATEMENT, "text/csv")}
+    response = client.post("/transactions/import", files=files, headers=user["headers"])
+    assert response.json()["inserted"] == 2
+    assert_consistent(db, user)
+
+
+def test_every_write_bumps_data_version(client, user, db):
+    versions = [rollups.get_data_version(db, user["id"])]
+
+    def bumped():
+        db.expire_all()
+        versions.append(rollups.get_data_version(db, user["id"]))
+        return versions[-1] > versions[-2]
+
+    row = create(client, user)
+    assert bumped()
+    client.patch(f"/transactions/{row['id']}", json={"description": "no rollup field"}, headers=user["headers"])
+    assert bumped()
+    client.patch(f"/transactions/{row['id']}", json={"amount": "1.00"}, headers=user["headers"])
+    assert bumped()
+    client.post("/transactions/import", files={"file": ("s.csv", STATEMENT, "text/csv")}, headers=user["headers"])
+    assert bumped()
+    client.delete(f"/transactions/{row['id']}", headers=user["headers"])
+    assert bumped()
+    rollups.rebuild(db, [user["id"]])
+    assert bumped()
+
+
+def test_fx_load_rebuilds_holders_of_the_currency(client, user, db):
+    fx.load_rates(db, io.StringIO("date,currency,quote,rate\n2024-03-01,CHF,USD,1.10\n"))
+    create(client, user, currency="CHF", amount="10.00")
+    assert rollups.get_user_totals(db, user["id"])["expense"] == from_cents(1100)
+    version = rollups.get_data_version(db, user["id"])
+
+    # A corrected rate for the same day changes what the rollups should hold
+    report = fx.load_rates(db, io.StringIO("date,currency,quote,rate\n2024-03-01,CHF,USD,1.25\n"))
+    assert user["id"] in report["users"]
+    db.expire_all()
+    assert rollups.get_user_totals(db, user["id"])["expense"] == from_cents(1250)
+    assert rollups.get_data_version(db, user["id"]) > version
+    assert_consistent(db, user)
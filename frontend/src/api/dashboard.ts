@@ -5,9 +5,17 @@ export const getSummary = async () => {
   return res.data;
 };
 
+// GET /transactions returns one page at a time (newest first); follow
+// X-Next-Cursor until the last page to get every transaction
 export const getTransactions = async () => {
-  const res = await api.get("/transactions");
-  return res.data;
+  const transactions: any[] = [];
+  let cursor: string | undefined;
+  do {
+    const res = await api.get("/transactions", { params: { limit: 500, cursor } });
+    transactions.push(...res.data);
+    cursor = res.headers["x-next-cursor"];
+  } while (cursor);
+  return transactions;
 };
 
 export const getGoals = async () => {
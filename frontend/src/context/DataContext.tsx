@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useEffect, useState } from "react";
 import { api } from "@/api/api";
+import { getTransactions } from "@/api/dashboard";
 
 // --- Types ---
 interface Summary {
@@ -48,9 +49,9 @@ export const DataProvider = ({ children }: { children: React.ReactNode }) => {
   const refreshAll = async () => {
     try {
       setLoading(true);
-      const [sumRes, txRes, goalRes] = await Promise.all([
+      const [sumRes, txData, goalRes] = await Promise.all([
         api.get("/reports/summary"),
-        api.get("/transactions"),
+        getTransactions(),
         api.get("/goals"),
       ]);
 
@@ -62,9 +63,10 @@ export const DataProvider = ({ children }: { children: React.ReactNode }) => {
       });
 
       // 2. Transactions
-      setTransactions(txRes.data.map((t: any) => ({
+      setTransactions(txData.map((t: any) => ({
         id: t.id,
-        amount: t.amount,
+        // Money fields arrive as decimal strings ("12.50")
+        amount: Number(t.amount),
         date: t.date,
         category: t.category,
         description: t.category,
@@ -76,9 +78,9 @@ export const DataProvider = ({ children }: { children: React.ReactNode }) => {
         id: g.id,
         title: g.title,
         // Backend sends 'target_amount', UI wants 'target'
-        target: g.target_amount, 
+        target: Number(g.target_amount), 
         // Backend sends 'current_amount', UI wants 'current'
-        current: g.current_amount || 0, 
+        current: Number(g.current_amount || 0), 
         deadline: g.deadline,
       })));
 
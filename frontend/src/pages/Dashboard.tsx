@@ -49,7 +49,7 @@ const Dashboard = () => {
         const [statsRes, goalsRes, txRes] = await Promise.all([
           api.get('/reports/dashboard-stats'),
           api.get('/goals'),
-          api.get('/transactions') 
+          api.get('/transactions', { params: { limit: 5 } })
         ]);
 
         // 1. Setup Stats
@@ -70,11 +70,16 @@ const Dashboard = () => {
         ];
         
         setStats(formattedStats);
-        setGoals(goalsRes.data);
+        // Money fields arrive as decimal strings ("12.50")
+        setGoals(goalsRes.data.map((g: any) => ({
+          ...g,
+          target_amount: Number(g.target_amount),
+          current_amount: Number(g.current_amount),
+        })));
         
         // 2. Setup Recent Transactions (Take top 5)
         // Since backend sends them sorted by date, this will always show the newest ones.
-        setRecentTransactions(txRes.data.slice(0, 5));
+        setRecentTransactions(txRes.data.map((tx: any) => ({ ...tx, amount: Number(tx.amount) })));
 
       } catch (error) {
         console.error("Failed to fetch dashboard data", error);
@@ -40,8 +40,8 @@ const Goals = () => {
         id: g.id,
         // Assuming backend might not have title, we fallback to Goal #ID
         title: g.title || `Goal #${g.id}`, 
-        target: g.target_amount,
-        current: g.current_amount,
+        target: Number(g.target_amount),
+        current: Number(g.current_amount),
         deadline: g.deadline 
       }));
 
@@ -3,6 +3,7 @@ import { Search, Plus, ArrowUpRight, ArrowDownRight, Wallet, Edit2, Trash2 } fro
 import { GlassCard } from '@/components/GlassCard';
 import { GradientText } from '@/components/GradientText';
 import api from '@/api/axios';
+import { getTransactions } from '@/api/dashboard';
 import { toast } from 'sonner';
 
 // Import Modal & Type
@@ -22,8 +23,9 @@ const Transactions = () => {
   const fetchTransactions = async () => {
     try {
       setLoading(true);
-      const res = await api.get('/transactions'); 
-      setTransactions(res.data);
+      const data = await getTransactions();
+      // Money fields arrive as decimal strings ("12.50")
+      setTransactions(data.map((tx: any) => ({ ...tx, amount: Number(tx.amount) })));
     } catch (error) {
       console.error("Failed to fetch transactions", error);
     } finally {